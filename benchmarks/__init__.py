@@ -0,0 +1 @@
+"Throughput benchmarks, run as modules from repository root, e.g. `python -m benchmarks.number_extraction`"
@@ -0,0 +1,111 @@
+"""
+Memory allocated per call of numeric kernels and `encode`, with and without
+preallocated `out=` buffer, for every `EmbeddingClasses` member.
+
+Torch allocations are counted with torch profiler, allocations of python and
+numpy objects, e.g. contextual embeddings returned by backbone, with tracemalloc.
+
+    python -m benchmarks.allocations --stub-backbone
+"""
+
+import argparse
+import tracemalloc
+from collections.abc import Callable
+
+import torch
+from torch.profiler import ProfilerActivity, profile
+
+from benchmarks.suite import StubBackbone, make_input
+from source.encode import get_embedding_model
+from source.numeric_representation import MODEL_REGISTRY, EmbeddingClasses
+from source.numeric_representation.model_registry import DEFAULT_MODEL_NAME
+from source.utils import extract_numbers
+
+
+def count_allocations(function: Callable[[], object], repeat: int) -> dict[str, float]:
+    """
+    Number and bytes of torch allocations per call of a function, after one
+    warmup call, and peak of memory traced by tracemalloc during one call.
+    """
+    function()
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as profiler:
+        for _ in range(repeat):
+            function()
+    allocating_events = [
+        event for event in profiler.key_averages() if event.self_cpu_memory_usage > 0
+    ]
+
+    tracemalloc.start()
+    python_peak_bytes = 0
+    for _ in range(repeat):
+        tracemalloc.reset_peak()
+        current_bytes, _ = tracemalloc.get_traced_memory()
+        function()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        python_peak_bytes = max(python_peak_bytes, peak_bytes - current_bytes)
+    tracemalloc.stop()
+
+    return {
+        "torch_allocations": sum(event.count for event in allocating_events) / repeat,
+        "torch_bytes": sum(event.self_cpu_memory_usage for event in allocating_events)
+        / repeat,
+        "python_peak_bytes": python_peak_bytes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--shape", default="short")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--stub-backbone",
+        action="store_true",
+        help="Replace MiniLM with deterministic stub, no model download needed.",
+    )
+    parser.add_argument(
+        "--backend", default="minilm", help="Contextual backend, e.g. 'hashing'."
+    )
+    arguments = parser.parse_args()
+
+    if arguments.stub_backbone:
+        MODEL_REGISTRY.register(DEFAULT_MODEL_NAME, StubBackbone())
+
+    input = make_input(arguments.shape, arguments.batch_size)
+    print(f"{'case':<50} {'torch allocs':>13} {'torch MB':>10} {'python peak MB':>15}")
+    for element in EmbeddingClasses:
+        model = get_embedding_model(element.value, arguments.backend)
+        out = torch.empty(arguments.batch_size, model.embedding_size)
+        cases = [
+            (f"{element.value}/encode", lambda: model.encode(input)),
+            (f"{element.value}/encode out=", lambda: model.encode(input, out=out)),
+        ]
+        if hasattr(model, "extract_numerical_embeddings"):
+            numbers, _ = extract_numbers(input, fallback=model.number_fallback)
+            numerical_out = model.extract_numerical_embeddings(numbers).clone()
+            cases += [
+                (
+                    f"{element.value}/extract_numerical_embeddings",
+                    lambda: model.extract_numerical_embeddings(numbers),
+                ),
+                (
+                    f"{element.value}/extract_numerical_embeddings out=",
+                    lambda: model.extract_numerical_embeddings(
+                        numbers, out=numerical_out
+                    ),
+                ),
+            ]
+
+        for name, function in cases:
+            result = count_allocations(function, arguments.repeat)
+            print(
+                f"{name:<50} {result['torch_allocations']:>13.1f} "
+                f"{result['torch_bytes'] / 2**20:>10.2f} "
+                f"{result['python_peak_bytes'] / 2**20:>15.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Recall@k and queries per second of approximate catalog search against exact search.
+
+Rows are synthetic clustered unit vectors, or embeddings of real catalog-like
+inputs with `--encode`.
+
+    python -m benchmarks.ann_recall --size 200000 --nprobe 1 4 16 64
+"""
+
+import argparse
+import time
+
+import torch
+
+from benchmarks.number_extraction import make_input
+from source.ann_index import IVFPQIndex
+from source.encode import encode_numbers
+from source.utils import normalize_rows
+from table_infromation_retrieval import LLM, CatalogTable
+
+
+def make_rows(
+    size: int, embedding_size: int, noise: float, generator: torch.Generator
+) -> torch.Tensor:
+    """
+    Unit vectors scattered around random centers, about 50 per center.
+    """
+    centers = torch.randn(max(1, size // 50), embedding_size, generator=generator)
+    assignments = torch.randint(0, len(centers), (size,), generator=generator)
+    return normalize_rows(
+        centers[assignments]
+        + noise * torch.randn(size, embedding_size, generator=generator)
+    )
+
+
+def recall(found: torch.Tensor, expected: torch.Tensor) -> float:
+    return (
+        sum(
+            len(set(found_row.tolist()) & set(expected_row.tolist()))
+            for found_row, expected_row in zip(found, expected)
+        )
+        / expected.numel()
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--embedding-size", type=int, default=384)
+    parser.add_argument("--noise", type=float, default=0.3)
+    parser.add_argument("--number-of-lists", type=int, default=256)
+    parser.add_argument("--number-of-subquantizers", type=int, default=48)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--refine-factor", type=int, nargs="+", default=[1, 4])
+    parser.add_argument(
+        "--encode",
+        action="store_true",
+        help="Encode generated inputs with the embedding model instead of random rows.",
+    )
+    parser.add_argument("--backend", default="minilm")
+    arguments = parser.parse_args()
+
+    generator = torch.Generator().manual_seed(0)
+    if arguments.encode:
+        rows = encode_numbers(
+            make_input(arguments.size + arguments.queries), backend=arguments.backend
+        )
+    else:
+        rows = make_rows(
+            arguments.size + arguments.queries,
+            arguments.embedding_size,
+            arguments.noise,
+            generator,
+        )
+    rows, queries = rows[: arguments.size], rows[arguments.size :]
+
+    table = CatalogTable("benchmark", llm=LLM(), title_embedding=torch.empty(0))
+    table.add_embeddings(torch.arange(arguments.size), rows)
+
+    start = time.perf_counter()
+    _, expected = table.search(queries, arguments.k, exact=True)
+    exact_time = time.perf_counter() - start
+    print(f"exact: {arguments.queries / exact_time:,.0f} queries/s")
+
+    start = time.perf_counter()
+    table.build_index(
+        IVFPQIndex(
+            number_of_lists=arguments.number_of_lists,
+            number_of_subquantizers=arguments.number_of_subquantizers,
+        )
+    )
+    print(f"index built in {time.perf_counter() - start:.1f}s")
+
+    for refine_factor in arguments.refine_factor:
+        for nprobe in arguments.nprobe:
+            start = time.perf_counter()
+            _, found = table.search(
+                queries, arguments.k, nprobe=nprobe, refine_factor=refine_factor
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"nprobe={nprobe} refine_factor={refine_factor}: "
+                f"recall@{arguments.k} {recall(found, expected):.3f}, "
+                f"{arguments.queries / elapsed:,.0f} queries/s, "
+                f"speedup x{exact_time / elapsed:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
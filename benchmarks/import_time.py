@@ -0,0 +1,67 @@
+"""
+Cold import time of a module measured with `python -X importtime`.
+
+    python -m benchmarks.import_time source.encode --budget-ms 4000
+"""
+
+import argparse
+import subprocess
+import sys
+
+
+def measure_import_time(module: str) -> dict[str, int]:
+    """
+    Imports module in a fresh interpreter.
+
+    Parameters
+    ----------
+    module : str
+        Name of the module, e.g. 'source.encode'.
+
+    Returns
+    -------
+    dict[str, int]
+        Mapping from every imported module to its cumulative import time in us.
+    """
+    completed_process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    module_to_cumulative_time = {}
+    for line in completed_process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_time, name = line.removeprefix("import time:").split("|")
+        if cumulative_time.strip().isdigit():
+            module_to_cumulative_time[name.strip()] = int(cumulative_time)
+    return module_to_cumulative_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("module", nargs="?", default="source.encode")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--budget-ms", type=float, help="Exit with error if import is slower."
+    )
+    arguments = parser.parse_args()
+
+    module_to_cumulative_time = measure_import_time(arguments.module)
+    for name, cumulative_time in sorted(
+        module_to_cumulative_time.items(), key=lambda item: -item[1]
+    )[: arguments.top]:
+        print(f"{cumulative_time / 1e3:>10.1f} ms  {name}")
+
+    total_time_in_ms = module_to_cumulative_time[arguments.module] / 1e3
+    if arguments.budget_ms is not None and total_time_in_ms > arguments.budget_ms:
+        sys.exit(
+            f"import {arguments.module} took {total_time_in_ms:.0f} ms, "
+            f"budget is {arguments.budget_ms:.0f} ms."
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Speedup of the int8 dynamically quantized backbone over float32, and cosine
+agreement of their `encode_numbers` output, for every `EmbeddingClasses` member.
+
+Float32 backbone runs through 'minilm' backend and quantized one through
+'minilm-int8', both in inference mode with `--threads` torch threads. Rows that
+are not finite in float32, e.g. logarithmic embeddings of negative numbers, are
+skipped in agreement.
+
+    python -m benchmarks.int8_backbone --size 2000 --threads 4
+    python -m benchmarks.int8_backbone --stub-backbone
+"""
+
+import argparse
+import copy
+
+import numpy as np
+import torch
+
+from benchmarks.suite import StubBackbone, make_input, measure
+from source.encode import encode_numbers
+from source.numeric_representation import (
+    MODEL_REGISTRY,
+    EmbeddingClasses,
+    MinilmBackend,
+    QuantizedMinilmBackend,
+)
+from source.numeric_representation.model_registry import (
+    DEFAULT_MODEL_NAME,
+    QUANTIZED_MODEL_SUFFIX,
+    quantize_linear_layers,
+)
+from source.utils import normalize_rows
+
+
+class LinearStubBackbone(torch.nn.Module):
+    """
+    Stub features passed through a feed forward block of MiniLM size,
+    so that quantization has linear layers to act on.
+    """
+
+    def __init__(self, embedding_size: int = 384, hidden_size: int = 1536) -> None:
+        super().__init__()
+        torch.manual_seed(0)
+        self.features = StubBackbone()
+        self.layers = torch.nn.Sequential(
+            torch.nn.Linear(embedding_size, hidden_size),
+            torch.nn.GELU(),
+            torch.nn.Linear(hidden_size, embedding_size),
+        )
+
+    def encode(self, sentences: list[str]) -> np.ndarray:
+        features = torch.from_numpy(self.features.encode(sentences))
+        return self.layers(features).numpy()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--shape", default="short")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument(
+        "--stub-backbone",
+        action="store_true",
+        help="Replace MiniLM with stub of linear layers, no model download needed.",
+    )
+    arguments = parser.parse_args()
+
+    if arguments.stub_backbone:
+        model = LinearStubBackbone().eval()
+        MODEL_REGISTRY.register(DEFAULT_MODEL_NAME, model)
+        MODEL_REGISTRY.register(
+            DEFAULT_MODEL_NAME + QUANTIZED_MODEL_SUFFIX,
+            quantize_linear_layers(copy.deepcopy(model)),
+        )
+
+    backends = {
+        "float32": MinilmBackend(num_threads=arguments.threads),
+        "int8": QuantizedMinilmBackend(num_threads=arguments.threads),
+    }
+    input = make_input(arguments.shape, arguments.size)
+    print(
+        f"{'embedding type':<16} {'float32/s':>12} {'int8/s':>12} {'speedup':>8} "
+        f"{'mean cos':>10} {'min cos':>10} {'skipped':>8}"
+    )
+    for element in EmbeddingClasses:
+        throughputs, embeddings = {}, {}
+        for dtype, backend in backends.items():
+            throughputs[dtype] = measure(
+                lambda: encode_numbers(
+                    input, embedding_type=element.value, backend=backend
+                ),
+                items_per_call=len(input),
+                repeat=arguments.repeat,
+            )["items_per_second"]
+            embeddings[dtype] = encode_numbers(
+                input, embedding_type=element.value, backend=backend
+            )
+
+        is_finite = embeddings["float32"].isfinite().all(dim=1)
+        cosines = (
+            normalize_rows(embeddings["float32"][is_finite])
+            * normalize_rows(embeddings["int8"][is_finite])
+        ).sum(dim=1)
+        print(
+            f"{element.value:<16} {throughputs['float32']:>12.0f} "
+            f"{throughputs['int8']:>12.0f} "
+            f"{throughputs['int8'] / throughputs['float32']:>8.2f} "
+            f"{cosines.mean().item():>10.4f} {cosines.min().item():>10.4f} "
+            f"{int((~is_finite).sum()):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
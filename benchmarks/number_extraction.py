@@ -0,0 +1,65 @@
+"""
+Compares batch number extraction with the per-element `extract_number` loop.
+
+    python -m benchmarks.number_extraction --size 1000000
+"""
+
+import argparse
+import random
+import time
+
+import torch
+
+from source.numeric_representation import SinusoidalMinilmEmbedding
+from source.utils import extract_numbers
+
+WORDS = ["the", "product", "costs", "dollars", "rated", "stars", "kg", "usd", "n/a"]
+
+
+def make_input(size: int, seed: int = 0) -> list[int | float | str]:
+    generator = random.Random(seed)
+    input: list[int | float | str] = []
+    for _ in range(size):
+        kind = generator.random()
+        number = round(generator.uniform(-1e4, 1e4), generator.randint(0, 3))
+        if kind < 0.2:
+            input.append(number)
+        elif kind < 0.4:
+            input.append(str(number))
+        else:
+            words = generator.choices(WORDS, k=generator.randint(1, 8))
+            if kind < 0.9:
+                words.insert(generator.randint(0, len(words)), str(number))
+            input.append(" ".join(words))
+    return input
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+
+    input = make_input(arguments.size)
+    model = SinusoidalMinilmEmbedding()
+
+    def loop() -> torch.Tensor:
+        return torch.Tensor([model.extract_number(sentence) for sentence in input])
+
+    def batch() -> torch.Tensor:
+        return extract_numbers(input, fallback=model.number_fallback)[0]
+
+    assert torch.equal(loop(), batch()), "Batch extraction differs from the loop."
+
+    for name, function in [("loop", loop), ("batch", batch)]:
+        timings = []
+        for _ in range(arguments.repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"{name:>6}: {best:.3f}s, {arguments.size / best / 1e6:.2f}M elements/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Scaling of `encode_numbers` with the number of worker processes.
+
+    python -m benchmarks.parallel_scaling --size 200000 --workers 1 2 4 8
+"""
+
+import argparse
+import time
+
+import torch
+
+from benchmarks.number_extraction import make_input
+from source.encode import encode_numbers
+from source.parallel import get_executor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--embedding-type", default="sinusoidal")
+    parser.add_argument("--backend", default="minilm")
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+
+    input = make_input(arguments.size)
+    expected = encode_numbers(
+        input, embedding_type=arguments.embedding_type, backend=arguments.backend
+    )
+
+    single_process_time = None
+    for workers in arguments.workers:
+        if workers > 1:
+            # Start pool and load models in workers before timing.
+            get_executor(arguments.embedding_type, workers, arguments.backend)
+            encode_numbers(
+                input[: 4 * workers],
+                embedding_type=arguments.embedding_type,
+                workers=workers,
+                backend=arguments.backend,
+            )
+
+        timings = []
+        for _ in range(arguments.repeat):
+            start = time.perf_counter()
+            embeddings = encode_numbers(
+                input,
+                embedding_type=arguments.embedding_type,
+                workers=workers,
+                backend=arguments.backend,
+            )
+            timings.append(time.perf_counter() - start)
+        torch.testing.assert_close(embeddings, expected)
+
+        best = min(timings)
+        single_process_time = single_process_time or best
+        print(
+            f"workers={workers}: {best:.3f}s, "
+            f"{arguments.size / best:,.0f} inputs/s, "
+            f"speedup x{single_process_time / best:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
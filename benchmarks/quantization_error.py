@@ -0,0 +1,87 @@
+"""
+Cosine error of float16 and int8 output of `encode_numbers` against float32,
+for every `EmbeddingClasses` member.
+
+Reports mean and max of 1 - cos(x, dequantized x) over rows, max error of
+pairwise similarities and bytes per row. Rows that are not finite in float32,
+e.g. logarithmic embeddings of negative numbers, are skipped.
+
+    python -m benchmarks.quantization_error --stub-backbone
+    python -m benchmarks.quantization_error --backend hashing --size 20000
+"""
+
+import argparse
+
+from benchmarks.suite import StubBackbone, make_input
+from source.encode import encode_numbers
+from source.numeric_representation import MODEL_REGISTRY, EmbeddingClasses
+from source.numeric_representation.model_registry import DEFAULT_MODEL_NAME
+from source.quantization import (
+    QuantizedEmbeddings,
+    dequantize_embeddings,
+    quantize_embeddings,
+    quantized_cosine_similarity_matrix,
+)
+from source.utils import normalize_rows, pairwise_cosine_similarity_matrix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--shape", default="short")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument(
+        "--stub-backbone",
+        action="store_true",
+        help="Replace MiniLM with deterministic stub, no model download needed.",
+    )
+    parser.add_argument(
+        "--backend", default="minilm", help="Contextual backend, e.g. 'hashing'."
+    )
+    arguments = parser.parse_args()
+
+    if arguments.stub_backbone:
+        MODEL_REGISTRY.register(DEFAULT_MODEL_NAME, StubBackbone())
+
+    input = make_input(arguments.shape, arguments.size)
+    print(
+        f"{'embedding type':<16} {'dtype':<8} {'bytes/row':>10} "
+        f"{'mean 1-cos':>12} {'max 1-cos':>12} {'max |Δ sim|':>12} {'skipped':>8}"
+    )
+    for element in EmbeddingClasses:
+        embeddings = encode_numbers(
+            input, embedding_type=element.value, backend=arguments.backend
+        )
+        is_finite = embeddings.isfinite().all(dim=1)
+        embeddings = embeddings[is_finite]
+        queries = embeddings[: arguments.queries]
+        expected_similarities = pairwise_cosine_similarity_matrix(queries, embeddings)
+
+        for output_dtype in ["float32", "float16", "int8"]:
+            quantized = quantize_embeddings(embeddings, output_dtype)
+            restored = dequantize_embeddings(quantized)
+            cosine_errors = 1 - (
+                normalize_rows(restored) * normalize_rows(embeddings)
+            ).sum(dim=1)
+            similarity_error = (
+                quantized_cosine_similarity_matrix(queries, quantized)
+                - expected_similarities
+            ).abs()
+            bytes_per_row = (
+                quantized.nbytes
+                if isinstance(quantized, QuantizedEmbeddings)
+                else quantized.numel() * quantized.element_size()
+            ) / len(embeddings)
+            print(
+                f"{element.value:<16} {output_dtype:<8} {bytes_per_row:>10.0f} "
+                f"{cosine_errors.mean().item():>12.2e} "
+                f"{cosine_errors.max().item():>12.2e} "
+                f"{similarity_error.max().item():>12.2e} "
+                f"{int((~is_finite).sum()):>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Offline benchmark suite of the encode pipeline for every `EmbeddingClasses` member.
+
+Sweeps batch sizes and input shapes and reports throughput, p50/p99 latency of
+one call and resident memory. Every case runs in a fresh process, so its peak
+resident memory does not include peaks of earlier cases. Growth is the part of
+the peak reached while running the case, above imports and input setup.
+
+    python -m benchmarks.suite --stub-backbone
+    python -m benchmarks.suite --batch-sizes 1 1024 --json results.json
+"""
+
+import argparse
+import json
+import random
+import resource
+import sys
+import time
+import zlib
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import torch
+
+from source.encode import (
+    encode_number,
+    encode_numbers,
+    encode_numbers_multi,
+    get_embedding_model,
+)
+from source.numeric_representation import MODEL_REGISTRY, EmbeddingClasses
+from source.numeric_representation.model_registry import DEFAULT_MODEL_NAME
+from source.utils import (
+    extract_numbers,
+    pairwise_cosine_similarity_matrix,
+    topk_cosine_similarity,
+)
+
+WORDS = ["the", "product", "costs", "dollars", "rated", "stars", "weight", "in", "kg"]
+
+
+class StubBackbone:
+    """
+    Deterministic stand-in for sentence transformer, embeds sentence from its hash.
+    Lets suite run without downloading a model.
+    """
+
+    embedding_size = 384
+
+    def encode(self, sentences: list[str]) -> np.ndarray:
+        seeds = np.fromiter(
+            (zlib.crc32(sentence.encode()) for sentence in sentences),
+            dtype=np.uint64,
+            count=len(sentences),
+        )
+        columns = np.arange(self.embedding_size, dtype=np.uint64)
+        # Cheap integer hash of (seed, column), mapped to [-1, 1).
+        mixed = (seeds[:, None] * np.uint64(0x9E3779B97F4A7C15)) ^ (
+            columns[None, :] * np.uint64(0xBF58476D1CE4E5B9)
+        )
+        mixed ^= mixed >> np.uint64(31)
+        return (mixed % np.uint64(2**16)).astype(np.float32) / 2**15 - 1
+
+
+def make_input(shape: str, size: int, seed: int = 0) -> list[int | float | str]:
+    generator = random.Random(seed)
+    numbers = [
+        round(generator.uniform(-1e4, 1e4), generator.randint(0, 3))
+        for _ in range(size)
+    ]
+    if shape == "numbers":
+        return numbers  # type: ignore[return-value]
+    if shape == "short":
+        return [f"{number} {generator.choice(WORDS)}" for number in numbers]
+    return [
+        " ".join(generator.choices(WORDS, k=20) + [str(number)] + WORDS)
+        for number in numbers
+    ]
+
+
+def peak_rss_in_megabytes() -> float:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak_rss / 2**20 if sys.platform == "darwin" else peak_rss / 2**10
+
+
+def measure(
+    function: Callable[[], object], items_per_call: int, repeat: int
+) -> dict[str, float]:
+    peak_rss_before = peak_rss_in_megabytes()
+    function()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+
+    latencies_as_array = np.array(latencies)
+    peak_rss = peak_rss_in_megabytes()
+    return {
+        "items_per_second": items_per_call * repeat / latencies_as_array.sum(),
+        "p50_ms": float(np.percentile(latencies_as_array, 50) * 1e3),
+        "p99_ms": float(np.percentile(latencies_as_array, 99) * 1e3),
+        "peak_rss_mb": peak_rss,
+        "rss_growth_mb": peak_rss - peak_rss_before,
+    }
+
+
+def benchmark_cases(
+    batch_sizes: list[int], shapes: list[str], backend: str
+) -> list[tuple[str, int, Callable[[], object]]]:
+    cases: list[tuple[str, int, Callable[[], object]]] = []
+    for shape in shapes:
+        single_input = make_input(shape, 1)[0]
+        for element in EmbeddingClasses:
+            cases.append(
+                (
+                    f"encode_number/{element.value}/{shape}",
+                    1,
+                    lambda input=single_input, type=element.value: encode_number(
+                        input, embedding_type=type, backend=backend
+                    ),
+                )
+            )
+
+        for batch_size in batch_sizes:
+            input = make_input(shape, batch_size)
+            cases.append(
+                (
+                    f"extract_numbers/{shape}/{batch_size}",
+                    batch_size,
+                    lambda input=input: extract_numbers(input),
+                )
+            )
+            for element in EmbeddingClasses:
+                cases.append(
+                    (
+                        f"encode_numbers/{element.value}/{shape}/{batch_size}",
+                        batch_size,
+                        lambda input=input, type=element.value: encode_numbers(
+                            input, embedding_type=type, backend=backend
+                        ),
+                    )
+                )
+            cases.append(
+                (
+                    f"encode_numbers_multi/all/{shape}/{batch_size}",
+                    batch_size,
+                    lambda input=input: encode_numbers_multi(
+                        input,
+                        [element.value for element in EmbeddingClasses],
+                        backend=backend,
+                    ),
+                )
+            )
+
+    for batch_size in batch_sizes:
+        numbers = torch.empty(batch_size).uniform_(-1e4, 1e4)
+        for element in EmbeddingClasses:
+            model = get_embedding_model(element.value, backend)
+            if not hasattr(model, "extract_numerical_embeddings"):
+                continue
+            cases.append(
+                (
+                    f"extract_numerical_embeddings/{element.value}/{batch_size}",
+                    batch_size,
+                    lambda model=model, numbers=numbers: (
+                        model.extract_numerical_embeddings(numbers)
+                    ),
+                )
+            )
+
+        queries, keys = torch.randn(batch_size, 384), torch.randn(1024, 384)
+        cases.append(
+            (
+                f"pairwise_cosine_similarity_matrix/{batch_size}x1024",
+                batch_size,
+                lambda queries=queries, keys=keys: pairwise_cosine_similarity_matrix(
+                    queries, keys
+                ),
+            )
+        )
+        cases.append(
+            (
+                f"topk_cosine_similarity/{batch_size}x1024",
+                batch_size,
+                lambda queries=queries, keys=keys: topk_cosine_similarity(
+                    queries, keys, 10
+                ),
+            )
+        )
+
+    return cases
+
+
+def run_case(
+    name: str,
+    batch_sizes: list[int],
+    shapes: list[str],
+    backend: str,
+    repeat: int,
+    stub_backbone: bool,
+) -> dict[str, float]:
+    """
+    Measures one case, meant to be called in a fresh process.
+    """
+    if stub_backbone:
+        MODEL_REGISTRY.register(DEFAULT_MODEL_NAME, StubBackbone())
+    for case_name, items_per_call, function in benchmark_cases(
+        batch_sizes, shapes, backend
+    ):
+        if case_name == name:
+            return measure(function, items_per_call, repeat)
+    raise RuntimeError(f"Unknown benchmark case {name}.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 1024])
+    parser.add_argument("--shapes", nargs="+", default=["numbers", "short", "long"])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--filter", default="", help="Run cases containing substring.")
+    parser.add_argument(
+        "--stub-backbone",
+        action="store_true",
+        help="Replace MiniLM with deterministic stub, no model download needed.",
+    )
+    parser.add_argument(
+        "--backend", default="minilm", help="Contextual backend, e.g. 'hashing'."
+    )
+    parser.add_argument("--json", help="Write results to this file.")
+    arguments = parser.parse_args()
+
+    results = {}
+    print(
+        f"{'case':<60} {'items/s':>14} {'p50 ms':>10} {'p99 ms':>10} "
+        f"{'RSS MB':>8} {'growth MB':>10}"
+    )
+    for name, _, _ in benchmark_cases(
+        arguments.batch_sizes, arguments.shapes, arguments.backend
+    ):
+        if arguments.filter not in name:
+            continue
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+            result = executor.submit(
+                run_case,
+                name,
+                arguments.batch_sizes,
+                arguments.shapes,
+                arguments.backend,
+                arguments.repeat,
+                arguments.stub_backbone,
+            ).result()
+        results[name] = result
+        print(
+            f"{name:<60} {result['items_per_second']:>14,.0f} "
+            f"{result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+            f"{result['peak_rss_mb']:>8.0f} {result['rss_growth_mb']:>10.0f}"
+        )
+
+    if arguments.json:
+        with open(arguments.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+import torch
+
+
+def _nearest_centroids(
+    x: torch.Tensor, centroids: torch.Tensor, block_size: int = 4096
+) -> torch.Tensor:
+    """
+    Index of the closest, by L2 distance, centroid of every row of x.
+    Works on single matrices and on batches of them, i.e. B x N x D and B x K x D.
+    """
+    is_batched = x.dim() == 3
+    if not is_batched:
+        x, centroids = x.unsqueeze(0), centroids.unsqueeze(0)
+    squared_norms = centroids.square().sum(dim=-1).unsqueeze(-2)
+    assignments = torch.cat(
+        [
+            torch.baddbmm(
+                squared_norms,
+                x[:, start : start + block_size],
+                centroids.transpose(-1, -2),
+                alpha=-2,
+            ).argmin(dim=-1)
+            for start in range(0, x.shape[1], block_size)
+        ],
+        dim=-1,
+    )
+    return assignments if is_batched else assignments[0]
+
+
+def kmeans(
+    x: torch.Tensor,
+    number_of_clusters: int,
+    number_of_iterations: int = 10,
+    max_points_per_cluster: int = 64,
+    generator: torch.Generator | None = None,
+) -> torch.Tensor:
+    """
+    Lloyd's k-means, centroids are initialized by random rows of x.
+    Clusters that become empty keep their previous centroid.
+
+    Parameters
+    ----------
+    x : N x D or B x N x D
+        Points, batch of point sets is clustered independently in one pass.
+
+    number_of_clusters : int
+        Number of centroids, clipped to N.
+
+    number_of_iterations : int
+        Number of assignment and update steps.
+
+    max_points_per_cluster : int
+        Larger inputs are subsampled, centroids barely move with more points.
+
+    generator : torch.Generator | None
+        Source of randomness of initialization and subsampling.
+
+    Returns
+    -------
+    torch.Tensor number_of_clusters x D or B x number_of_clusters x D
+    """
+    is_batched = x.dim() == 3
+    if not is_batched:
+        x = x.unsqueeze(0)
+    batch_size, number_of_points, embedding_size = x.shape
+    number_of_clusters = min(number_of_clusters, number_of_points)
+
+    permutation = torch.randperm(number_of_points, generator=generator)
+    x = x[:, permutation[: max_points_per_cluster * number_of_clusters]]
+    centroids = x[:, :number_of_clusters]
+
+    batch_offsets = torch.arange(batch_size)[:, None] * number_of_clusters
+    for _ in range(number_of_iterations):
+        assignments = (_nearest_centroids(x, centroids) + batch_offsets).flatten()
+        sums = torch.zeros(batch_size * number_of_clusters, embedding_size).index_add_(
+            0, assignments, x.reshape(-1, embedding_size)
+        )
+        counts = torch.bincount(assignments, minlength=batch_size * number_of_clusters)[
+            :, None
+        ]
+        centroids = torch.where(
+            counts > 0, sums / counts.clamp_min(1), centroids.reshape(sums.shape)
+        ).view(batch_size, number_of_clusters, embedding_size)
+
+    return centroids if is_batched else centroids[0]
+
+
+class IVFPQIndex:
+    """
+    Approximate inner product search with inverted file and product quantization.
+
+    Coarse k-means quantizer splits vectors into `number_of_lists` inverted lists.
+    Residual of every vector to its list centroid is split into
+    `number_of_subquantizers` subvectors, each stored as one byte, the id of the
+    closest of `number_of_codewords` centroids of its subspace. Query scans only
+    `nprobe` lists closest to it, scoring codes with per query lookup tables.
+
+    Every inverted list keeps its rows and codes in buffers grown by doubling,
+    so `add` appends in amortized constant time per vector and search scans
+    lists as they are. Search goes list by list, scoring codes of a list for
+    all queries that probe it at once.
+
+    For L2 normalized vectors inner product is cosine similarity.
+    """
+
+    def __init__(
+        self,
+        number_of_lists: int = 256,
+        number_of_subquantizers: int = 8,
+        number_of_codewords: int = 256,
+        nprobe: int = 8,
+        training_sample_size: int = 65536,
+        seed: int = 0,
+    ) -> None:
+        if number_of_codewords > 256:
+            raise RuntimeError(
+                f"{number_of_codewords} codewords do not fit in one byte, "
+                "please choose at most 256."
+            )
+        self.number_of_lists = number_of_lists
+        self.number_of_subquantizers = number_of_subquantizers
+        self.number_of_codewords = number_of_codewords
+        self.nprobe = nprobe
+        self.training_sample_size = training_sample_size
+        self.seed = seed
+
+        self.centroids: torch.Tensor | None = None
+        self.codebooks: torch.Tensor | None = None
+
+        # Buffers of every inverted list, only first `_list_sizes[i]` are used.
+        self._list_rows: list[torch.Tensor] = []
+        self._list_codes: list[torch.Tensor] = []
+        self._list_sizes: list[int] = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return sum(self._list_sizes)
+
+    def train(self, x: torch.Tensor) -> None:
+        """
+        Learns coarse centroids and codebooks of residuals.
+
+        Parameters
+        ----------
+        x : N x D
+            Training vectors, at most `training_sample_size` random rows are used.
+
+        Raises
+        ------
+        RuntimeError
+            If D is not divisible by number of subquantizers or x is empty.
+        """
+        embedding_size = x.shape[1]
+        if embedding_size % self.number_of_subquantizers != 0:
+            raise RuntimeError(
+                f"Embedding size {embedding_size} is not divisible by "
+                f"{self.number_of_subquantizers} subquantizers."
+            )
+        if len(x) == 0:
+            raise RuntimeError("Index can not be trained on empty input.")
+
+        generator = torch.Generator().manual_seed(self.seed)
+        sample = x[
+            torch.randperm(len(x), generator=generator)[: self.training_sample_size]
+        ].float()
+
+        self.centroids = kmeans(sample, self.number_of_lists, generator=generator)
+        residuals = sample - self.centroids[_nearest_centroids(sample, self.centroids)]
+        # One k-means per subspace, M x N x D / M.
+        self.codebooks = kmeans(
+            self._split(residuals).transpose(0, 1),
+            self.number_of_codewords,
+            generator=generator,
+        )
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Removes all vectors, keeping trained quantizers.
+        """
+        number_of_lists = len(self.centroids) if self.centroids is not None else 0
+        self._list_rows = [
+            torch.empty(0, dtype=torch.int64) for _ in range(number_of_lists)
+        ]
+        self._list_codes = [
+            torch.empty(0, self.number_of_subquantizers, dtype=torch.uint8)
+            for _ in range(number_of_lists)
+        ]
+        self._list_sizes = [0] * number_of_lists
+
+    def add(self, rows: torch.Tensor, x: torch.Tensor) -> None:
+        """
+        Encodes vectors and appends them to their inverted lists.
+
+        Parameters
+        ----------
+        rows : torch.Tensor
+            Int64 tensor of shape N with ids returned by search for these vectors.
+
+        x : N x D
+
+        Raises
+        ------
+        RuntimeError
+            If index is not trained.
+        """
+        if not self.is_trained:
+            raise RuntimeError("Index has to be trained before vectors are added.")
+        if len(rows) == 0:
+            return
+        x = x.float()
+        list_ids = _nearest_centroids(x, self.centroids)
+        subvectors = self._split(x - self.centroids[list_ids])
+        codes = _nearest_centroids(subvectors.transpose(0, 1), self.codebooks).T.to(
+            torch.uint8
+        )
+
+        order = torch.argsort(list_ids, stable=True)
+        rows, codes = rows.to(torch.int64)[order], codes[order]
+        end = 0
+        for list_id, size in enumerate(
+            torch.bincount(list_ids, minlength=len(self.centroids)).tolist()
+        ):
+            start, end = end, end + size
+            if size > 0:
+                self._append_to_list(list_id, rows[start:end], codes[start:end])
+
+    def search(
+        self,
+        queries: torch.Tensor,
+        k: int,
+        nprobe: int | None = None,
+        valid: torch.Tensor | None = None,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Finds approximately k vectors with the largest inner product to every query.
+
+        Parameters
+        ----------
+        queries : Q x D
+
+        k : int
+            Number of results per query.
+
+        nprobe : int | None
+            Number of inverted lists scanned per query, `self.nprobe` if None.
+
+        valid : torch.Tensor | None
+            Bool tensor indexed by rows, rows marked False are skipped.
+
+        Returns
+        -------
+        tuple[torch.Tensor, torch.Tensor]
+            Estimated inner products and rows, both of shape Q x k, sorted from
+            largest. Missing results, when scanned lists hold less than k valid
+            vectors, have -inf and row -1.
+        """
+        if not self.is_trained:
+            raise RuntimeError("Index has to be trained before search.")
+
+        queries = queries.float()
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probed_scores, probed_lists = torch.topk(
+            torch.mm(queries, self.centroids.T), nprobe, dim=1
+        )
+        # Inner products of every query subvector with every codeword: Q x M x K.
+        lookup_tables = torch.einsum(
+            "qmd,mkd->qmk", self._split(queries), self.codebooks
+        )
+
+        # Pairs of query and probed list, grouped by list.
+        probed_lists = probed_lists.flatten()
+        order = torch.argsort(probed_lists, stable=True)
+        pair_queries = torch.arange(len(queries)).repeat_interleave(nprobe)[order]
+        pair_scores = probed_scores.flatten()[order]
+        number_of_pairs = torch.bincount(
+            probed_lists, minlength=len(self.centroids)
+        ).tolist()
+
+        values = torch.full((len(queries), k), -torch.inf)
+        rows = torch.full((len(queries), k), -1, dtype=torch.int64)
+        end = 0
+        for list_id, pairs in enumerate(number_of_pairs):
+            start, end = end, end + pairs
+            list_size = self._list_sizes[list_id]
+            if pairs == 0 or list_size == 0:
+                continue
+            list_queries = pair_queries[start:end]
+            list_rows = self._list_rows[list_id][:list_size]
+            list_codes = self._list_codes[list_id][:list_size].long()
+
+            # Score of a code is sum of lookup table entries of its subvectors.
+            scores = pair_scores[start:end, None] + torch.gather(
+                lookup_tables[list_queries],
+                2,
+                list_codes.T.unsqueeze(0).expand(pairs, -1, -1),
+            ).sum(dim=1)
+            if valid is not None:
+                scores.masked_fill_(~valid[list_rows], -torch.inf)
+
+            list_values, positions = torch.topk(scores, min(k, list_size), dim=1)
+            merged_values = torch.cat([values[list_queries], list_values], dim=1)
+            merged_rows = torch.cat([rows[list_queries], list_rows[positions]], dim=1)
+            best_values, best_positions = torch.topk(merged_values, k, dim=1)
+            values[list_queries] = best_values
+            rows[list_queries] = torch.gather(merged_rows, 1, best_positions)
+
+        rows.masked_fill_(values == -torch.inf, -1)
+        return values, rows
+
+    def _split(self, x: torch.Tensor) -> torch.Tensor:
+        return x.reshape(len(x), self.number_of_subquantizers, -1)
+
+    def _append_to_list(
+        self, list_id: int, rows: torch.Tensor, codes: torch.Tensor
+    ) -> None:
+        """
+        Appends rows and codes to an inverted list, doubling its buffers when full.
+        """
+        size = self._list_sizes[list_id]
+        new_size = size + len(rows)
+        if new_size > len(self._list_rows[list_id]):
+            capacity = max(new_size, 2 * len(self._list_rows[list_id]))
+            grown_rows = torch.empty(capacity, dtype=torch.int64)
+            grown_codes = torch.empty(
+                capacity, self.number_of_subquantizers, dtype=torch.uint8
+            )
+            grown_rows[:size] = self._list_rows[list_id][:size]
+            grown_codes[:size] = self._list_codes[list_id][:size]
+            self._list_rows[list_id] = grown_rows
+            self._list_codes[list_id] = grown_codes
+        self._list_rows[list_id][size:new_size] = rows
+        self._list_codes[list_id][size:new_size] = codes
+        self._list_sizes[list_id] = new_size
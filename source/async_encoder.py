@@ -0,0 +1,181 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from source.encode import encode_numbers
+from source.numeric_representation import ContextualBackend
+
+
+class AsyncBatchEncoder:
+    """
+    Asyncio front end of `encode_numbers` for many concurrent single inputs.
+
+    Concurrent `encode` calls are put in a queue and collected into one batch
+    until it has `max_batch_size` inputs or `max_wait_seconds` passed since its
+    first input. Batches run one at a time on a dedicated thread, inputs arriving
+    meanwhile form the next batch, so batches grow with load.
+
+    Example:
+    >>> async with AsyncBatchEncoder() as encoder:
+    ...     embedding = await encoder.encode("12 dollars")
+    """
+
+    def __init__(
+        self,
+        embedding_type: str = "sinusoidal",
+        backend: str | ContextualBackend = "minilm",
+        max_batch_size: int = 256,
+        max_wait_seconds: float = 0.005,
+    ) -> None:
+        self.embedding_type = embedding_type
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+
+        # Number of batches of every size.
+        self.batch_size_histogram: Counter[int] = Counter()
+        # Number of batches by number of inputs left in the queue when they started.
+        self.queue_depth_histogram: Counter[int] = Counter()
+
+        # Pairs of input and future of its caller.
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def __aenter__(self) -> "AsyncBatchEncoder":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """
+        Starts collecting batches in the running event loop, called by first `encode`.
+        """
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="async-batch-encoder"
+        )
+        self._task = asyncio.get_running_loop().create_task(self._collect_batches())
+
+    async def close(self) -> None:
+        """
+        Stops collecting batches, inputs still in the queue are cancelled.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        self._task = self._queue = self._executor = None
+
+    async def encode(self, input: int | float | str) -> torch.Tensor:
+        """
+        Encodes one input as part of a batch with concurrent calls.
+
+        Parameters
+        ----------
+        input : int | float | str
+            Number to be encoded.
+
+        Returns
+        -------
+        torch.Tensor
+            Encoding of the input, row of the batch it was encoded in.
+
+        Raises
+        ------
+        RuntimeError
+            If embedding type is not supported.
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((input, future))
+        return await future
+
+    def statistics(self) -> dict[str, object]:
+        """
+        Current queue depth and histograms of batch sizes and queue depths.
+        """
+        number_of_batches = sum(self.batch_size_histogram.values())
+        number_of_inputs = sum(
+            size * count for size, count in self.batch_size_histogram.items()
+        )
+        return {
+            "queue_depth": self.queue_depth,
+            "number_of_batches": number_of_batches,
+            "mean_batch_size": number_of_inputs / max(number_of_batches, 1),
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "queue_depth_histogram": dict(sorted(self.queue_depth_histogram.items())),
+        }
+
+    async def _collect_batches(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: list[tuple[int | float | str, asyncio.Future]] = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                await self._fill_batch(
+                    batch, deadline=loop.time() + self.max_wait_seconds
+                )
+
+                self.batch_size_histogram[len(batch)] += 1
+                self.queue_depth_histogram[self._queue.qsize()] += 1
+
+                # Exception is passed on without being raised here, its traceback
+                # must not hold this frame, callers may clear frames of it.
+                batch_future = loop.run_in_executor(
+                    self._executor,
+                    self._encode_batch,
+                    [input for input, _ in batch],
+                )
+                await asyncio.wait([batch_future])
+                exception = batch_future.exception()
+                for row, (_, future) in enumerate(batch):
+                    if future.done():
+                        continue
+                    if exception is not None:
+                        future.set_exception(exception)
+                    else:
+                        # Copy, so that a kept row does not hold the whole batch.
+                        future.set_result(batch_future.result()[row].clone())
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+
+    async def _fill_batch(
+        self, batch: list[tuple[int | float | str, asyncio.Future]], deadline: float
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                return
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except TimeoutError:
+                return
+
+    def _encode_batch(self, inputs: list[int | float | str]) -> torch.Tensor:
+        return encode_numbers(
+            inputs, embedding_type=self.embedding_type, backend=self.backend
+        )
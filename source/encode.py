@@ -1,15 +1,25 @@
+from collections.abc import Iterable, Iterator
 from functools import lru_cache
+from itertools import islice
 
+import numpy as np
 import torch
 
+from source.instrumentation import stage
 from source.numeric_representation import (
     BaseNumericModel,
+    ContextualBackend,
+    ContextualEmbeddingCache,
     EmbeddingClasses,
     LoagrithmicMinilmEmbedding,
     MinilmEmbedding,
     SigmoidMinilmEmbedding,
     SinusoidalMinilmEmbedding,
+    get_contextual_backend,
 )
+from source.parallel import encode_numbers_parallel
+from source.quantization import QuantizedEmbeddings, quantize_embeddings
+from source.utils import extract_numbers
 
 EMBEDDING_TYPE_TO_EMBEDDING_CLASS: dict[EmbeddingClasses, type[BaseNumericModel]] = {
     EmbeddingClasses.LANGUAGE_MODEL: MinilmEmbedding,
@@ -20,9 +30,12 @@ EMBEDDING_TYPE_TO_EMBEDDING_CLASS: dict[EmbeddingClasses, type[BaseNumericModel]
 
 
 @lru_cache
-def get_embedding_model(embedding_type: str) -> BaseNumericModel:
+def get_embedding_model(
+    embedding_type: str, backend: str | ContextualBackend = "minilm"
+) -> BaseNumericModel:
     """
     Create embedding model from accessible list of classes.
+    Instances are light, backbone itself is shared through `MODEL_REGISTRY`.
 
     Parameters
     ----------
@@ -30,6 +43,10 @@ def get_embedding_model(embedding_type: str) -> BaseNumericModel:
         Type of embedding models.
         Has to one of 'language_model', 'logarithmic', 'sigmoid', 'sinusoidal'.
 
+    backend : str | ContextualBackend
+        Encoder of contextual information, one of 'minilm', 'minilm-int8', 'hashing'
+        or an instance such as `PrecomputedBackend`.
+
     Returns
     -------
     BaseNumericModel
@@ -42,7 +59,6 @@ def get_embedding_model(embedding_type: str) -> BaseNumericModel:
     """
     try:
         embedding_type_as_enum = EmbeddingClasses(embedding_type)
-        return EMBEDDING_TYPE_TO_EMBEDDING_CLASS[embedding_type_as_enum]()
     except ValueError:
         raise RuntimeError(
             (
@@ -51,10 +67,29 @@ def get_embedding_model(embedding_type: str) -> BaseNumericModel:
             )
         )
 
+    embedding_model = EMBEDDING_TYPE_TO_EMBEDDING_CLASS[embedding_type_as_enum]()
+    embedding_model.contextual_backend = get_contextual_backend(backend)
+    return embedding_model
+
+
+def set_contextual_embedding_cache(cache: ContextualEmbeddingCache | None) -> None:
+    """
+    Enables cache of contextual embeddings for every embedding type.
+
+    Parameters
+    ----------
+    cache : ContextualEmbeddingCache | None
+        Cache shared by all embedding models, None disables caching.
+    """
+    BaseNumericModel.contextual_embedding_cache = cache
+
 
 def encode_number(
-    input: int | str | float, embedding_type: str = "sinusoidal"
-) -> torch.Tensor:
+    input: int | str | float,
+    embedding_type: str = "sinusoidal",
+    backend: str | ContextualBackend = "minilm",
+    output_dtype: str = "float32",
+) -> torch.Tensor | QuantizedEmbeddings:
     """
     Encodes input with embeding from accessible list of classes.
 
@@ -67,43 +102,267 @@ def encode_number(
         Type of embedding models.
         Has to one of 'language_model', 'logarithmic', 'sigmoid', 'sinusoidal'.
 
+    backend : str | ContextualBackend
+        Encoder of contextual information, one of 'minilm', 'minilm-int8', 'hashing'
+        or an instance such as `PrecomputedBackend`.
+
+    output_dtype : str
+        One of 'float32', 'float16' or 'int8', see `quantize_embeddings`.
+
     Returns
     -------
-    torch.Tensor
+    torch.Tensor | QuantizedEmbeddings
         Encoding of a number
 
     Raises
     ------
     RuntimeError
-        If embedding type is not supported it will raise a runtime error.
+        If embedding type or output dtype is not supported.
     """
-    return encode_numbers([input], embedding_type=embedding_type)[0]
+    return encode_numbers(
+        [input],
+        embedding_type=embedding_type,
+        backend=backend,
+        output_dtype=output_dtype,
+    )[0]
 
 
 def encode_numbers(
-    input: list[int | str | float], embedding_type: str = "sinusoidal"
-) -> torch.Tensor:
+    input: list[int | str | float] | np.ndarray | torch.Tensor,
+    embedding_type: str = "sinusoidal",
+    workers: int = 1,
+    backend: str | ContextualBackend = "minilm",
+    output_dtype: str = "float32",
+) -> torch.Tensor | QuantizedEmbeddings:
     """
     Encodes list of inputs with embeding from accessible list of classes.
 
     Parameters
     ----------
-    input: list[int | str | float]
-        Inputs to be encoded.
+    input: list[int | str | float] | np.ndarray | torch.Tensor
+        Inputs to be encoded. Numeric arrays and tensors are used without
+        parsing, only their distinct values are turned into strings for context.
 
     embedding_type : str
         Type of embedding models.
         Has to one of 'language_model', 'logarithmic', 'sigmoid', 'sinusoidal'.
 
+    workers : int
+        Number of processes to split input between, see `encode_numbers_parallel`.
+        By default input is encoded in the current process.
+
+    backend : str | ContextualBackend
+        Encoder of contextual information, one of 'minilm', 'minilm-int8', 'hashing'
+        or an instance such as `PrecomputedBackend`.
+
+    output_dtype : str
+        One of 'float32', 'float16' or 'int8'. Int8 embeddings come with
+        one scale per row, see `quantize_embeddings`.
+
     Returns
     -------
-    torch.Tensor
+    torch.Tensor | QuantizedEmbeddings
         Encoding of a number
 
+    Raises
+    ------
+    RuntimeError
+        If embedding type or output dtype is not supported.
+    """
+    if workers > 1:
+        embeddings = encode_numbers_parallel(
+            input, embedding_type=embedding_type, workers=workers, backend=backend
+        )
+    else:
+        embedding_model = get_embedding_model(embedding_type, backend)
+        embeddings = embedding_model.encode(input)
+    return quantize_embeddings(embeddings, output_dtype)
+
+
+def encode_numbers_multi(
+    input: list[int | str | float] | np.ndarray | torch.Tensor,
+    embedding_types: list[str],
+    backend: str | ContextualBackend = "minilm",
+    output_dtype: str = "float32",
+) -> dict[str, torch.Tensor | QuantizedEmbeddings]:
+    """
+    Encodes inputs with several embedding types at the cost of about one.
+
+    Numbers are extracted once and contextual embeddings are computed once,
+    then every type applies its own numerical transform on top of them.
+    Inputs without a number get fallback of each type, as in `encode_numbers`.
+
+    Example:
+    >>> embeddings = encode_numbers_multi(["12 dollars"], ["sinusoidal", "sigmoid"])
+    >>> embeddings["sigmoid"].shape
+    torch.Size([1, 384])
+
+    Parameters
+    ----------
+    input: list[int | str | float] | np.ndarray | torch.Tensor
+        Inputs to be encoded.
+
+    embedding_types : list[str]
+        Types of embedding models, each one of 'language_model', 'logarithmic',
+        'sigmoid', 'sinusoidal'.
+
+    backend : str | ContextualBackend
+        Encoder of contextual information, one of 'minilm', 'minilm-int8', 'hashing'
+        or an instance such as `PrecomputedBackend`.
+
+    output_dtype : str
+        One of 'float32', 'float16' or 'int8', see `quantize_embeddings`.
+
+    Returns
+    -------
+    dict[str, torch.Tensor | QuantizedEmbeddings]
+        Encodings of inputs by embedding type.
+
+    Raises
+    ------
+    RuntimeError
+        If embedding type or output dtype is not supported.
+    """
+    embedding_models = {
+        embedding_type: get_embedding_model(embedding_type, backend)
+        for embedding_type in embedding_types
+    }
+    if not embedding_models:
+        return {}
+
+    with stage("extract_numbers", len(input)):
+        numbers, found = extract_numbers(input, fallback=torch.nan)
+    # Contextual part does not depend on embedding type, any model computes it.
+    with stage("contextual_embeddings", len(input)):
+        contextual_embeddings = next(
+            iter(embedding_models.values())
+        ).extract_contexctual_embeddings(input)
+
+    embeddings = {}
+    for embedding_type, embedding_model in embedding_models.items():
+        if embedding_model.embedding_type is EmbeddingClasses.LANGUAGE_MODEL:
+            embeddings[embedding_type] = contextual_embeddings
+            continue
+        embeddings[embedding_type] = embedding_model.combine_embeddings(
+            torch.where(found, numbers, embedding_model.number_fallback),
+            contextual_embeddings,
+        )
+    return {
+        embedding_type: quantize_embeddings(embedding, output_dtype)
+        for embedding_type, embedding in embeddings.items()
+    }
+
+
+def encode_numbers_iter(
+    input: Iterable[int | str | float],
+    embedding_type: str = "sinusoidal",
+    chunk_size: int = 10_000,
+    backend: str | ContextualBackend = "minilm",
+) -> Iterator[torch.Tensor]:
+    """
+    Lazily encodes inputs in chunks of fixed size.
+    Only one chunk of input and output is held in memory at a time.
+
+    Parameters
+    ----------
+    input: Iterable[int | str | float]
+        Inputs to be encoded, can be a generator.
+
+    embedding_type : str
+        Type of embedding models.
+        Has to one of 'language_model', 'logarithmic', 'sigmoid', 'sinusoidal'.
+
+    chunk_size : int
+        Number of inputs encoded at once.
+
+    backend : str | ContextualBackend
+        Encoder of contextual information, one of 'minilm', 'minilm-int8', 'hashing'
+        or an instance such as `PrecomputedBackend`.
+
+    Yields
+    ------
+    torch.Tensor
+        Encoding of next chunk of at most `chunk_size` inputs.
+
     Raises
     ------
     RuntimeError
         If embedding type is not supported it will raise a runtime error.
     """
-    embedding_model = get_embedding_model(embedding_type)
-    return embedding_model.encode(input)
+    embedding_model = get_embedding_model(embedding_type, backend)
+    iterator = iter(input)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield embedding_model.encode(chunk)
+
+
+def encode_numbers_to_buffer(
+    input: Iterable[int | str | float],
+    out: np.ndarray | torch.Tensor,
+    embedding_type: str = "sinusoidal",
+    chunk_size: int = 10_000,
+    backend: str | ContextualBackend = "minilm",
+) -> int:
+    """
+    Encodes inputs in chunks of fixed size, writing them straight into `out`.
+
+    Example:
+    >>> out = np.lib.format.open_memmap(
+    ...     "embeddings.npy", mode="w+", dtype=np.float32, shape=(50_000_000, 384)
+    ... )
+    >>> encode_numbers_to_buffer(read_column(), out=out)
+
+    Parameters
+    ----------
+    input: Iterable[int | str | float]
+        Inputs to be encoded, can be a generator.
+
+    out : np.ndarray | torch.Tensor
+        Preallocated float32 buffer of shape N x D, e.g. numpy memmap.
+        Has to have at least as many rows as there are inputs.
+
+    embedding_type : str
+        Type of embedding models.
+        Has to one of 'language_model', 'logarithmic', 'sigmoid', 'sinusoidal'.
+
+    chunk_size : int
+        Number of inputs encoded at once.
+
+    backend : str | ContextualBackend
+        Encoder of contextual information, one of 'minilm', 'minilm-int8', 'hashing'
+        or an instance such as `PrecomputedBackend`.
+
+    Returns
+    -------
+    int
+        Number of written rows.
+
+    Raises
+    ------
+    RuntimeError
+        If embedding type is not supported or `out` is too small.
+    """
+    out_as_tensor = torch.from_numpy(out) if isinstance(out, np.ndarray) else out
+    # Chunks are encoded straight into rows of float32 buffer, other dtypes are
+    # filled through a copy.
+    is_written_in_place = (
+        out_as_tensor.dtype == torch.float32 and out_as_tensor.is_contiguous()
+    )
+
+    embedding_model = get_embedding_model(embedding_type, backend)
+    iterator = iter(input)
+    number_of_written_rows = 0
+    while chunk := list(islice(iterator, chunk_size)):
+        end = number_of_written_rows + len(chunk)
+        if end > len(out_as_tensor):
+            raise RuntimeError(
+                f"Output buffer has {len(out_as_tensor)} rows, "
+                "but there are more inputs to encode."
+            )
+        rows = out_as_tensor[number_of_written_rows:end]
+        if is_written_in_place:
+            embedding_model.encode(chunk, out=rows)
+        else:
+            rows.copy_(embedding_model.encode(chunk))
+        number_of_written_rows = end
+
+    return number_of_written_rows
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+
+# Called with name of a stage, its wall time in seconds and number of items.
+StageCallback = Callable[[str, float, int], None]
+
+_callbacks: list[StageCallback] = []
+_disabled_stage = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("name", "number_of_items", "start")
+
+    def __init__(self, name: str, number_of_items: int) -> None:
+        self.name = name
+        self.number_of_items = number_of_items
+
+    def __enter__(self) -> "_Stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self.start
+        for callback in _callbacks:
+            callback(self.name, elapsed, self.number_of_items)
+
+
+def stage(name: str, number_of_items: int = 0) -> _Stage | nullcontext:
+    """
+    Measures wall time of a block of code as a named stage.
+    Without callbacks returns a shared no-op context, so disabled
+    instrumentation costs one function call per stage.
+
+    Example:
+    >>> with stage("extract_numbers", len(input)):
+    ...     numbers, _ = extract_numbers(input)
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage, e.g. 'contextual/backend_encode'.
+
+    number_of_items : int
+        Number of items processed by the stage.
+
+    Returns
+    -------
+    _Stage | nullcontext
+    """
+    if not _callbacks:
+        return _disabled_stage
+    return _Stage(name, number_of_items)
+
+
+def count(name: str, number_of_items: int) -> None:
+    """
+    Reports counter without wall time, e.g. cache hits, as a stage taking 0 seconds.
+    """
+    for callback in _callbacks:
+        callback(name, 0.0, number_of_items)
+
+
+def add_callback(callback: StageCallback) -> None:
+    _callbacks.append(callback)
+
+
+def remove_callback(callback: StageCallback) -> None:
+    _callbacks.remove(callback)
+
+
+class StageStatistics:
+    """
+    Accumulates number of calls, wall time and items of every stage.
+    Can be used as a callback from several threads.
+    """
+
+    def __init__(self) -> None:
+        self.calls: dict[str, int] = {}
+        self.seconds: dict[str, float] = {}
+        self.items: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, name: str, seconds: float, number_of_items: int) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.items[name] = self.items.get(name, 0) + number_of_items
+
+    def as_dict(self) -> dict[str, dict[str, float]]:
+        """
+        Statistics of every stage, in order of first report.
+
+        Returns
+        -------
+        dict[str, dict[str, float]]
+            Mapping from name of the stage to its calls, seconds and items.
+        """
+        with self._lock:
+            return {
+                name: {
+                    "calls": self.calls[name],
+                    "seconds": self.seconds[name],
+                    "items": self.items[name],
+                }
+                for name in self.calls
+            }
+
+    def report(self) -> str:
+        """
+        Table of stages with their calls, items, wall time and throughput.
+        Stages nest, e.g. 'contextual/backend_encode' is a part of
+        'contextual_embeddings', so times do not add up.
+        """
+        lines = [f"{'stage':<32} {'calls':>8} {'items':>10} {'ms':>10} {'items/s':>12}"]
+        for name, stage_statistics in self.as_dict().items():
+            seconds = stage_statistics["seconds"]
+            throughput = stage_statistics["items"] / seconds if seconds else 0
+            lines.append(
+                f"{name:<32} {stage_statistics['calls']:>8} "
+                f"{stage_statistics['items']:>10} {seconds * 1000:>10.2f} "
+                f"{throughput:>12.0f}"
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def instrument(
+    callback: StageCallback | None = None,
+) -> Iterator[StageCallback]:
+    """
+    Enables instrumentation within a block.
+
+    Example:
+    >>> with instrument() as statistics:
+    ...     encode_numbers(input)
+    >>> print(statistics.report())
+
+    Parameters
+    ----------
+    callback : StageCallback | None
+        Function receiving every stage, new `StageStatistics` if None.
+
+    Yields
+    ------
+    StageCallback
+        The callback.
+    """
+    callback = callback if callback is not None else StageStatistics()
+    add_callback(callback)
+    try:
+        yield callback
+    finally:
+        remove_callback(callback)
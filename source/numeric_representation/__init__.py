@@ -1,10 +1,58 @@
-"Sub-package for integer or float representation"
+"""
+Sub-package for integer or float representation
+
+Attributes are imported on first access, so that importing the package,
+e.g. for `EmbeddingClasses`, does not load torch or model dependencies.
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+from .embedding_classes import EmbeddingClasses
+
+if TYPE_CHECKING:
+    from .base_numeric_model import BaseNumericModel
+    from .contextual_backends import (
+        ContextualBackend,
+        HashingBackend,
+        MinilmBackend,
+        PrecomputedBackend,
+        QuantizedMinilmBackend,
+        get_contextual_backend,
+    )
+    from .embedding_cache import ContextualEmbeddingCache
+    from .lm_embedding import MinilmEmbedding
+    from .logarithmic_embedding import LoagrithmicMinilmEmbedding
+    from .model_registry import MODEL_REGISTRY, ModelRegistry, get_sentence_transformer
+    from .sigmoid_embedding import SigmoidMinilmEmbedding
+    from .sinusoidal_embedding import SinusoidalMinilmEmbedding
+
+_ATTRIBUTE_TO_MODULE = {
+    "BaseNumericModel": ".base_numeric_model",
+    "ContextualBackend": ".contextual_backends",
+    "HashingBackend": ".contextual_backends",
+    "MinilmBackend": ".contextual_backends",
+    "PrecomputedBackend": ".contextual_backends",
+    "QuantizedMinilmBackend": ".contextual_backends",
+    "get_contextual_backend": ".contextual_backends",
+    "ContextualEmbeddingCache": ".embedding_cache",
+    "MinilmEmbedding": ".lm_embedding",
+    "LoagrithmicMinilmEmbedding": ".logarithmic_embedding",
+    "MODEL_REGISTRY": ".model_registry",
+    "ModelRegistry": ".model_registry",
+    "get_sentence_transformer": ".model_registry",
+    "SigmoidMinilmEmbedding": ".sigmoid_embedding",
+    "SinusoidalMinilmEmbedding": ".sinusoidal_embedding",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _ATTRIBUTE_TO_MODULE:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_ATTRIBUTE_TO_MODULE[name], __name__), name)
+    globals()[name] = value
+    return value
 
-from .base_numeric_model import BaseNumericModel, EmbeddingClasses
-from .lm_embedding import MinilmEmbedding
-from .logarithmic_embedding import LoagrithmicMinilmEmbedding
-from .sigmoid_embedding import SigmoidMinilmEmbedding
-from .sinusoidal_embedding import SinusoidalMinilmEmbedding
 
 __all__ = [
     "BaseNumericModel",
@@ -13,4 +61,14 @@ __all__ = [
     "SigmoidMinilmEmbedding",
     "MinilmEmbedding",
     "EmbeddingClasses",
+    "ModelRegistry",
+    "ContextualEmbeddingCache",
+    "ContextualBackend",
+    "MinilmBackend",
+    "HashingBackend",
+    "PrecomputedBackend",
+    "QuantizedMinilmBackend",
+    "get_contextual_backend",
+    "MODEL_REGISTRY",
+    "get_sentence_transformer",
 ]
@@ -1,28 +1,236 @@
-from enum import Enum
+from itertools import compress
 
+import numpy as np
 import torch
 
+from source.instrumentation import stage
+from source.utils import as_numeric_array, extract_numbers, mask_numbers
+
+from .contextual_backends import ContextualBackend, MinilmBackend
+from .embedding_cache import ContextualEmbeddingCache
+from .embedding_classes import EmbeddingClasses
+
 
 class BaseNumericModel:
     """
     Base class to template common methods.
     """
 
+    embedding_type: EmbeddingClasses
+    embedding_size: int = 384
+    number_fallback: float = -1
+    contextual_backend: ContextualBackend = MinilmBackend()
+    contextual_embedding_cache: ContextualEmbeddingCache | None = None
+
+    # Instrumentation of in-batch deduplication of contextual inputs.
+    number_of_contextual_inputs: int = 0
+    number_of_unique_contextual_inputs: int = 0
+
     def __init__(self): ...
 
-    def encode(self, input: list[int | float | str]) -> torch.Tensor:
+    @property
+    def deduplication_ratio(self) -> float:
+        """
+        Share of contextual inputs that were not sent to the backbone
+        because they repeated within their batch.
         """
-        Method that encodes input in embedding space.
+        if self.number_of_contextual_inputs == 0:
+            return 0.0
+        return 1 - (
+            self.number_of_unique_contextual_inputs / self.number_of_contextual_inputs
+        )
+
+    @property
+    def sentence_transformer(self):
+        """
+        Backbone shared between all embedding classes, loaded on first use.
+        Only available with `MinilmBackend`.
+        """
+        return self.contextual_backend.sentence_transformer
+
+    def encode(
+        self,
+        input: list[int | float | str] | np.ndarray | torch.Tensor,
+        out: torch.Tensor | None = None,
+    ) -> torch.Tensor:
+        """
+        Method that encodes input in embedding space,
+        writing into `out` instead of a new tensor if it is given.
         """
         ...
 
+    def combine_embeddings(
+        self,
+        numbers: torch.Tensor,
+        contextual_embeddings: torch.Tensor,
+        out: torch.Tensor | None = None,
+    ) -> torch.Tensor:
+        """
+        Combines numerical embeddings of numbers with contextual embeddings,
+        given either per number or as one row broadcast over all of them.
 
-class EmbeddingClasses(Enum):
-    """
-    Accesible embedding types.
-    """
+        Raises
+        ------
+        RuntimeError
+            If embedding does not encode numbers separately from context.
+        """
+        raise RuntimeError(
+            f"{self.embedding_type.value} embedding does not encode numbers "
+            "separately from their context."
+        )
+
+    def encode_column(
+        self,
+        header: str | None,
+        values: list[int | float | str] | np.ndarray | torch.Tensor,
+        mask: str = "<number>",
+        out: torch.Tensor | None = None,
+    ) -> torch.Tensor:
+        """
+        Encodes a column of a table, whose cells share context and differ in numbers.
+
+        Context of every cell is the header followed by the cell with its number
+        replaced by `mask`, e.g. 'price costs <number> dollars'. Each distinct
+        context is embedded once, numeric cells share one, so a numeric column
+        costs one call of the contextual backend.
+
+        Example:
+        >>> model.encode_column("price in dollars", [12, 7.5, "23"])
+
+        Parameters
+        ----------
+        header : str | None
+            Shared context of the column, e.g. its header and unit.
+
+        values : list[int | float | str] | np.ndarray | torch.Tensor
+            Cells of the column, numeric arrays share one context.
+
+        mask : str
+            Replacement of numbers in contexts.
+
+        out : torch.Tensor | None
+            Preallocated float32 tensor of shape N x 384 to write result into.
+
+        Returns
+        -------
+        torch.Tensor
+
+        Raises
+        ------
+        RuntimeError
+            If embedding does not encode numbers separately from context.
+        """
+        with stage("extract_numbers", len(values)):
+            numbers, _ = extract_numbers(values, fallback=self.number_fallback)
+        with stage("column_contexts", len(values)):
+            contexts, inverse_indices = self._column_contexts(header, values, mask)
+        with stage("contextual_embeddings", len(contexts)):
+            contextual_embeddings = self.extract_contexctual_embeddings(contexts)
+        if len(contexts) > 1:
+            contextual_embeddings = contextual_embeddings[
+                torch.from_numpy(inverse_indices)
+            ]
+        return self.combine_embeddings(numbers, contextual_embeddings, out=out)
+
+    @staticmethod
+    def _column_contexts(
+        header: str | None,
+        values: list[int | float | str] | np.ndarray | torch.Tensor,
+        mask: str,
+    ) -> tuple[list[str], np.ndarray]:
+        """
+        Distinct contexts of cells of a column and index of context of every cell.
+        """
+        prefix = f"{header} " if header else ""
+        number_of_values = len(values)
+        if as_numeric_array(values) is not None:
+            return [prefix + mask], np.zeros(number_of_values, dtype=np.int64)
+
+        is_string = np.fromiter(
+            (type(value) is str for value in values),
+            dtype=bool,
+            count=number_of_values,
+        )
+        # Numeric cells share the template made of mask alone.
+        template_to_position = {} if is_string.all() else {mask: 0}
+        inverse_indices = np.zeros(number_of_values, dtype=np.int64)
+        inverse_indices[is_string] = [
+            template_to_position.setdefault(template, len(template_to_position))
+            for template in mask_numbers(list(compress(values, is_string)), mask)
+        ]
+        return [prefix + template for template in template_to_position], inverse_indices
+
+    def extract_contexctual_embeddings(
+        self, input: list[int | float | str] | np.ndarray | torch.Tensor
+    ) -> torch.Tensor:
+        """
+        Encodes contextual information of input.
+        Every distinct lowercased input is embedded once by `contextual_backend`,
+        going through `contextual_embedding_cache` if one is set.
+
+        Parameters
+        ----------
+        input : list[int | float | str] | np.ndarray | torch.Tensor
+            Input to be encoded. Numeric arrays are converted to strings
+            only after deduplication.
+
+        Returns
+        -------
+        torch.Tensor
+        """
+        with stage("contextual/lowercase", len(input)):
+            unique_input_as_string, inverse_indices = self._unique_contexts(input)
+
+        self.number_of_contextual_inputs += len(input)
+        self.number_of_unique_contextual_inputs += len(unique_input_as_string)
+
+        with stage("contextual/backend_encode", len(unique_input_as_string)):
+            if self.contextual_embedding_cache is None:
+                embedding_as_numpy_array = self.contextual_backend.encode(
+                    unique_input_as_string
+                )
+            else:
+                embedding_as_numpy_array = self.contextual_embedding_cache.get_or_compute(
+                    namespace=f"{self.embedding_type.value}-{self.contextual_backend.name}",
+                    keys=unique_input_as_string,
+                    compute=self.contextual_backend.encode,
+                )
+
+        with stage("contextual/from_numpy", len(input)):
+            if inverse_indices is None:
+                return torch.from_numpy(embedding_as_numpy_array)
+            return torch.from_numpy(embedding_as_numpy_array[inverse_indices])
+
+    @staticmethod
+    def _unique_contexts(
+        input: list[int | float | str] | np.ndarray | torch.Tensor,
+    ) -> tuple[list[str], np.ndarray | None]:
+        """
+        Distinct lowercased inputs and index of every input among them,
+        None if inputs are already distinct and in order.
+        """
+        numeric_input = as_numeric_array(input)
+        if numeric_input is not None:
+            unique_numbers, inverse_indices = np.unique(
+                numeric_input, return_inverse=True
+            )
+            # Numpy scalars are formatted with the shortest repr of their own
+            # dtype, e.g. float32 0.1 as '0.1', same as python numbers in lists.
+            # tolist would widen float32 to python floats, '0.10000000149011612'.
+            return [str(number).lower() for number in unique_numbers], inverse_indices
+
+        input_as_string = [str(sentence).lower() for sentence in input]
+        unique_input_as_string = list(dict.fromkeys(input_as_string))
+        if len(unique_input_as_string) == len(input_as_string):
+            return unique_input_as_string, None
 
-    LANGUAGE_MODEL = "language_model"
-    LOGARTIHMIC = "logarithmic"
-    SIGMOID = "sigmoid"
-    SINUSOIDAL = "sinusoidal"
+        unique_input_to_position = {
+            sentence: position
+            for position, sentence in enumerate(unique_input_as_string)
+        }
+        inverse_indices = np.fromiter(
+            map(unique_input_to_position.__getitem__, input_as_string),
+            dtype=np.int64,
+            count=len(input_as_string),
+        )
+        return unique_input_as_string, inverse_indices
@@ -0,0 +1,275 @@
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from .model_registry import (
+    DEFAULT_MODEL_NAME,
+    QUANTIZED_MODEL_SUFFIX,
+    get_sentence_transformer,
+)
+
+
+class ContextualBackend:
+    """
+    Base class of encoders of contextual information, maps sentences to vectors.
+    """
+
+    name: str
+    embedding_size: int = 384
+
+    def load(self) -> None:
+        """
+        Loads everything needed for encoding, so that first call is not slower.
+        """
+
+    def encode(self, sentences: list[str]) -> np.ndarray:
+        """
+        Encodes sentences.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            Lowercased sentences.
+
+        Returns
+        -------
+        np.ndarray
+            Float32 array of shape len(sentences) x embedding_size.
+        """
+        raise NotImplementedError
+
+
+class MinilmBackend(ContextualBackend):
+    """
+    Sentence transformer shared through the model registry.
+    Encoding runs in inference mode.
+
+    Number of torch intra-op threads is a setting of the whole process, so
+    `num_threads`, if given, is applied once, on load or first encode, and
+    stays in effect for every later torch call. Changing it around every
+    encode would race with encodes running in other threads.
+    """
+
+    def __init__(
+        self, model_name: str = DEFAULT_MODEL_NAME, num_threads: int | None = None
+    ) -> None:
+        self.model_name = model_name
+        self.num_threads = num_threads
+        self.registry_name = model_name
+        self.name = "minilm" if model_name == DEFAULT_MODEL_NAME else model_name
+        self._is_number_of_threads_set = False
+
+    @property
+    def sentence_transformer(self):
+        return get_sentence_transformer(self.registry_name)
+
+    def load(self) -> None:
+        self._set_number_of_threads()
+        _ = self.sentence_transformer
+
+    def encode(self, sentences: list[str]) -> np.ndarray:
+        self._set_number_of_threads()
+        with torch.inference_mode():
+            return self.sentence_transformer.encode(sentences)
+
+    def _set_number_of_threads(self) -> None:
+        if self.num_threads is not None and not self._is_number_of_threads_set:
+            torch.set_num_threads(self.num_threads)
+            self._is_number_of_threads_set = True
+
+
+class QuantizedMinilmBackend(MinilmBackend):
+    """
+    Sentence transformer with linear layers dynamically quantized to int8, for CPU.
+    Shared through the registry under name of the model with suffix ':int8',
+    next to, not instead of, its float32 version.
+    """
+
+    def __init__(
+        self, model_name: str = DEFAULT_MODEL_NAME, num_threads: int | None = None
+    ) -> None:
+        super().__init__(model_name, num_threads)
+        self.registry_name = model_name + QUANTIZED_MODEL_SUFFIX
+        self.name = f"{self.name}-int8"
+
+
+class HashingBackend(ContextualBackend):
+    """
+    Signed feature hashing of character n-grams, no model and no startup cost.
+
+    Every n-gram of a sentence, padded with boundary markers, is hashed to one of
+    `embedding_size` buckets with a random sign. Rows are L2 normalized, like
+    embeddings of all-MiniLM-L6-v2.
+    """
+
+    _PRIME = np.uint64(0x100000001B3)
+    _MIXER = np.uint64(0x9E3779B97F4A7C15)
+
+    def __init__(
+        self, embedding_size: int = 384, ngram_sizes: tuple[int, ...] = (2, 3, 4)
+    ) -> None:
+        self.embedding_size = embedding_size
+        self.ngram_sizes = ngram_sizes
+        self.name = f"hashing-{embedding_size}-{'-'.join(map(str, ngram_sizes))}"
+
+    def encode(self, sentences: list[str]) -> np.ndarray:
+        number_of_sentences = len(sentences)
+        padded_sentences = "".join(f"\x02{sentence}\x03" for sentence in sentences)
+        codes = np.frombuffer(
+            padded_sentences.encode("utf-32-le"), dtype=np.uint32
+        ).astype(np.uint64)
+        lengths = np.fromiter(
+            map(len, sentences), dtype=np.int64, count=number_of_sentences
+        )
+        sentence_ids = np.repeat(np.arange(number_of_sentences), lengths + 2)
+
+        buckets = np.zeros(number_of_sentences * self.embedding_size)
+        for ngram_size in self.ngram_sizes:
+            number_of_windows = len(codes) - ngram_size + 1
+            if number_of_windows <= 0:
+                continue
+            # Windows must not cross boundaries of sentences.
+            window_sentence_ids = sentence_ids[:number_of_windows]
+            is_valid = window_sentence_ids == sentence_ids[ngram_size - 1 :]
+
+            hashes = np.full(number_of_windows, np.uint64(ngram_size))
+            with np.errstate(over="ignore"):
+                for offset in range(ngram_size):
+                    hashes = (
+                        hashes * self._PRIME
+                        + codes[offset : offset + number_of_windows]
+                    )
+                hashes *= self._MIXER
+            hashes ^= hashes >> np.uint64(29)
+
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+            bucket_ids = (hashes % np.uint64(self.embedding_size)).astype(np.int64)
+            buckets += np.bincount(
+                window_sentence_ids[is_valid] * self.embedding_size
+                + bucket_ids[is_valid],
+                weights=signs[is_valid],
+                minlength=len(buckets),
+            )
+
+        embeddings = buckets.reshape(number_of_sentences, self.embedding_size)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return (embeddings / np.maximum(norms, 1e-10)).astype(np.float32)
+
+
+class PrecomputedBackend(ContextualBackend):
+    """
+    Lookup table of embeddings precomputed for a fixed set of sentences,
+    e.g. column labels. Table is stored in a directory as `keys.json` and
+    memory-mapped `embeddings.npy`.
+
+    Name, used as namespace of cached embeddings, identifies the resolved
+    directory, the version of its files and the fallback, so tables of
+    different directories with the same name do not share cache entries.
+    """
+
+    def __init__(
+        self, directory: str | Path, fallback: ContextualBackend | None = None
+    ) -> None:
+        self.directory = Path(directory)
+        self.fallback = fallback
+        self.name = self._get_name()
+
+        keys = json.loads((self.directory / "keys.json").read_text(encoding="utf-8"))
+        self.embeddings = np.load(self.directory / "embeddings.npy", mmap_mode="r")
+        self.embedding_size = self.embeddings.shape[1]
+        self.key_to_row = {key: row for row, key in enumerate(keys)}
+
+    def _get_name(self) -> str:
+        directory = self.directory.resolve()
+        identity = [str(directory), getattr(self.fallback, "name", "")]
+        for file_name in ["keys.json", "embeddings.npy"]:
+            file_statistics = (directory / file_name).stat()
+            identity += [str(file_statistics.st_size), str(file_statistics.st_mtime_ns)]
+        digest = hashlib.blake2b("\0".join(identity).encode(), digest_size=8)
+        return f"precomputed-{directory.name}-{digest.hexdigest()}"
+
+    @staticmethod
+    def save(
+        directory: str | Path, sentences: list[str], embeddings: np.ndarray
+    ) -> None:
+        """
+        Writes lookup table to a directory.
+
+        Parameters
+        ----------
+        directory : str | Path
+            Directory of the table, created if it does not exist.
+
+        sentences : list[str]
+            Keys of the table, lowercased as every contextual input.
+
+        embeddings : np.ndarray
+            Embeddings of sentences, of shape len(sentences) x D.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / "keys.json").write_text(
+            json.dumps([sentence.lower() for sentence in sentences]), encoding="utf-8"
+        )
+        np.save(directory / "embeddings.npy", np.asarray(embeddings, np.float32))
+
+    def encode(self, sentences: list[str]) -> np.ndarray:
+        rows = np.fromiter(
+            (self.key_to_row.get(sentence, -1) for sentence in sentences),
+            dtype=np.int64,
+            count=len(sentences),
+        )
+        is_missing = rows == -1
+        if not is_missing.any():
+            return np.array(self.embeddings[rows])
+
+        missing_sentences = [
+            sentence for sentence, missing in zip(sentences, is_missing) if missing
+        ]
+        if self.fallback is None:
+            raise KeyError(
+                f"{missing_sentences[:5]} are not in precomputed table {self.directory}."
+            )
+
+        embeddings = np.empty((len(sentences), self.embedding_size), np.float32)
+        embeddings[~is_missing] = self.embeddings[rows[~is_missing]]
+        embeddings[is_missing] = self.fallback.encode(missing_sentences)
+        return embeddings
+
+
+CONTEXTUAL_BACKENDS: dict[str, type[ContextualBackend]] = {
+    "minilm": MinilmBackend,
+    "minilm-int8": QuantizedMinilmBackend,
+    "hashing": HashingBackend,
+}
+
+
+def get_contextual_backend(backend: str | ContextualBackend) -> ContextualBackend:
+    """
+    Resolves backend given by name or instance.
+
+    Parameters
+    ----------
+    backend : str | ContextualBackend
+        One of 'minilm', 'minilm-int8', 'hashing', or an instance, e.g. `PrecomputedBackend`.
+
+    Returns
+    -------
+    ContextualBackend
+
+    Raises
+    ------
+    RuntimeError
+        If backend name is not supported.
+    """
+    if isinstance(backend, ContextualBackend):
+        return backend
+    if backend not in CONTEXTUAL_BACKENDS:
+        raise RuntimeError(
+            f"{backend} is not a valid contextual backend, "
+            f"please choose one of {list(CONTEXTUAL_BACKENDS)}."
+        )
+    return CONTEXTUAL_BACKENDS[backend]()
@@ -0,0 +1,289 @@
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from itertools import compress
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows, appends of concurrent processes are not locked.
+    fcntl = None
+
+from source.instrumentation import count
+
+
+class _DiskTier:
+    """
+    Append only storage of embeddings for one namespace, shared between processes.
+
+    Keys are stored as json lines in `keys.jsonl`, vectors as raw float32 rows in
+    `vectors.f32` which is read back through a memory map. Row of a key is its
+    line number. Appends hold an exclusive lock on `lock` and write vectors before
+    keys, so every complete key line has its row. Keys appended by other
+    processes are picked up by `refresh`.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.keys_path = directory / "keys.jsonl"
+        self.vectors_path = directory / "vectors.f32"
+        self.meta_path = directory / "meta.json"
+        self.lock_path = directory / "lock"
+
+        self.embedding_size: int | None = None
+        self.key_to_row: dict[str, int] = {}
+        self.number_of_rows = 0
+        self.vectors: np.memmap | None = None
+        # Bytes of keys file already read into `key_to_row`.
+        self._keys_offset = 0
+
+        with self._locked():
+            self._repair()
+        self.refresh()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read_embedding_size(self) -> None:
+        if self.embedding_size is None and self.meta_path.exists():
+            self.embedding_size = json.loads(self.meta_path.read_text())[
+                "embedding_size"
+            ]
+
+    def _repair(self) -> None:
+        """
+        Drops rows left incomplete by an interrupted process, called under lock.
+        """
+        self._read_embedding_size()
+        if self.embedding_size is None or not self.keys_path.exists():
+            return
+        content = self.keys_path.read_bytes()
+        lines = content[: content.rfind(b"\n") + 1].splitlines(keepends=True)
+
+        row_size = self.embedding_size * np.dtype(np.float32).itemsize
+        vectors_size = (
+            self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        )
+        number_of_rows = min(len(lines), vectors_size // row_size)
+        if number_of_rows < len(lines) or sum(map(len, lines)) < len(content):
+            self.keys_path.write_bytes(b"".join(lines[:number_of_rows]))
+        with open(self.vectors_path, "ab") as vectors_file:
+            vectors_file.truncate(number_of_rows * row_size)
+
+    def refresh(self) -> None:
+        """
+        Reads keys appended since last refresh, by this or other processes.
+        """
+        self._read_embedding_size()
+        if (
+            self.embedding_size is None
+            or not self.keys_path.exists()
+            or self.keys_path.stat().st_size == self._keys_offset
+        ):
+            return
+        with open(self.keys_path, "rb") as keys_file:
+            keys_file.seek(self._keys_offset)
+            new_lines = keys_file.read()
+        # Last line may still be being written.
+        new_lines = new_lines[: new_lines.rfind(b"\n") + 1]
+        for line in new_lines.splitlines():
+            self.key_to_row.setdefault(json.loads(line), self.number_of_rows)
+            self.number_of_rows += 1
+        self._keys_offset += len(new_lines)
+        self._map_vectors()
+
+    def _map_vectors(self) -> None:
+        if self.number_of_rows == 0 or self.embedding_size is None:
+            self.vectors = None
+            return
+        self.vectors = np.memmap(
+            self.vectors_path,
+            dtype=np.float32,
+            mode="r",
+            shape=(self.number_of_rows, self.embedding_size),
+        )
+
+    def get(self, key: str) -> np.ndarray | None:
+        row = self.key_to_row.get(key)
+        if row is None or self.vectors is None:
+            return None
+        return np.array(self.vectors[row])
+
+    def append(self, keys: list[str], vectors: np.ndarray) -> None:
+        with self._locked():
+            self.refresh()
+            if self.embedding_size is None:
+                self.embedding_size = vectors.shape[1]
+                # Without meta file no rows were written, drop leftovers if any.
+                self.vectors_path.write_bytes(b"")
+                self.keys_path.write_text("", encoding="utf-8")
+                self.meta_path.write_text(
+                    json.dumps({"embedding_size": self.embedding_size})
+                )
+
+            # Other processes may have written some of the keys meanwhile.
+            is_new = np.fromiter(
+                (key not in self.key_to_row for key in keys),
+                dtype=bool,
+                count=len(keys),
+            )
+            if not is_new.any():
+                return
+
+            row_size = self.embedding_size * np.dtype(np.float32).itemsize
+            with open(self.vectors_path, "ab") as vectors_file:
+                # Rows of a process interrupted before writing its keys are dropped.
+                vectors_file.truncate(self.number_of_rows * row_size)
+                vectors_file.write(
+                    np.ascontiguousarray(vectors[is_new], dtype=np.float32).tobytes()
+                )
+            with open(self.keys_path, "a", encoding="utf-8") as keys_file:
+                keys_file.writelines(
+                    json.dumps(key) + "\n" for key in compress(keys, is_new)
+                )
+            self.refresh()
+
+
+class ContextualEmbeddingCache:
+    """
+    Two tier cache of contextual embeddings keyed by embedding type and lowercased input.
+
+    First tier is an in-memory LRU bounded by `max_entries`. Second, optional, tier
+    lives in `directory` as memory-mapped files, so restarted processes start warm.
+    """
+
+    def __init__(
+        self, max_entries: int = 100_000, directory: str | Path | None = None
+    ) -> None:
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory is not None else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()
+        self._disk_tiers: dict[str, _DiskTier] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def statistics(self) -> dict[str, int]:
+        """
+        Hit and miss counters of the cache.
+
+        Returns
+        -------
+        dict[str, int]
+            Memory hits, disk hits, misses and current number of entries in memory.
+        """
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": len(self._memory),
+        }
+
+    def clear(self) -> None:
+        """
+        Empties in-memory tier and resets counters. Disk tier is left untouched.
+        """
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def get_or_compute(
+        self,
+        namespace: str,
+        keys: list[str],
+        compute: Callable[[list[str]], np.ndarray],
+    ) -> np.ndarray:
+        """
+        Looks up embeddings of keys, computing the missing ones in one call.
+
+        Parameters
+        ----------
+        namespace : str
+            Namespace of the keys, e.g. embedding type.
+
+        keys : list[str]
+            Lowercased inputs.
+
+        compute : Callable[[list[str]], np.ndarray]
+            Function returning embeddings of shape len(keys) x D for given keys.
+
+        Returns
+        -------
+        np.ndarray
+            Embeddings of shape len(keys) x D, in order of keys.
+        """
+        hits = disk_hits = misses = 0
+        with self._lock:
+            rows: list[np.ndarray | None] = [None] * len(keys)
+            missing_key_to_positions: dict[str, list[int]] = {}
+            disk_tier = self._get_disk_tier(namespace)
+            if disk_tier is not None:
+                # Other processes sharing the directory may have added keys.
+                disk_tier.refresh()
+
+            for position, key in enumerate(keys):
+                vector = self._memory.get((namespace, key))
+                if vector is not None:
+                    self._memory.move_to_end((namespace, key))
+                    hits += 1
+                elif (
+                    disk_tier is not None and (vector := disk_tier.get(key)) is not None
+                ):
+                    self._put_in_memory(namespace, key, vector)
+                    disk_hits += 1
+                else:
+                    missing_key_to_positions.setdefault(key, []).append(position)
+                    misses += 1
+                    continue
+                rows[position] = vector
+
+            if missing_key_to_positions:
+                missing_keys = list(missing_key_to_positions)
+                computed = np.asarray(compute(missing_keys), dtype=np.float32)
+                for key, vector in zip(missing_keys, computed):
+                    vector = vector.copy()
+                    self._put_in_memory(namespace, key, vector)
+                    for position in missing_key_to_positions[key]:
+                        rows[position] = vector
+                if disk_tier is not None:
+                    disk_tier.append(missing_keys, computed)
+
+            self.hits += hits
+            self.disk_hits += disk_hits
+            self.misses += misses
+
+        count("cache/hits", hits)
+        count("cache/disk_hits", disk_hits)
+        count("cache/misses", misses)
+
+        if not rows:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(rows)
+
+    def _put_in_memory(self, namespace: str, key: str, vector: np.ndarray) -> None:
+        self._memory[(namespace, key)] = vector
+        self._memory.move_to_end((namespace, key))
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _get_disk_tier(self, namespace: str) -> _DiskTier | None:
+        if self.directory is None:
+            return None
+        if namespace not in self._disk_tiers:
+            self._disk_tiers[namespace] = _DiskTier(self.directory / namespace)
+        return self._disk_tiers[namespace]
@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class EmbeddingClasses(Enum):
+    """
+    Accesible embedding types.
+    """
+
+    LANGUAGE_MODEL = "language_model"
+    LOGARTIHMIC = "logarithmic"
+    SIGMOID = "sigmoid"
+    SINUSOIDAL = "sinusoidal"
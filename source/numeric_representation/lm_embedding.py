@@ -1,7 +1,8 @@
+import numpy as np
 import torch
-from sentence_transformers import SentenceTransformer
 
-from source.numeric_representation import BaseNumericModel
+from source.instrumentation import stage
+from source.numeric_representation import BaseNumericModel, EmbeddingClasses
 
 
 class MinilmEmbedding(torch.nn.Module, BaseNumericModel):
@@ -9,42 +10,34 @@ class MinilmEmbedding(torch.nn.Module, BaseNumericModel):
     Simple embedding with small lanuage model
     """
 
+    embedding_type = EmbeddingClasses.LANGUAGE_MODEL
+
     def __init__(self) -> None:
         super().__init__()
-        self.sentence_transformer = SentenceTransformer("all-MiniLM-L6-v2")
 
-    def encode(self, input: list[int | float | str]) -> torch.Tensor:
+    def encode(
+        self,
+        input: list[int | float | str] | np.ndarray | torch.Tensor,
+        out: torch.Tensor | None = None,
+    ) -> torch.Tensor:
         """
         Encodes contextual and numerical information of input
 
         Parameters
         ----------
-        input : list[int  |  float  |  str]
-            Input to be encoded.
-
-        Returns
-        -------
-        torch.Tensor
-        """
-        contextual_embeddings = self.extract_contexctual_embeddings(input)
+        input : list[int | float | str] | np.ndarray | torch.Tensor
+            Input to be encoded, numeric arrays are used without parsing.
 
-        return contextual_embeddings
-
-    def extract_contexctual_embeddings(
-        self, input: list[int | float | str]
-    ) -> torch.Tensor:
-        """
-        Encodes contextual information of input
-
-        Parameters
-        ----------
-        input : list[int  |  float  |  str]
-            Input to be encoded.
+        out : torch.Tensor | None
+            Preallocated float32 tensor of shape N x 384 to write result into.
 
         Returns
         -------
         torch.Tensor
         """
-        input_as_string = [str(sentence).lower() for sentence in input]
-        embedding_as_numpy_array = self.sentence_transformer.encode(input_as_string)
-        return torch.from_numpy(embedding_as_numpy_array)
+        with stage("contextual_embeddings", len(input)):
+            contextual_embeddings = self.extract_contexctual_embeddings(input)
+        if out is None:
+            return contextual_embeddings
+        with stage("combine", len(input)):
+            return out.copy_(contextual_embeddings)
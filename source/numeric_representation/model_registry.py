@@ -0,0 +1,243 @@
+import threading
+import time
+import warnings
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+import torch
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+# Registry names ending with it are served with int8 linear layers.
+QUANTIZED_MODEL_SUFFIX = ":int8"
+
+
+def quantize_linear_layers(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Replaces linear layers of model, in place, with dynamically quantized ones.
+    Weights are stored as int8, activations are quantized per batch at runtime,
+    which speeds up CPU inference of transformers with little loss of accuracy.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Float32 model on CPU.
+
+    Returns
+    -------
+    torch.nn.Module
+        The same model.
+    """
+    # Eager mode quantization is deprecated in favour of torchao, not a dependency.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        warnings.simplefilter("ignore", UserWarning)
+        return torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+
+
+def load_sentence_transformer(model_name: str) -> "SentenceTransformer":
+    """
+    Default loader of the registry, builds sentence transformer by name.
+    sentence_transformers takes seconds to import, so it is imported only here.
+
+    Parameters
+    ----------
+    model_name : str
+        Name of the model on the hub, e.g. 'all-MiniLM-L6-v2'. With suffix
+        ':int8' model is loaded on CPU and its linear layers are quantized.
+
+    Returns
+    -------
+    SentenceTransformer
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if model_name.endswith(QUANTIZED_MODEL_SUFFIX):
+        model = SentenceTransformer(
+            model_name.removesuffix(QUANTIZED_MODEL_SUFFIX), device="cpu"
+        )
+        return quantize_linear_layers(model.eval())
+    return SentenceTransformer(model_name)
+
+
+class ModelRegistry:
+    """
+    Process wide storage of backbone models.
+
+    Models are loaded once on first use and shared between every embedding class
+    that asks for the same name. Models that were not used for a while can be
+    unloaded with `unload_idle`.
+
+    Registry lock only guards lookups, models are loaded under a lock of their
+    own name, so loading one model does not stall users of loaded ones.
+    """
+
+    def __init__(
+        self, loader: Callable[[str], Any] = load_sentence_transformer
+    ) -> None:
+        self.loader = loader
+        self._models: dict[str, Any] = {}
+        self._last_used: dict[str, float] = {}
+        self._lock = threading.Lock()
+        # One per model name, held while the model is being loaded.
+        self._loading_locks: dict[str, threading.Lock] = {}
+
+    def get(self, model_name: str, loader: Callable[[str], Any] | None = None) -> Any:
+        """
+        Returns model by name, loads it if it is not loaded yet.
+
+        Parameters
+        ----------
+        model_name : str
+            Name of the model.
+
+        loader : Callable[[str], Any] | None
+            Function used to build model instead of the default registry loader.
+
+        Returns
+        -------
+        Any
+            Shared instance of the model.
+        """
+        with self._lock:
+            model = self._get_loaded(model_name)
+            if model is not None:
+                return model
+            loading_lock = self._loading_locks.setdefault(model_name, threading.Lock())
+
+        with loading_lock:
+            # Another thread may have loaded it while this one waited.
+            with self._lock:
+                model = self._get_loaded(model_name)
+            if model is not None:
+                return model
+
+            model = (loader or self.loader)(model_name)
+            with self._lock:
+                # Model registered during loading takes precedence.
+                model = self._models.setdefault(model_name, model)
+                self._last_used[model_name] = time.monotonic()
+            return model
+
+    def _get_loaded(self, model_name: str) -> Any:
+        """
+        Loaded model marked as used, None if it is not loaded. Called under lock.
+        """
+        model = self._models.get(model_name)
+        if model is not None:
+            self._last_used[model_name] = time.monotonic()
+        return model
+
+    def register(self, model_name: str, model: Any) -> None:
+        """
+        Puts already built model in the registry, replacing loaded one if any.
+
+        Parameters
+        ----------
+        model_name : str
+            Name under which model will be shared.
+
+        model : Any
+            Instance of the model.
+        """
+        with self._lock:
+            self._models[model_name] = model
+            self._last_used[model_name] = time.monotonic()
+
+    def is_loaded(self, model_name: str) -> bool:
+        return model_name in self._models
+
+    def unload(self, model_name: str) -> bool:
+        """
+        Removes model from the registry.
+
+        Parameters
+        ----------
+        model_name : str
+            Name of the model.
+
+        Returns
+        -------
+        bool
+            True if model was loaded.
+        """
+        with self._lock:
+            self._last_used.pop(model_name, None)
+            return self._models.pop(model_name, None) is not None
+
+    def unload_idle(self, max_idle_seconds: float) -> list[str]:
+        """
+        Removes models that were not used for more than `max_idle_seconds`.
+
+        Parameters
+        ----------
+        max_idle_seconds : float
+            Idle time after which model is unloaded.
+
+        Returns
+        -------
+        list[str]
+            Names of unloaded models.
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle_model_names = [
+                model_name
+                for model_name, last_used in self._last_used.items()
+                if now - last_used > max_idle_seconds
+            ]
+            for model_name in idle_model_names:
+                del self._models[model_name]
+                del self._last_used[model_name]
+        return idle_model_names
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._last_used.clear()
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Reports number of bytes held by parameters and buffers of every loaded model.
+
+        Returns
+        -------
+        dict[str, int]
+            Mapping from model name to resident size in bytes.
+        """
+        with self._lock:
+            models = list(self._models.items())
+
+        return {
+            model_name: _module_size_in_bytes(model) for model_name, model in models
+        }
+
+
+def _module_size_in_bytes(model: Any) -> int:
+    if not isinstance(model, torch.nn.Module):
+        return 0
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+def get_sentence_transformer(model_name: str = DEFAULT_MODEL_NAME) -> Any:
+    """
+    Shared sentence transformer from the default registry.
+
+    Parameters
+    ----------
+    model_name : str
+        Name of the model, defaults to 'all-MiniLM-L6-v2'.
+
+    Returns
+    -------
+    SentenceTransformer
+    """
+    return MODEL_REGISTRY.get(model_name)
@@ -1,7 +1,9 @@
+import numpy as np
 import torch
-from sentence_transformers import SentenceTransformer
 
-from source.numeric_representation import BaseNumericModel
+from source.instrumentation import stage
+from source.numeric_representation import BaseNumericModel, EmbeddingClasses
+from source.utils import extract_numbers
 
 
 class SigmoidMinilmEmbedding(torch.nn.Module, BaseNumericModel):
@@ -9,50 +11,72 @@ class SigmoidMinilmEmbedding(torch.nn.Module, BaseNumericModel):
     Embedding with small lanuage model and numerical information encoded as sigmoid of logarithm of value.
     """
 
+    embedding_type = EmbeddingClasses.SIGMOID
+    number_fallback = -1
+
     def __init__(self) -> None:
         super().__init__()
-        self.sentence_transformer = SentenceTransformer("all-MiniLM-L6-v2")
         self.embedding_size = 384
 
-    def encode(self, input: list[int | float | str]) -> torch.Tensor:
+    def encode(
+        self,
+        input: list[int | float | str] | np.ndarray | torch.Tensor,
+        out: torch.Tensor | None = None,
+    ) -> torch.Tensor:
         """
         Encodes contextual and numerical information of input
 
         Parameters
         ----------
-        input : list[int  |  float  |  str]
-            Input to be encoded.
+        input : list[int | float | str] | np.ndarray | torch.Tensor
+            Input to be encoded, numeric arrays are used without parsing.
+
+        out : torch.Tensor | None
+            Preallocated float32 tensor of shape N x 384 to write result into.
 
         Returns
         -------
         torch.Tensor
         """
-        numbers_from_inputs = torch.Tensor(
-            [self.extract_number(sentence) for sentence in input]
+        with stage("extract_numbers", len(input)):
+            numbers_from_inputs, _ = extract_numbers(
+                input, fallback=self.number_fallback
+            )
+        with stage("contextual_embeddings", len(input)):
+            contextual_embeddings = self.extract_contexctual_embeddings(input)
+
+        return self.combine_embeddings(
+            numbers_from_inputs, contextual_embeddings, out=out
         )
-        numerical_embeddings = self.extract_numerical_embeddings(numbers_from_inputs)
-        contextual_embeddings = self.extract_contexctual_embeddings(input)
-
-        return numerical_embeddings * contextual_embeddings
 
-    def extract_contexctual_embeddings(
-        self, input: list[int | float | str]
+    def combine_embeddings(
+        self,
+        numbers: torch.Tensor,
+        contextual_embeddings: torch.Tensor,
+        out: torch.Tensor | None = None,
     ) -> torch.Tensor:
         """
-        Encodes contextual information of input
+        Scales contextual embeddings by numerical embeddings of numbers.
 
         Parameters
         ----------
-        input : list[int  |  float  |  str]
-            Input to be encoded.
+        numbers : torch.Tensor
+            Float tensor of shape N.
+
+        contextual_embeddings : torch.Tensor
+            Tensor of shape N x 384 or 1 x 384, broadcast over numbers.
+
+        out : torch.Tensor | None
+            Preallocated float32 tensor of shape N x 384 to write result into.
 
         Returns
         -------
         torch.Tensor
         """
-        input_as_string = [str(sentence).lower() for sentence in input]
-        embedding_as_numpy_array = self.sentence_transformer.encode(input_as_string)
-        return torch.from_numpy(embedding_as_numpy_array)
+        with stage("numerical_embeddings", len(numbers)):
+            numerical_embeddings = self.extract_numerical_embeddings(numbers)
+        with stage("combine", len(numbers)):
+            return torch.mul(numerical_embeddings, contextual_embeddings, out=out)
 
     def extract_number(self, input: int | float | str) -> float:
         """
@@ -62,7 +86,7 @@ class SigmoidMinilmEmbedding(torch.nn.Module, BaseNumericModel):
         Parameters
         ----------
         input : int | float | str
-            Sentence containing a number. If no number found returns -1.
+            Sentence containing a number. If no number found returns `number_fallback`.
 
         Returns
         -------
@@ -77,9 +101,11 @@ class SigmoidMinilmEmbedding(torch.nn.Module, BaseNumericModel):
         else:
             return float(input)
 
-        return -1
+        return self.number_fallback
 
-    def extract_numerical_embeddings(self, input: torch.Tensor) -> torch.Tensor:
+    def extract_numerical_embeddings(
+        self, input: torch.Tensor, out: torch.Tensor | None = None
+    ) -> torch.Tensor:
         """
         Sigmoid type embedding of logarithm of input. e.g. sigmoid(log(input + 1))
 
@@ -88,9 +114,12 @@ class SigmoidMinilmEmbedding(torch.nn.Module, BaseNumericModel):
         x : torch.FloatTensor
             torch tensor of shape N with numbers as float or int.
 
+        out : torch.Tensor | None
+            Preallocated float32 tensor of shape N x 1 to write result into.
+
         Returns
         -------
         torch.Tensor
         """
-        extended_input = input.unsqueeze(1)
-        return 2 - 1 / (2 + extended_input)
+        output = torch.add(input.unsqueeze(1), 2, out=out)
+        return output.reciprocal_().neg_().add_(2)
@@ -1,7 +1,9 @@
+import numpy as np
 import torch
-from sentence_transformers import SentenceTransformer
 
-from source.numeric_representation import BaseNumericModel
+from source.instrumentation import stage
+from source.numeric_representation import BaseNumericModel, EmbeddingClasses
+from source.utils import extract_numbers
 
 
 class SinusoidalMinilmEmbedding(torch.nn.Module, BaseNumericModel):
@@ -9,10 +11,12 @@ class SinusoidalMinilmEmbedding(torch.nn.Module, BaseNumericModel):
     Embedding with small lanuage model and sinusoidal type embedding.
     """
 
+    embedding_type = EmbeddingClasses.SINUSOIDAL
+    number_fallback = 0
+
     def __init__(self) -> None:
         super().__init__()
 
-        self.sentence_transformer = SentenceTransformer("all-MiniLM-L6-v2")
         self.embedding_size = 384
 
         # Compute coefficients for sinusoidal embedding
@@ -27,51 +31,66 @@ class SinusoidalMinilmEmbedding(torch.nn.Module, BaseNumericModel):
         # Cache computation for sinusoidal embedding
         self.division_term = torch.exp(log_division_term)
 
-    def encode(self, input: list[int | float | str]) -> torch.Tensor:
+    def encode(
+        self,
+        input: list[int | float | str] | np.ndarray | torch.Tensor,
+        out: torch.Tensor | None = None,
+    ) -> torch.Tensor:
         """
         Encodes contextual and numerical information of input
 
         Parameters
         ----------
-        input : list[int  |  float  |  str]
-            Input to be encoded.
+        input : list[int | float | str] | np.ndarray | torch.Tensor
+            Input to be encoded, numeric arrays are used without parsing.
+
+        out : torch.Tensor | None
+            Preallocated float32 tensor of shape N x 384 to write result into.
 
         Returns
         -------
         torch.Tensor
         """
-        numbers_from_inputs = torch.Tensor(
-            [self.extract_number(sentence) for sentence in input]
+        with stage("extract_numbers", len(input)):
+            numbers_from_inputs, _ = extract_numbers(
+                input, fallback=self.number_fallback
+            )
+        with stage("contextual_embeddings", len(input)):
+            contextual_embeddings = self.extract_contexctual_embeddings(input)
+
+        return self.combine_embeddings(
+            numbers_from_inputs, contextual_embeddings, out=out
         )
 
-        numerical_embeddings = self.extract_numerical_embeddings(
-            input=numbers_from_inputs
-        )
-
-        contextual_embeddings = self.extract_contexctual_embeddings(input)
-
-        return (
-            numerical_embeddings + contextual_embeddings
-        )  # Follow transformer implementation
-
-    def extract_contexctual_embeddings(
-        self, input: list[int | float | str]
+    def combine_embeddings(
+        self,
+        numbers: torch.Tensor,
+        contextual_embeddings: torch.Tensor,
+        out: torch.Tensor | None = None,
     ) -> torch.Tensor:
         """
-        Encodes contextual information of input
+        Adds sinusoidal embeddings of numbers to contextual embeddings.
 
         Parameters
         ----------
-        input : list[int  |  float  |  str]
-            Input to be encoded.
+        numbers : torch.Tensor
+            Float tensor of shape N.
+
+        contextual_embeddings : torch.Tensor
+            Tensor of shape N x 384 or 1 x 384, broadcast over numbers.
+
+        out : torch.Tensor | None
+            Preallocated float32 tensor of shape N x 384 to write result into.
 
         Returns
         -------
         torch.Tensor
         """
-        input_as_string = [str(sentence).lower() for sentence in input]
-        embedding_as_numpy_array = self.sentence_transformer.encode(input_as_string)
-        return torch.from_numpy(embedding_as_numpy_array)
+        # Follow transformer implementation, sum is accumulated in place.
+        with stage("numerical_embeddings", len(numbers)):
+            output = self.extract_numerical_embeddings(input=numbers, out=out)
+        with stage("combine", len(numbers)):
+            return output.add_(contextual_embeddings)
 
     def extract_number(self, input: int | float | str) -> float:
         """
@@ -81,7 +100,7 @@ class SinusoidalMinilmEmbedding(torch.nn.Module, BaseNumericModel):
         Parameters
         ----------
         input : int | float | str
-            Sentence containing a number. If no number found returns -1.
+            Sentence containing a number. If no number found returns `number_fallback`.
 
         Returns
         -------
@@ -96,9 +115,11 @@ class SinusoidalMinilmEmbedding(torch.nn.Module, BaseNumericModel):
         else:
             return float(input)
 
-        return 0
+        return self.number_fallback
 
-    def extract_numerical_embeddings(self, input: torch.Tensor) -> torch.Tensor:
+    def extract_numerical_embeddings(
+        self, input: torch.Tensor, out: torch.Tensor | None = None
+    ) -> torch.Tensor:
         """
         Sinusoidal encoding from original transformers paper.
 
@@ -114,12 +135,16 @@ class SinusoidalMinilmEmbedding(torch.nn.Module, BaseNumericModel):
         x : torch.FloatTensor
             torch tensor of shape N with numbers as float or int.
 
+        out : torch.Tensor | None
+            Preallocated float32 tensor of shape N x 384 to write result into.
+
         Returns
         -------
         torch.Tensor
         """
-        sinusoid_arguments = input.unsqueeze(1) + 1 * self.division_term
-        output = torch.empty_like(sinusoid_arguments)
-        output[:, ::2] = torch.sin(sinusoid_arguments[:, ::2])
-        output[:, 1::2] = torch.cos(sinusoid_arguments[:, 1::2])
+        # Arguments are written straight into output, then even and odd columns
+        # are turned into sines and cosines in place.
+        output = torch.add(input.unsqueeze(1), self.division_term, out=out)
+        output[:, ::2].sin_()
+        output[:, 1::2].cos_()
         return output
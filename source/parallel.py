@@ -0,0 +1,196 @@
+import atexit
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from source.numeric_representation import (
+    BaseNumericModel,
+    ContextualBackend,
+    ContextualEmbeddingCache,
+)
+
+# Embedding model of a worker process, built once by `_initialize_worker`.
+_worker_embedding_model: BaseNumericModel | None = None
+
+# Max entries and directory of the contextual embedding cache, None if disabled.
+CacheConfiguration = tuple[int, Path | None] | None
+
+_executors: dict[
+    tuple[str, str | ContextualBackend, int, CacheConfiguration], ProcessPoolExecutor
+] = {}
+
+
+def _get_cache_configuration() -> CacheConfiguration:
+    cache = BaseNumericModel.contextual_embedding_cache
+    if cache is None:
+        return None
+    return cache.max_entries, cache.directory
+
+
+def _initialize_worker(
+    embedding_type: str,
+    backend: str | ContextualBackend,
+    number_of_threads: int,
+    cache_configuration: CacheConfiguration,
+) -> None:
+    from source.encode import get_embedding_model, set_contextual_embedding_cache
+
+    global _worker_embedding_model
+    torch.set_num_threads(number_of_threads)
+    if cache_configuration is not None:
+        set_contextual_embedding_cache(ContextualEmbeddingCache(*cache_configuration))
+    _worker_embedding_model = get_embedding_model(embedding_type, backend)
+    # Load backbone now, so that first chunk does not pay for it.
+    _worker_embedding_model.contextual_backend.load()
+
+
+def _encode_chunk_into_shared_memory(
+    shared_memory_name: str,
+    shape: tuple[int, int],
+    start: int,
+    input: list[int | float | str],
+) -> None:
+    shared_memory = SharedMemory(name=shared_memory_name)
+    try:
+        output = np.ndarray(shape, dtype=np.float32, buffer=shared_memory.buf)
+        _worker_embedding_model.encode(
+            input, out=torch.from_numpy(output[start : start + len(input)])
+        )
+        del output
+    finally:
+        shared_memory.close()
+
+
+def get_executor(
+    embedding_type: str, workers: int, backend: str | ContextualBackend = "minilm"
+) -> ProcessPoolExecutor:
+    """
+    Process pool where every worker holds its own embedding model.
+    Pools are created once per embedding type, backend, number of workers
+    and configuration of the contextual embedding cache.
+
+    Every worker gets its own in-memory cache of the size set with
+    `set_contextual_embedding_cache`. Disk tier, if the cache has a directory,
+    is shared by workers and the parent process.
+
+    Parameters
+    ----------
+    embedding_type : str
+        Type of embedding models.
+
+    workers : int
+        Number of worker processes.
+
+    backend : str | ContextualBackend
+        Encoder of contextual information, has to be picklable.
+
+    Returns
+    -------
+    ProcessPoolExecutor
+    """
+    cache_configuration = _get_cache_configuration()
+    key = (embedding_type, backend, workers, cache_configuration)
+    if key not in _executors:
+        _executors[key] = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_initialize_worker,
+            initargs=(
+                embedding_type,
+                backend,
+                max(1, (os.cpu_count() or 1) // workers),
+                cache_configuration,
+            ),
+        )
+    return _executors[key]
+
+
+@atexit.register
+def shutdown_executors() -> None:
+    """
+    Stops all worker processes.
+    """
+    for executor in _executors.values():
+        executor.shutdown(cancel_futures=True)
+    _executors.clear()
+
+
+def encode_numbers_parallel(
+    input: list[int | str | float] | np.ndarray | torch.Tensor,
+    embedding_type: str = "sinusoidal",
+    workers: int = 2,
+    chunk_size: int | None = None,
+    backend: str | ContextualBackend = "minilm",
+) -> torch.Tensor:
+    """
+    Encodes list of inputs, splitting it between a pool of worker processes.
+    Workers write embeddings into shared memory, so only inputs are pickled.
+    Contextual embeddings are cached in workers as configured in the parent,
+    see `get_executor`.
+
+    Parameters
+    ----------
+    input: list[int | str | float] | np.ndarray | torch.Tensor
+        Inputs to be encoded.
+
+    embedding_type : str
+        Type of embedding models.
+        Has to one of 'language_model', 'logarithmic', 'sigmoid', 'sinusoidal'.
+
+    workers : int
+        Number of worker processes.
+
+    chunk_size : int | None
+        Number of inputs sent to a worker at once.
+        By default input is split into four chunks per worker.
+
+    backend : str | ContextualBackend
+        Encoder of contextual information, has to be picklable.
+
+    Returns
+    -------
+    torch.Tensor
+        Encoding of inputs, in the same order as inputs.
+    """
+    from source.encode import get_embedding_model
+
+    embedding_size = get_embedding_model(embedding_type, backend).embedding_size
+    shape = (len(input), embedding_size)
+    if len(input) == 0:
+        return torch.empty(shape)
+
+    if chunk_size is None:
+        chunk_size = math.ceil(len(input) / (4 * workers))
+
+    executor = get_executor(embedding_type, workers, backend)
+    shared_memory = SharedMemory(
+        create=True, size=len(input) * embedding_size * np.dtype(np.float32).itemsize
+    )
+    try:
+        futures = [
+            executor.submit(
+                _encode_chunk_into_shared_memory,
+                shared_memory.name,
+                shape,
+                start,
+                input[start : start + chunk_size],
+            )
+            for start in range(0, len(input), chunk_size)
+        ]
+        for future in futures:
+            future.result()
+
+        output = np.ndarray(shape, dtype=np.float32, buffer=shared_memory.buf)
+        embeddings = torch.from_numpy(output.copy())
+        del output
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+    return embeddings
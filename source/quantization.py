@@ -0,0 +1,164 @@
+import torch
+
+from source.utils import normalize_rows, topk_cosine_similarity
+
+OUTPUT_DTYPE_TO_TORCH_DTYPE = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+    "int8": torch.int8,
+}
+
+
+class QuantizedEmbeddings:
+    """
+    Int8 embeddings with one float32 scale per row, `values * scales` restores them.
+
+    Scales are chosen per row as max(|x|) / 127, so every row uses the full
+    int8 range. Cosine similarity does not depend on scales at all.
+    """
+
+    def __init__(self, values: torch.Tensor, scales: torch.Tensor) -> None:
+        self.values = values
+        self.scales = scales
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index) -> "QuantizedEmbeddings":
+        return QuantizedEmbeddings(self.values[index], self.scales[index])
+
+    @property
+    def shape(self) -> torch.Size:
+        return self.values.shape
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.values.numel() * self.values.element_size()
+            + self.scales.numel() * self.scales.element_size()
+        )
+
+    def dequantize(self) -> torch.Tensor:
+        return self.values.float() * self.scales.unsqueeze(-1)
+
+
+def quantize_embeddings(
+    embeddings: torch.Tensor, output_dtype: str = "float32"
+) -> torch.Tensor | QuantizedEmbeddings:
+    """
+    Converts float32 embeddings to a compact form.
+
+    Parameters
+    ----------
+    embeddings : N x D
+
+    output_dtype : str
+        One of 'float32', 'float16' or 'int8'.
+
+    Returns
+    -------
+    torch.Tensor | QuantizedEmbeddings
+        Float tensor for 'float32' and 'float16', int8 values with per row
+        scales for 'int8'.
+
+    Raises
+    ------
+    RuntimeError
+        If output dtype is not supported.
+    """
+    if output_dtype == "float32":
+        return embeddings.float()
+    if output_dtype == "float16":
+        return embeddings.half()
+    if output_dtype == "int8":
+        scales = embeddings.abs().amax(dim=-1).clamp_min(1e-12) / 127
+        values = torch.round(embeddings / scales.unsqueeze(-1)).to(torch.int8)
+        return QuantizedEmbeddings(values, scales.float())
+    raise RuntimeError(
+        f"{output_dtype} is not a valid output dtype, "
+        f"please choose one of {list(OUTPUT_DTYPE_TO_TORCH_DTYPE)}."
+    )
+
+
+def dequantize_embeddings(
+    embeddings: torch.Tensor | QuantizedEmbeddings,
+) -> torch.Tensor:
+    """
+    Converts embeddings in any output dtype back to float32.
+    """
+    if isinstance(embeddings, QuantizedEmbeddings):
+        return embeddings.dequantize()
+    return embeddings.float()
+
+
+def _values_for_cosine(embeddings: torch.Tensor | QuantizedEmbeddings) -> torch.Tensor:
+    # Cosine similarity is invariant to per row scales, they are not needed.
+    if isinstance(embeddings, QuantizedEmbeddings):
+        return embeddings.values
+    return embeddings
+
+
+def quantized_cosine_similarity_matrix(
+    x1: torch.Tensor | QuantizedEmbeddings,
+    x2: torch.Tensor | QuantizedEmbeddings,
+    row_block_size: int = 4096,
+) -> torch.Tensor:
+    """
+    Pairwise cosine similarity of embeddings in any output dtype.
+
+    Per row scales of int8 embeddings are ignored, as cosine does not depend
+    on them. Values are converted to float32 and normalized, x1 at once and x2
+    in blocks of `row_block_size` rows, so x2 is never converted as a whole.
+
+    Parameters
+    ----------
+    x1 : N x D
+    x2 : M x D
+
+    row_block_size : int
+        Number of rows of x2 converted at once.
+
+    Returns
+    -------
+    torch.Tensor N x M
+    """
+    queries = normalize_rows(_values_for_cosine(x1).float())
+    rows = _values_for_cosine(x2)
+    similarities = torch.empty(len(queries), len(rows))
+    for row_start in range(0, len(rows), row_block_size):
+        row_block = normalize_rows(rows[row_start : row_start + row_block_size].float())
+        similarities[:, row_start : row_start + len(row_block)] = torch.mm(
+            queries, row_block.T
+        )
+    return similarities
+
+
+def quantized_topk_cosine_similarity(
+    x1: torch.Tensor | QuantizedEmbeddings,
+    x2: torch.Tensor | QuantizedEmbeddings,
+    k: int,
+    **kwargs,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    `topk_cosine_similarity` over embeddings in any output dtype.
+    Rows of x2 stay in their compact form, only one tile at a time is converted.
+
+    Parameters
+    ----------
+    x1 : N x D
+    x2 : M x D
+
+    k : int
+        Number of results per query.
+
+    **kwargs
+        Other parameters of `topk_cosine_similarity`, e.g. `memory_budget`.
+
+    Returns
+    -------
+    tuple[torch.Tensor, torch.Tensor]
+        Float32 similarities and int64 indices of rows of x2, of shape N x k.
+    """
+    return topk_cosine_similarity(
+        _values_for_cosine(x1).float(), _values_for_cosine(x2), k, **kwargs
+    )
@@ -1,5 +1,208 @@
+import re
+from itertools import compress
+
+import numpy as np
 import torch
 
+# Whitespace stripped by `float`, except space which separates tokens. Information
+# separators \x1c-\x1f are whitespace for `str.split` but not for `float`.
+_FLOAT_WHITESPACE = r"[^\S \x1c-\x1f]"
+# Token accepted by `float`, surrounded by whitespace that is not a space.
+_FLOAT_TOKEN = (
+    rf"{_FLOAT_WHITESPACE}*[+-]?"
+    r"(?:(?:\d(?:_?\d)*(?:\.(?:\d(?:_?\d)*)?)?|\.\d(?:_?\d)*)(?:[eE][+-]?\d(?:_?\d)*)?"
+    r"|inf(?:inity)?|nan)"
+    rf"{_FLOAT_WHITESPACE}*"
+)
+_SENTENCE_SEPARATOR = "\x00"
+# Matches exactly once per sentence of a batch joined with `_SENTENCE_SEPARATOR`,
+# capturing first token of `sentence.split(" ")` which can be parsed as float.
+FIRST_NUMBER_PATTERN = re.compile(
+    rf"(?:^|\x00)(?:(?:[^ \x00]*+ )*?(?={_FLOAT_WHITESPACE}*+[-+.\diInN])"
+    rf"({_FLOAT_TOKEN})(?=[ \x00]|\Z))?[^\x00]*+",
+    re.IGNORECASE,
+)
+
+
+def _extract_first_number_token(sentence: str) -> str:
+    for possible_number in sentence.split(" "):
+        try:
+            float(possible_number)
+            return possible_number
+        except ValueError:
+            continue
+    return ""
+
+
+def as_numeric_array(
+    input: list[int | float | str] | np.ndarray | torch.Tensor,
+) -> np.ndarray | None:
+    """
+    Numpy view of input that is a numeric array or CPU tensor, without copying.
+
+    Parameters
+    ----------
+    input : list[int | float | str] | np.ndarray | torch.Tensor
+        Batch of inputs.
+
+    Returns
+    -------
+    np.ndarray | None
+        Bool, integer or float array of shape N, None for other inputs,
+        e.g. lists or arrays of strings.
+
+    Raises
+    ------
+    RuntimeError
+        If numeric input is not one dimensional.
+    """
+    if isinstance(input, torch.Tensor):
+        if input.dtype == torch.bfloat16:
+            # Numpy has no bfloat16, every bfloat16 value is exact in float32.
+            input = input.float()
+        input = input.detach().cpu().numpy()
+    if not isinstance(input, np.ndarray) or input.dtype.kind not in "biuf":
+        return None
+    if input.ndim != 1:
+        raise RuntimeError(
+            f"Numeric input has to be one dimensional, got shape {input.shape}."
+        )
+    return input
+
+
+def extract_numbers(
+    input: list[int | float | str] | np.ndarray | torch.Tensor, fallback: float = -1
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Extracts first number from every element of a batch. i.e.
+        ['2 dollars', 3, 'no number'] -> [2, 3, fallback]
+
+    Gives the same values as splitting sentence on spaces and taking first token
+    accepted by `float`, but runs one regex pass over the whole joined batch
+    instead of python code per element. Numeric arrays and tensors are not
+    parsed, float32 ones are returned without copying.
+
+    Parameters
+    ----------
+    input : list[int | float | str] | np.ndarray | torch.Tensor
+        Sentences containing numbers or numbers themselves.
+
+    fallback : float
+        Value used for sentences without a number.
+
+    Returns
+    -------
+    tuple[torch.Tensor, torch.Tensor]
+        Float tensor of shape N with numbers and bool tensor of shape N,
+        which is True where number was found.
+    """
+    numeric_input = as_numeric_array(input)
+    if numeric_input is not None:
+        with np.errstate(over="ignore"):
+            numbers_as_float32 = numeric_input.astype(np.float32, copy=False)
+        return torch.from_numpy(numbers_as_float32), torch.ones(
+            len(numbers_as_float32), dtype=torch.bool
+        )
+    if isinstance(input, np.ndarray):
+        input = input.tolist()
+
+    number_of_elements = len(input)
+    numbers = np.full(number_of_elements, fallback, dtype=np.float64)
+    found = np.zeros(number_of_elements, dtype=bool)
+
+    is_string = np.fromiter(
+        (type(element) is str for element in input),
+        dtype=bool,
+        count=number_of_elements,
+    )
+
+    if not is_string.all():
+        numbers[~is_string] = np.fromiter(
+            map(float, compress(input, ~is_string)),
+            dtype=np.float64,
+            count=number_of_elements - int(is_string.sum()),
+        )
+        found[~is_string] = True
+
+    if is_string.any():
+        strings = list(compress(input, is_string))
+        tokens = FIRST_NUMBER_PATTERN.findall(_SENTENCE_SEPARATOR.join(strings))
+        if len(tokens) != len(strings):
+            # Separator is a part of some sentence, batch can not be joined.
+            tokens = list(map(_extract_first_number_token, strings))
+
+        has_number = np.array(tokens) != ""
+        string_positions = np.flatnonzero(is_string)[has_number]
+        numbers[string_positions] = np.fromiter(
+            map(float, compress(tokens, has_number)),
+            dtype=np.float64,
+            count=len(string_positions),
+        )
+        found[string_positions] = True
+
+    # Same as torch.Tensor(list_of_floats): values out of float32 range become inf.
+    with np.errstate(over="ignore"):
+        numbers_as_float32 = numbers.astype(np.float32)
+
+    return torch.from_numpy(numbers_as_float32), torch.from_numpy(found)
+
+
+def _mask_first_number_token(sentence: str, mask: str) -> str:
+    tokens = sentence.split(" ")
+    for position, possible_number in enumerate(tokens):
+        try:
+            float(possible_number)
+        except ValueError:
+            continue
+        tokens[position] = mask
+        return " ".join(tokens)
+    return sentence
+
+
+def mask_numbers(input: list[str], mask: str = "<number>") -> list[str]:
+    """
+    Replaces first number of every sentence, the one `extract_numbers` finds,
+    with a mask. i.e.
+        ['costs 2 dollars', 'no number'] -> ['costs <number> dollars', 'no number']
+
+    Parameters
+    ----------
+    input : list[str]
+        Sentences containing numbers.
+
+    mask : str
+        Replacement of numbers.
+
+    Returns
+    -------
+    list[str]
+        Templates of sentences, equal for sentences differing only in number.
+    """
+    return [_mask_first_number_token(sentence, mask) for sentence in input]
+
+
+def normalize_rows(
+    x: torch.Tensor, eps: float = 1e-10, out: torch.Tensor | None = None
+) -> torch.Tensor:
+    """
+    Scales every row of a matrix to unit L2 norm.
+
+    Parameters
+    ----------
+    x : N x D
+
+    eps : float
+        Lower bound of the norm, rows of zeros stay zeros.
+
+    out : torch.Tensor | None
+        Tensor of shape N x D to write result into, may be x itself.
+
+    Returns
+    -------
+    torch.Tensor N x D
+    """
+    return torch.div(x, x.norm(dim=-1, keepdim=True).clamp_min(eps), out=out)
+
 
 def pairwise_cosine_similarity_matrix(x1, x2):
     """
@@ -14,9 +217,129 @@ def pairwise_cosine_similarity_matrix(x1, x2):
     -------
     torch.Tensor N x M
     """
-    eps = 1e-10
-    norm_x1, norm_x2 = x1.norm(dim=-1).unsqueeze(1), x2.norm(dim=-1).unsqueeze(1)
-    x1_scaled = x1 / torch.max(norm_x1, eps * torch.ones_like(norm_x1))
-    x2_scaled = x2 / torch.max(norm_x2, eps * torch.ones_like(norm_x2))
-    cosine_similarity_matrix = torch.mm(x1_scaled, x2_scaled.transpose(0, 1))
-    return cosine_similarity_matrix
+    return torch.mm(normalize_rows(x1), normalize_rows(x2).transpose(0, 1))
+
+
+def topk_cosine_similarity(
+    x1: torch.Tensor,
+    x2: torch.Tensor,
+    k: int,
+    memory_budget: int = 256 * 2**20,
+    dtype: torch.dtype = torch.float32,
+    valid: torch.Tensor | None = None,
+    normalized: bool = False,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Finds k most cosine similar rows of x2 for every row of x1, without building
+    the full N x M similarity matrix.
+
+    Half of `memory_budget` holds one tile of rows of x2, converted to dtype
+    and normalized in a preallocated buffer, the other half one tile of
+    similarities. Every tile of rows is converted once and scored against all
+    queries, block by block, and running top-k of every query is merged tile
+    after tile. Queries are converted and normalized once, up front. At least
+    one row and one query are processed at a time, whatever the budget.
+
+    Parameters
+    ----------
+    x1 : N x D
+        Queries.
+
+    x2 : M x D
+        Rows to search in, of any dtype, e.g. int8 values of quantized embeddings.
+
+    k : int
+        Number of results per query, clipped to M.
+
+    memory_budget : int
+        Number of bytes available for one tile of rows and one tile of similarities.
+
+    dtype : torch.dtype
+        Dtype of matrix multiplication, one of float32, float16 or bfloat16.
+
+    valid : torch.Tensor | None
+        Bool tensor of shape M, rows marked False are never returned unless
+        there are less than k valid rows, then they come last with -inf.
+
+    normalized : bool
+        If True, rows of x1 and x2 are assumed to have unit norm already.
+
+    Returns
+    -------
+    tuple[torch.Tensor, torch.Tensor]
+        Float32 similarities and int64 indices of rows of x2, both of shape N x k,
+        sorted from most similar.
+
+    Raises
+    ------
+    RuntimeError
+        If dtype is not supported or the budget can not hold k similarities.
+    """
+    if dtype not in (torch.float32, torch.float16, torch.bfloat16):
+        raise RuntimeError(
+            f"{dtype} is not supported, please choose one of "
+            "torch.float32, torch.float16, torch.bfloat16."
+        )
+
+    number_of_queries, number_of_rows = len(x1), len(x2)
+    k = min(k, number_of_rows)
+    values = torch.full((number_of_queries, 2 * k), -torch.inf)
+    indices = torch.zeros(number_of_queries, 2 * k, dtype=torch.int64)
+    if number_of_queries == 0 or k == 0:
+        return values[:, :k], indices[:, :k]
+
+    element_size = torch.empty(0, dtype=dtype).element_size()
+    if memory_budget // element_size < k:
+        raise RuntimeError(
+            f"Memory budget of {memory_budget} bytes can not hold {k} similarities."
+        )
+    tile_budget = memory_budget // 2 // element_size
+    dimension = x2.shape[1]
+    row_block_size = max(1, min(number_of_rows, tile_budget // dimension, tile_budget))
+    query_block_size = max(1, min(number_of_queries, tile_budget // row_block_size))
+
+    queries = x1.to(dtype)
+    if not normalized:
+        queries = normalize_rows(queries)
+    # Rows are converted into this buffer, unless they can be used as they are.
+    needs_conversion = not normalized or x2.dtype != dtype
+    row_buffer = torch.empty(
+        row_block_size if needs_conversion else 0, dimension, dtype=dtype
+    )
+    similarity_buffer = torch.empty(query_block_size * row_block_size, dtype=dtype)
+
+    for row_start in range(0, number_of_rows, row_block_size):
+        rows = x2[row_start : row_start + row_block_size]
+        if needs_conversion:
+            rows = row_buffer[: len(rows)].copy_(rows)
+            if not normalized:
+                normalize_rows(rows, out=rows)
+        tile_k = min(k, len(rows))
+        is_invalid = (
+            ~valid[row_start : row_start + len(rows)] if valid is not None else None
+        )
+
+        for query_start in range(0, number_of_queries, query_block_size):
+            query_block = queries[query_start : query_start + query_block_size]
+            block_size = len(query_block)
+            similarities = similarity_buffer[: block_size * len(rows)].view(
+                block_size, len(rows)
+            )
+            torch.mm(query_block, rows.T, out=similarities)
+            if is_invalid is not None:
+                similarities.masked_fill_(is_invalid, -torch.inf)
+
+            block_values = values[query_start : query_start + block_size]
+            block_indices = indices[query_start : query_start + block_size]
+            tile_values, tile_indices = torch.topk(similarities, tile_k, dim=1)
+            block_values[:, k : k + tile_k] = tile_values
+            block_values[:, k + tile_k :] = -torch.inf
+            block_indices[:, k : k + tile_k] = tile_indices + row_start
+            block_indices[:, k + tile_k :] = 0
+
+            best_values, positions = torch.topk(block_values, k, dim=1)
+            best_indices = torch.gather(block_indices, 1, positions)
+            block_values[:, :k] = best_values
+            block_indices[:, :k] = best_indices
+
+    return values[:, :k].contiguous(), indices[:, :k].contiguous()
@@ -1,100 +1,1271 @@
+import json
+import time
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+from pathlib import Path
 from typing import Any
 
+import numpy as np
 import torch
 
+from source.ann_index import IVFPQIndex
+from source.encode import encode_numbers
+from source.instrumentation import stage
+from source.numeric_representation import ContextualBackend
+from source.quantization import (
+    OUTPUT_DTYPE_TO_TORCH_DTYPE,
+    QuantizedEmbeddings,
+    dequantize_embeddings,
+    quantize_embeddings,
+    quantized_topk_cosine_similarity,
+)
+from source.utils import extract_numbers, normalize_rows
 
-class LLM():
-    def __init__(self):
-        self.counter  = 0
 
-    def encode(self, element:str) -> torch.Tensor:
-        self.counter += 1
-        return torch.Tensor([self.counter])
+class LLM:
+    """
+    Encoder of catalog values, one instance is shared by the database and its tables.
+    """
+
+    def __init__(
+        self,
+        embedding_type: str = "sinusoidal",
+        backend: str | ContextualBackend = "minilm",
+        batch_size: int = 4096,
+    ):
+        self.embedding_type = embedding_type
+        self.backend = backend
+        self.batch_size = batch_size
+
+    def encode(self, element: str) -> torch.Tensor:
+        return self.encode_batch([element])[0]
+
+    def encode_batch(self, elements: list[str]) -> torch.Tensor:
+        """
+        Encodes elements with `encode_numbers` in batches of `batch_size`.
+        """
+        return torch.cat(
+            [
+                encode_numbers(
+                    elements[start : start + self.batch_size],
+                    embedding_type=self.embedding_type,
+                    backend=self.backend,
+                )
+                for start in range(0, len(elements), self.batch_size)
+            ]
+            or [torch.empty(0, 0)]
+        )
+
 
 class CatalogTable:
-    def __init__(self, title: Any):
-        self.llm = LLM()
+    """
+    Embeddings of values of one catalog field.
+
+    Embeddings are stored as one contiguous matrix of L2 normalized rows,
+    `identifiers` holds id of the catalog entry of every row. Matrix is a view
+    of a buffer with doubling capacity, so appends are amortized O(1) per row.
+    Deleted rows stay in place, marked in `is_deleted`, until `compact`.
+    Optional approximate `index`, built by `build_index`, is kept up to date
+    on every change of rows.
+
+    Rows are stored in `embedding_dtype`, 'float16' halves memory, 'int8' keeps
+    a quarter of it plus one scale per row, see `quantize_embeddings`.
+
+    Number parsed from every value at insert time is kept in `numbers`, NaN if
+    value has none. For range and nearest value lookups numbers of live rows are
+    kept sorted. Rows appended since last lookup are sorted on their own and
+    merged into them on next lookup, lookups themselves are bisections.
+    """
+
+    # Share of deleted rows after which table compacts itself on delete.
+    compaction_threshold = 0.5
+
+    def __init__(
+        self,
+        title: Any,
+        llm: LLM | None = None,
+        title_embedding: torch.Tensor | None = None,
+        embedding_dtype: str = "float32",
+    ):
+        if embedding_dtype not in OUTPUT_DTYPE_TO_TORCH_DTYPE:
+            raise RuntimeError(
+                f"{embedding_dtype} is not a valid embedding dtype, "
+                f"please choose one of {list(OUTPUT_DTYPE_TO_TORCH_DTYPE)}."
+            )
+        self.embedding_dtype = embedding_dtype
+        self.llm = llm or LLM()
         self.title = title
-        self.title_embedding = self.llm.encode(title)
-        self.content = []
-    
-    def extract_possible_list_of_values_from_string(self, possible_list_of_values_as_string: str) -> list[str]:
-        possible_list_elements =[
-            possible_list_element.strip() for
-            possible_list_element in ";".join(possible_list_of_values_as_string.split(",")).split(";")
+        self.title_embedding = (
+            title_embedding if title_embedding is not None else self.llm.encode(title)
+        )
+        self.number_of_rows = 0
+        self.number_of_deleted_rows = 0
+        self._embedding_buffer = torch.empty(
+            0, 0, dtype=OUTPUT_DTYPE_TO_TORCH_DTYPE[embedding_dtype]
+        )
+        self._scale_buffer = torch.empty(0)
+        self._identifier_buffer = torch.empty(0, dtype=torch.int64)
+        self._is_deleted_buffer = torch.empty(0, dtype=torch.bool)
+        self._number_buffer = torch.empty(0)
+        # Sorted numbers of first `_number_of_sorted_rows` rows and their rows,
+        # later rows are merged in on next lookup.
+        self._sorted_numbers = torch.empty(0)
+        self._sorted_rows = torch.empty(0, dtype=torch.int64)
+        self._number_of_sorted_rows = 0
+        # Built on first delete, then kept up to date on every append.
+        self._identifier_to_rows: dict[int, list[int]] | None = None
+        self.index: IVFPQIndex | None = None
+
+    @property
+    def embeddings(self) -> torch.Tensor | QuantizedEmbeddings:
+        if self.embedding_dtype == "int8":
+            return QuantizedEmbeddings(
+                self._embedding_buffer[: self.number_of_rows],
+                self._scale_buffer[: self.number_of_rows],
+            )
+        return self._embedding_buffer[: self.number_of_rows]
+
+    @property
+    def identifiers(self) -> torch.Tensor:
+        return self._identifier_buffer[: self.number_of_rows]
+
+    @property
+    def is_deleted(self) -> torch.Tensor:
+        return self._is_deleted_buffer[: self.number_of_rows]
+
+    @property
+    def numbers(self) -> torch.Tensor:
+        return self._number_buffer[: self.number_of_rows]
+
+    @property
+    def content(self) -> list[tuple[int, torch.Tensor]]:
+        return [
+            (identifier, embedding)
+            for identifier, embedding, is_deleted in zip(
+                self.identifiers.tolist(),
+                dequantize_embeddings(self.embeddings),
+                self.is_deleted.tolist(),
+            )
+            if not is_deleted
+        ]
+
+    def __len__(self) -> int:
+        return self.number_of_rows - self.number_of_deleted_rows
+
+    def set_rows(
+        self,
+        identifiers: torch.Tensor,
+        embeddings: torch.Tensor | QuantizedEmbeddings,
+        numbers: torch.Tensor | None = None,
+    ) -> None:
+        """
+        Replaces content of the table by already normalized rows, without copying.
+
+        Parameters
+        ----------
+        identifiers : torch.Tensor
+            Int64 tensor of shape N with ids of catalog entries.
+
+        embeddings : torch.Tensor | QuantizedEmbeddings
+            Rows of shape N x D in `embedding_dtype`, L2 normalized before
+            quantization.
+
+        numbers : torch.Tensor | None
+            Float tensor of shape N with numbers of rows, NaN if None.
+        """
+        if isinstance(embeddings, QuantizedEmbeddings):
+            self._embedding_buffer = embeddings.values
+            self._scale_buffer = embeddings.scales
+        else:
+            self._embedding_buffer = embeddings
+            self._scale_buffer = torch.ones(len(identifiers))
+        self._identifier_buffer = identifiers
+        self._is_deleted_buffer = torch.zeros(len(identifiers), dtype=torch.bool)
+        self._number_buffer = (
+            numbers
+            if numbers is not None
+            else torch.full((len(identifiers),), torch.nan)
+        )
+        self.number_of_rows = len(identifiers)
+        self.number_of_deleted_rows = 0
+        self._identifier_to_rows = None
+        self._sorted_numbers = torch.empty(0)
+        self._sorted_rows = torch.empty(0, dtype=torch.int64)
+        self._number_of_sorted_rows = 0
+        if self.index is not None:
+            self.index.reset()
+            self.index.add(
+                torch.arange(self.number_of_rows), dequantize_embeddings(embeddings)
+            )
+
+    @staticmethod
+    def extract_possible_list_of_values_from_string(
+        possible_list_of_values_as_string: str,
+    ) -> list[str]:
+        possible_list_elements = [
+            possible_list_element.strip()
+            for possible_list_element in ";".join(
+                possible_list_of_values_as_string.split(",")
+            ).split(";")
         ]
 
         number_of_words = len(possible_list_of_values_as_string.split(" "))
-        
+
         if len(possible_list_elements) > number_of_words / 3:
             return possible_list_elements
-        
+
         return [possible_list_of_values_as_string]
 
-    def extract_value_from_catalog_element(self, catalog_element: Any) -> list[str]:
+    @staticmethod
+    def extract_value_from_catalog_element(catalog_element: Any) -> list[str]:
         if type(catalog_element) is str:
-            return self.extract_possible_list_of_values_from_string(catalog_element)
+            return CatalogTable.extract_possible_list_of_values_from_string(
+                catalog_element
+            )
         elif type(catalog_element) is list:
             list_of_values = []
             for _catalog_element in catalog_element:
-                if (
-                    type(_catalog_element) is int or type(_catalog_element) is float
-                ):
+                if type(_catalog_element) is int or type(_catalog_element) is float:
                     list_of_values.append(str(_catalog_element))
                 else:
                     list_of_values.extend(
-                                self.extract_possible_list_of_values_from_string(
+                        CatalogTable.extract_possible_list_of_values_from_string(
                             possible_list_of_values_as_string=_catalog_element
                         )
                     )
             return list_of_values
         elif type(catalog_element) is int or type(catalog_element) is float:
-            return list(str(catalog_element))
+            return [str(catalog_element)]
         else:
-            raise RuntimeError(f"Unexpected value for catalog in input: {catalog_element}")
+            raise RuntimeError(
+                f"Unexpected value for catalog in input: {catalog_element}"
+            )
 
     def add_element(self, identifier: int, element: Any):
         list_of_elements = self.extract_value_from_catalog_element(element)
-        for element in list_of_elements:
-            self.content.append((
-                identifier,
-                self.llm.encode(element)
-            ))
-    
-class CatalogRetrievalDatabase():
-    def __init__(self, data: list[dict[str, Any]]) -> None:
-        self.llm = LLM()
-        self.id_to_data_entry = {
-            i: data_entry for i, data_entry in enumerate(data)
-        }
+        embeddings = self.llm.encode_batch(list_of_elements)
+        numbers, _ = extract_numbers(list_of_elements, fallback=torch.nan)
+        self.add_embeddings(
+            torch.full((len(list_of_elements),), identifier, dtype=torch.int64),
+            embeddings,
+            numbers,
+        )
+
+    def add_embeddings(
+        self,
+        identifiers: torch.Tensor,
+        embeddings: torch.Tensor,
+        numbers: torch.Tensor | None = None,
+    ) -> None:
+        """
+        Appends rows to the table, normalizing them once at insert time.
+
+        Parameters
+        ----------
+        identifiers : torch.Tensor
+            Int64 tensor of shape N with ids of catalog entries.
+
+        embeddings : torch.Tensor
+            Tensor of shape N x D.
+
+        numbers : torch.Tensor | None
+            Float tensor of shape N with numbers parsed from values, NaN for
+            values without number. All NaN if None.
+        """
+        start, end = self.number_of_rows, self.number_of_rows + len(identifiers)
+        self._reserve(end, embeddings.shape[1])
+
+        normalized_embeddings = normalize_rows(embeddings.float())
+        quantized_embeddings = quantize_embeddings(
+            normalized_embeddings, self.embedding_dtype
+        )
+        if isinstance(quantized_embeddings, QuantizedEmbeddings):
+            self._embedding_buffer[start:end] = quantized_embeddings.values
+            self._scale_buffer[start:end] = quantized_embeddings.scales
+        else:
+            self._embedding_buffer[start:end] = quantized_embeddings
+            self._scale_buffer[start:end] = 1.0
+        self._identifier_buffer[start:end] = identifiers
+        self._is_deleted_buffer[start:end] = False
+        self._number_buffer[start:end] = torch.nan if numbers is None else numbers
+        self.number_of_rows = end
+        if self.index is not None:
+            self.index.add(torch.arange(start, end), normalized_embeddings)
+
+        if self._identifier_to_rows is not None:
+            for row, identifier in enumerate(identifiers.tolist(), start=start):
+                self._identifier_to_rows.setdefault(identifier, []).append(row)
+
+    def _reserve(self, capacity: int, embedding_size: int) -> None:
+        if capacity <= len(self._identifier_buffer):
+            return
+        new_capacity = max(capacity, 2 * len(self._identifier_buffer))
+
+        embedding_buffer = torch.empty(
+            new_capacity, embedding_size, dtype=self._embedding_buffer.dtype
+        )
+        scale_buffer = torch.empty(new_capacity)
+        identifier_buffer = torch.empty(new_capacity, dtype=torch.int64)
+        is_deleted_buffer = torch.empty(new_capacity, dtype=torch.bool)
+        number_buffer = torch.empty(new_capacity)
+        if self.number_of_rows > 0:
+            embedding_buffer[: self.number_of_rows] = self._embedding_buffer[
+                : self.number_of_rows
+            ]
+            scale_buffer[: self.number_of_rows] = self._scale_buffer[
+                : self.number_of_rows
+            ]
+            identifier_buffer[: self.number_of_rows] = self.identifiers
+            is_deleted_buffer[: self.number_of_rows] = self.is_deleted
+            number_buffer[: self.number_of_rows] = self.numbers
+
+        self._embedding_buffer = embedding_buffer
+        self._scale_buffer = scale_buffer
+        self._identifier_buffer = identifier_buffer
+        self._is_deleted_buffer = is_deleted_buffer
+        self._number_buffer = number_buffer
+
+    def delete(self, identifier: int) -> int:
+        """
+        Marks all rows of a catalog entry as deleted.
+        Compacts the table once share of deleted rows exceeds `compaction_threshold`.
+
+        Parameters
+        ----------
+        identifier : int
+            Id of the catalog entry.
+
+        Returns
+        -------
+        int
+            Number of deleted rows.
+        """
+        if self._identifier_to_rows is None:
+            self._identifier_to_rows = {}
+            for row, (row_identifier, is_deleted) in enumerate(
+                zip(self.identifiers.tolist(), self.is_deleted.tolist())
+            ):
+                if not is_deleted:
+                    self._identifier_to_rows.setdefault(row_identifier, []).append(row)
+
+        rows = self._identifier_to_rows.pop(identifier, [])
+        self._is_deleted_buffer[rows] = True
+        self.number_of_deleted_rows += len(rows)
+
+        if (
+            self.number_of_deleted_rows
+            > self.compaction_threshold * self.number_of_rows
+        ):
+            self.compact()
+        return len(rows)
+
+    def compact(self) -> None:
+        """
+        Drops deleted rows, shrinking buffers to the number of remaining rows.
+        """
+        if self.number_of_deleted_rows == 0:
+            return
+        is_alive = ~self.is_deleted
+        self.set_rows(
+            self.identifiers[is_alive],
+            self.embeddings[is_alive],
+            self.numbers[is_alive],
+        )
+
+    def _sorted_number_index(self) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Numbers of rows which have one, in ascending order, and their rows.
+
+        Rows appended since last call are sorted and merged into the index,
+        which drops rows deleted meanwhile. Rows deleted after the merge are
+        still present and are filtered by callers.
+        """
+        if self._number_of_sorted_rows == self.number_of_rows:
+            return self._sorted_numbers, self._sorted_rows
+
+        new_rows = torch.arange(self._number_of_sorted_rows, self.number_of_rows)
+        new_rows = new_rows[
+            ~self.is_deleted[new_rows] & ~torch.isnan(self.numbers[new_rows])
+        ]
+        new_numbers, order = torch.sort(self.numbers[new_rows], stable=True)
+        new_rows = new_rows[order]
+        is_alive = ~self.is_deleted[self._sorted_rows]
+        old_numbers = self._sorted_numbers[is_alive].to(new_numbers.dtype)
+        old_rows = self._sorted_rows[is_alive]
+
+        # New rows go after old rows with equal numbers, as in a stable sort.
+        is_new = torch.zeros(len(old_rows) + len(new_rows), dtype=torch.bool)
+        is_new[
+            torch.searchsorted(old_numbers, new_numbers, side="right")
+            + torch.arange(len(new_rows))
+        ] = True
+        self._sorted_numbers = torch.empty(len(is_new), dtype=old_numbers.dtype)
+        self._sorted_numbers[is_new] = new_numbers
+        self._sorted_numbers[~is_new] = old_numbers
+        self._sorted_rows = torch.empty(len(is_new), dtype=torch.int64)
+        self._sorted_rows[is_new] = new_rows
+        self._sorted_rows[~is_new] = old_rows
+        self._number_of_sorted_rows = self.number_of_rows
+        return self._sorted_numbers, self._sorted_rows
+
+    def range_rows(
+        self, low: float = -torch.inf, high: float = torch.inf
+    ) -> torch.Tensor:
+        """
+        Rows with numbers in [low, high], ordered by number.
+
+        Parameters
+        ----------
+        low : float
+            Lower bound, inclusive.
+
+        high : float
+            Upper bound, inclusive.
+
+        Returns
+        -------
+        torch.Tensor
+            Int64 tensor with rows of live values.
+        """
+        sorted_numbers, sorted_rows = self._sorted_number_index()
+        start = torch.searchsorted(sorted_numbers, low, side="left")
+        end = torch.searchsorted(sorted_numbers, high, side="right")
+        rows = sorted_rows[start:end]
+        return rows[~self.is_deleted[rows]]
+
+    def search_range(
+        self, low: float = -torch.inf, high: float = torch.inf
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Finds values with numbers in [low, high].
+
+        Parameters
+        ----------
+        low : float
+            Lower bound, inclusive.
+
+        high : float
+            Upper bound, inclusive.
+
+        Returns
+        -------
+        tuple[torch.Tensor, torch.Tensor]
+            Numbers and identifiers of found values, in ascending order of numbers.
+        """
+        rows = self.range_rows(low, high)
+        return self.numbers[rows], self.identifiers[rows]
+
+    def search_nearest_value(
+        self, value: float, k: int = 1
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Finds k values with numbers closest to given one.
+
+        Parameters
+        ----------
+        value : float
+            Number to look for.
+
+        k : int
+            Number of results.
+
+        Returns
+        -------
+        tuple[torch.Tensor, torch.Tensor]
+            Numbers and identifiers of found values, from closest.
+        """
+        sorted_numbers, sorted_rows = self._sorted_number_index()
+        position = int(torch.searchsorted(sorted_numbers, value))
+
+        # Closest k live numbers are among k live numbers on both sides of the
+        # position, window grows until it holds that many despite deleted rows.
+        window = k
+        while True:
+            start = max(0, position - window)
+            end = min(len(sorted_rows), position + window)
+            is_alive = ~self.is_deleted[sorted_rows[start:end]]
+            number_alive_before = int(is_alive[: position - start].sum())
+            number_alive_after = int(is_alive[position - start :].sum())
+            if (start == 0 or number_alive_before >= k) and (
+                end == len(sorted_rows) or number_alive_after >= k
+            ):
+                break
+            window *= 2
+        rows = sorted_rows[start:end][is_alive]
+
+        distances = torch.abs(self.numbers[rows] - value)
+        _, positions = torch.topk(distances, min(k, len(rows)), largest=False)
+        rows = rows[positions]
+        return self.numbers[rows], self.identifiers[rows]
+
+    def build_index(self, index: IVFPQIndex | None = None) -> IVFPQIndex:
+        """
+        Trains approximate index on rows of the table and adds them to it.
+        Afterwards `search` scans only candidates proposed by the index.
+
+        Parameters
+        ----------
+        index : IVFPQIndex | None
+            Untrained index with chosen parameters, default one if None.
+
+        Returns
+        -------
+        IVFPQIndex
+        """
+        if index is None:
+            index = IVFPQIndex()
+        embeddings = dequantize_embeddings(self.embeddings)
+        index.train(embeddings[~self.is_deleted])
+        index.add(torch.arange(self.number_of_rows), embeddings)
+        self.index = index
+        return index
+
+    def search(
+        self,
+        query: torch.Tensor,
+        k: int = 10,
+        memory_budget: int = 256 * 2**20,
+        dtype: torch.dtype = torch.float32,
+        exact: bool = False,
+        nprobe: int | None = None,
+        refine_factor: int = 4,
+        number_range: tuple[float, float] | None = None,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Top-k search by cosine similarity.
+
+        Without index, or with `exact`, every row is scored, in tiles, so memory
+        does not grow with size of the table. With index, `refine_factor * k`
+        candidates from `nprobe` inverted lists are rescored exactly. With
+        `number_range`, only rows with numbers in the range are scored.
+
+        Parameters
+        ----------
+        query : torch.Tensor
+            Query of shape D or batch of queries of shape Q x D.
+
+        k : int
+            Number of results per query.
+
+        memory_budget : int
+            Number of bytes available for one tile of similarities.
+
+        dtype : torch.dtype
+            Dtype of scoring, float16 or bfloat16 trade accuracy for speed.
+
+        exact : bool
+            If True, index is ignored.
+
+        nprobe : int | None
+            Number of inverted lists scanned per query, default of the index if None.
+
+        refine_factor : int
+            Number of candidates from index per result.
+
+        number_range : tuple[float, float] | None
+            Inclusive bounds of numbers of returned values.
+
+        Returns
+        -------
+        tuple[torch.Tensor, torch.Tensor]
+            Similarities and identifiers of best rows, both of shape Q x k
+            (or k for single query), sorted from most similar. Approximate search
+            may find less than k rows, missing results have -inf and identifier -1.
+        """
+        queries = normalize_rows(query.float().reshape(-1, query.shape[-1]))
+        k = min(k, len(self))
+        valid = ~self.is_deleted if self.number_of_deleted_rows > 0 else None
+        # Quantized rows are only approximately unit, they are normalized per tile.
+        is_normalized = self.embedding_dtype == "float32"
+
+        if number_range is not None:
+            rows = self.range_rows(*number_range)
+            best_values, positions = quantized_topk_cosine_similarity(
+                queries,
+                self.embeddings[rows],
+                k,
+                memory_budget=memory_budget,
+                dtype=dtype,
+                normalized=is_normalized,
+            )
+            best_rows = rows[positions]
+        elif self.index is None or exact:
+            best_values, best_rows = quantized_topk_cosine_similarity(
+                queries,
+                self.embeddings,
+                k,
+                memory_budget=memory_budget,
+                dtype=dtype,
+                valid=valid,
+                normalized=is_normalized,
+            )
+        else:
+            _, candidate_rows = self.index.search(
+                queries, refine_factor * k, nprobe=nprobe, valid=valid
+            )
+            candidate_embeddings = dequantize_embeddings(
+                self.embeddings[candidate_rows.clamp_min(0)]
+            )
+            if not is_normalized:
+                candidate_embeddings = normalize_rows(candidate_embeddings)
+            candidate_values = torch.bmm(
+                candidate_embeddings, queries.unsqueeze(2)
+            ).squeeze(2)
+            candidate_values.masked_fill_(candidate_rows < 0, -torch.inf)
+            best_values, positions = torch.topk(candidate_values, k, dim=1)
+            best_rows = torch.gather(candidate_rows, 1, positions)
+
+        best_identifiers = torch.where(
+            best_rows >= 0, self.identifiers[best_rows.clamp_min(0)], -1
+        )
+        if query.dim() == 1:
+            return best_values[0], best_identifiers[0]
+        return best_values, best_identifiers
+
+
+class CatalogRetrievalDatabase:
+    def __init__(
+        self,
+        data: list[dict[str, Any]],
+        embedding_type: str = "sinusoidal",
+        backend: str | ContextualBackend = "minilm",
+        batch_size: int = 4096,
+        embedding_dtype: str = "float32",
+    ) -> None:
+        self.llm = LLM(embedding_type, backend=backend, batch_size=batch_size)
+        self.embedding_dtype = embedding_dtype
+        self.id_to_data_entry = {i: data_entry for i, data_entry in enumerate(data)}
+        # Entries ingested without being kept, as byte offsets of their lines.
+        # Offset of entry `id` is at `id - first_offset_id`, -1 if there is none.
+        # Buffer has doubling capacity, only first `number_of_offsets` are used.
+        self.jsonl_path: Path | None = None
+        self.first_offset_id = 0
+        self.number_of_offsets = 0
+        self._offset_buffer = np.empty(0, dtype=np.int64)
         self.table_title_to_table: dict[str, CatalogTable] = {}
         self.populate_list_of_tables(data)
 
-        self.table_titlte_to_embedding = {
-            title : self.llm.encode(title)
-            for title, _ in self.table_title_to_table.items()
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offset_buffer[: self.number_of_offsets]
+
+    @property
+    def table_titlte_to_embedding(self) -> dict[str, torch.Tensor]:
+        return {
+            title: table.title_embedding
+            for title, table in self.table_title_to_table.items()
         }
-    
+
+    def save(self, directory: str | Path) -> None:
+        """
+        Writes built database to a directory.
+
+        Embeddings, identifiers, numbers and title embeddings of every table are
+        stored as raw `.npy` files, in `embedding_dtype` for embeddings, with
+        `scales.npy` for int8. Byte offsets of entries which are not kept go to
+        `offsets.npy`. Titles, catalog entries and encoder settings go to
+        `metadata.json`.
+
+        Parameters
+        ----------
+        directory : str | Path
+            Directory of the database, created if it does not exist.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        tables_metadata = []
+        for table_index, (title, table) in enumerate(self.table_title_to_table.items()):
+            table.compact()
+            table_directory = directory / "tables" / str(table_index)
+            table_directory.mkdir(parents=True, exist_ok=True)
+            embeddings = table.embeddings
+            if isinstance(embeddings, QuantizedEmbeddings):
+                np.save(table_directory / "scales.npy", embeddings.scales.numpy())
+                embeddings = embeddings.values
+            np.save(table_directory / "embeddings.npy", embeddings.numpy())
+            np.save(table_directory / "identifiers.npy", table.identifiers.numpy())
+            np.save(table_directory / "numbers.npy", table.numbers.numpy())
+            np.save(
+                table_directory / "title_embedding.npy", table.title_embedding.numpy()
+            )
+            tables_metadata.append(
+                {
+                    "title": title,
+                    "directory": str(table_directory.relative_to(directory)),
+                }
+            )
+
+        if self.jsonl_path is not None:
+            np.save(directory / "offsets.npy", self.offsets)
+
+        metadata = {
+            "embedding_type": self.llm.embedding_type,
+            "backend": self.llm.backend if isinstance(self.llm.backend, str) else None,
+            "batch_size": self.llm.batch_size,
+            "embedding_dtype": self.embedding_dtype,
+            "tables": tables_metadata,
+            "id_to_data_entry": list(self.id_to_data_entry.items()),
+            "jsonl_path": str(self.jsonl_path) if self.jsonl_path else None,
+            "first_offset_id": self.first_offset_id,
+        }
+        (directory / "metadata.json").write_text(json.dumps(metadata), encoding="utf-8")
+
+    @classmethod
+    def load(
+        cls,
+        directory: str | Path,
+        backend: str | ContextualBackend | None = None,
+    ) -> "CatalogRetrievalDatabase":
+        """
+        Maps database written by `save` without copying or re-encoding.
+
+        Arrays are memory-mapped copy-on-write, so processes loading the same
+        directory share its pages through the page cache.
+
+        Parameters
+        ----------
+        directory : str | Path
+            Directory written by `save`.
+
+        backend : str | ContextualBackend | None
+            Contextual backend used for queries, required if database was
+            built with backend instance rather than name.
+
+        Returns
+        -------
+        CatalogRetrievalDatabase
+        """
+        directory = Path(directory)
+        metadata = json.loads((directory / "metadata.json").read_text(encoding="utf-8"))
+        backend = backend or metadata["backend"]
+        if backend is None:
+            raise RuntimeError(
+                "Database was built with a custom contextual backend, pass it to load."
+            )
+
+        database = cls(
+            [],
+            embedding_type=metadata["embedding_type"],
+            backend=backend,
+            batch_size=metadata["batch_size"],
+            embedding_dtype=metadata.get("embedding_dtype", "float32"),
+        )
+        database.id_to_data_entry = {
+            id: data_entry for id, data_entry in metadata["id_to_data_entry"]
+        }
+        if metadata.get("jsonl_path") is not None:
+            database.jsonl_path = Path(metadata["jsonl_path"])
+            database.first_offset_id = metadata["first_offset_id"]
+            database._offset_buffer = np.load(directory / "offsets.npy", mmap_mode="c")
+            database.number_of_offsets = len(database._offset_buffer)
+
+        for table_metadata in metadata["tables"]:
+            table_directory = directory / table_metadata["directory"]
+            table = CatalogTable(
+                table_metadata["title"],
+                llm=database.llm,
+                title_embedding=_load_tensor(table_directory / "title_embedding.npy"),
+                embedding_dtype=database.embedding_dtype,
+            )
+            embeddings = _load_tensor(table_directory / "embeddings.npy")
+            if database.embedding_dtype == "int8":
+                embeddings = QuantizedEmbeddings(
+                    embeddings, _load_tensor(table_directory / "scales.npy")
+                )
+            numbers_path = table_directory / "numbers.npy"
+            table.set_rows(
+                _load_tensor(table_directory / "identifiers.npy"),
+                embeddings,
+                _load_tensor(numbers_path) if numbers_path.exists() else None,
+            )
+            database.table_title_to_table[table.title] = table
+
+        return database
+
+    @classmethod
+    def from_jsonl(
+        cls,
+        path: str | Path,
+        embedding_type: str = "sinusoidal",
+        backend: str | ContextualBackend = "minilm",
+        batch_size: int = 4096,
+        embedding_dtype: str = "float32",
+        **ingestion_parameters: Any,
+    ) -> "CatalogRetrievalDatabase":
+        """
+        Builds database from a JSONL export of the catalog, see `ingest_jsonl`.
+
+        Parameters
+        ----------
+        path : str | Path
+            File with one catalog entry per line.
+
+        **ingestion_parameters : Any
+            Parameters of `ingest_jsonl`, e.g. `chunk_size` or `keep_entries`.
+
+        Returns
+        -------
+        CatalogRetrievalDatabase
+        """
+        database = cls(
+            [],
+            embedding_type=embedding_type,
+            backend=backend,
+            batch_size=batch_size,
+            embedding_dtype=embedding_dtype,
+        )
+        database.ingest_jsonl(path, **ingestion_parameters)
+        return database
+
+    def ingest_jsonl(
+        self,
+        path: str | Path,
+        chunk_size: int = 10_000,
+        keep_entries: bool = True,
+        first_id: int | None = None,
+        progress: Callable[[dict[str, float]], None] | None = None,
+    ) -> dict[str, float]:
+        """
+        Streams catalog entries from a JSONL file into tables.
+
+        Lines are read lazily and added `chunk_size` entries at a time, so memory
+        holds one chunk of entries and their embeddings besides the tables.
+        Entry with id `first_id + i` is the i-th non empty line of the file.
+
+        Parameters
+        ----------
+        path : str | Path
+            File with one catalog entry, a json object, per line.
+
+        chunk_size : int
+            Number of entries flattened and encoded at once.
+
+        keep_entries : bool
+            If False, only byte offsets of entries are kept, entries are read
+            back from the file when needed, e.g. by `delete`.
+
+        first_id : int | None
+            Id of the first entry, next id after existing entries if None.
+
+        progress : Callable[[dict[str, float]], None] | None
+            Called after every chunk with statistics of ingestion so far.
+
+        Returns
+        -------
+        dict[str, float]
+            Number of entries, values and bytes read, elapsed seconds and
+            throughput in entries and values per second.
+
+        Raises
+        ------
+        RuntimeError
+            If entries without kept content come from another file.
+        """
+        path = Path(path)
+        if not keep_entries:
+            if self.jsonl_path is not None and self.jsonl_path != path:
+                raise RuntimeError(
+                    f"Database already keeps offsets into {self.jsonl_path}, "
+                    f"entries of {path} have to be kept."
+                )
+            self.jsonl_path = path
+        if first_id is None:
+            first_id = 1 + max([-1, *self.id_to_data_entry.keys()])
+            if self.number_of_offsets > 0:
+                first_id = max(first_id, self.first_offset_id + self.number_of_offsets)
+
+        statistics = {
+            "entries": 0,
+            "values": 0,
+            "bytes": 0,
+            "total_bytes": path.stat().st_size,
+            "seconds": 0.0,
+            "entries_per_second": 0.0,
+            "values_per_second": 0.0,
+        }
+        start = time.perf_counter()
+        lines = _iterate_jsonl_lines(path)
+        while chunk := list(islice(lines, chunk_size)):
+            chunk_first_id = first_id + statistics["entries"]
+            entries = []
+            for id, (_, line) in enumerate(chunk, start=chunk_first_id):
+                data_entry = json.loads(line)
+                if keep_entries:
+                    self.id_to_data_entry[id] = data_entry
+                entries.append((id, data_entry))
+            if not keep_entries:
+                self._set_offsets(
+                    chunk_first_id,
+                    np.fromiter(
+                        (offset for offset, _ in chunk),
+                        dtype=np.int64,
+                        count=len(chunk),
+                    ),
+                )
+            statistics["values"] += self.add_entries(entries)
+
+            last_offset, last_line = chunk[-1]
+            statistics["entries"] += len(chunk)
+            statistics["bytes"] = last_offset + len(last_line)
+            statistics["seconds"] = time.perf_counter() - start
+            statistics["entries_per_second"] = (
+                statistics["entries"] / statistics["seconds"]
+            )
+            statistics["values_per_second"] = (
+                statistics["values"] / statistics["seconds"]
+            )
+            if progress is not None:
+                progress(dict(statistics))
+
+        return statistics
+
+    def get_data_entry(self, id: int) -> dict[str, Any] | None:
+        """
+        Content of catalog entry, read from the JSONL file if only its offset is kept.
+
+        Parameters
+        ----------
+        id : int
+            Id of the catalog entry.
+
+        Returns
+        -------
+        dict[str, Any] | None
+            None if entry does not exist.
+        """
+        if id in self.id_to_data_entry:
+            return self.id_to_data_entry[id]
+        position = id - self.first_offset_id
+        if not 0 <= position < self.number_of_offsets:
+            return None
+        offset = int(self._offset_buffer[position])
+        if offset < 0:
+            return None
+        with open(self.jsonl_path, "rb") as jsonl_file:
+            jsonl_file.seek(offset)
+            return json.loads(jsonl_file.readline())
+
+    def _set_offsets(self, first_id: int, offsets: np.ndarray) -> None:
+        """
+        Stores byte offsets of entries with ids from `first_id` on, ids skipped
+        between them and earlier offsets get -1.
+        """
+        if self.number_of_offsets == 0:
+            self.first_offset_id = first_id
+        if first_id < self.first_offset_id:
+            self._offset_buffer = np.concatenate(
+                [np.full(self.first_offset_id - first_id, -1, np.int64), self.offsets]
+            )
+            self.number_of_offsets = len(self._offset_buffer)
+            self.first_offset_id = first_id
+
+        start = first_id - self.first_offset_id
+        end = start + len(offsets)
+        if end > len(self._offset_buffer):
+            offset_buffer = np.empty(
+                max(end, 2 * len(self._offset_buffer)), dtype=np.int64
+            )
+            offset_buffer[: self.number_of_offsets] = self.offsets
+            self._offset_buffer = offset_buffer
+        if end > self.number_of_offsets:
+            self._offset_buffer[self.number_of_offsets : end] = -1
+            self.number_of_offsets = end
+        self._offset_buffer[start:end] = offsets
+
+    def search(
+        self,
+        query: str | torch.Tensor,
+        table_title: str,
+        k: int = 10,
+        exact: bool = False,
+        nprobe: int | None = None,
+        number_range: tuple[float, float] | None = None,
+    ) -> list[tuple[int, float]]:
+        """
+        Finds catalog entries with values of a field most similar to query.
+
+        Parameters
+        ----------
+        query : str | torch.Tensor
+            Query as text or as embedding.
+
+        table_title : str
+            Field of the catalog to search in.
+
+        k : int
+            Number of results.
+
+        exact : bool
+            If True, approximate index of the table is ignored.
+
+        nprobe : int | None
+            Number of inverted lists scanned by approximate index.
+
+        number_range : tuple[float, float] | None
+            Inclusive bounds of numbers in values, e.g. price between 10 and 20.
+
+        Returns
+        -------
+        list[tuple[int, float]]
+            Ids of catalog entries and similarities, sorted from most similar.
+        """
+        if isinstance(query, str):
+            query = self.llm.encode(query)
+        values, identifiers = self.table_title_to_table[table_title].search(
+            query, k, exact=exact, nprobe=nprobe, number_range=number_range
+        )
+        return [
+            (identifier, value)
+            for identifier, value in zip(identifiers.tolist(), values.tolist())
+            if identifier != -1
+        ]
+
+    def search_range(
+        self, table_title: str, low: float = -torch.inf, high: float = torch.inf
+    ) -> list[tuple[int, float]]:
+        """
+        Finds catalog entries with numbers of a field in [low, high].
+
+        Parameters
+        ----------
+        table_title : str
+            Field of the catalog to search in.
+
+        low : float
+            Lower bound, inclusive.
+
+        high : float
+            Upper bound, inclusive.
+
+        Returns
+        -------
+        list[tuple[int, float]]
+            Ids of catalog entries and numbers, in ascending order of numbers.
+        """
+        numbers, identifiers = self.table_title_to_table[table_title].search_range(
+            low, high
+        )
+        return list(zip(identifiers.tolist(), numbers.tolist()))
+
+    def search_nearest_value(
+        self, table_title: str, value: float, k: int = 1
+    ) -> list[tuple[int, float]]:
+        """
+        Finds catalog entries with numbers of a field closest to value.
+
+        Parameters
+        ----------
+        table_title : str
+            Field of the catalog to search in.
+
+        value : float
+            Number to look for, e.g. 1500 for price.
+
+        k : int
+            Number of results.
+
+        Returns
+        -------
+        list[tuple[int, float]]
+            Ids of catalog entries and numbers, from closest.
+        """
+        numbers, identifiers = self.table_title_to_table[
+            table_title
+        ].search_nearest_value(value, k)
+        return list(zip(identifiers.tolist(), numbers.tolist()))
+
+    def build_indexes(
+        self, minimum_number_of_rows: int = 10_000, **index_parameters: Any
+    ) -> None:
+        """
+        Builds approximate index of every table large enough to benefit from it.
+        Indexes are not saved, build them again after `load`.
+
+        Parameters
+        ----------
+        minimum_number_of_rows : int
+            Smaller tables are searched exactly.
+
+        **index_parameters : Any
+            Parameters of `IVFPQIndex`, e.g. `number_of_lists` or `nprobe`.
+        """
+        for table in self.table_title_to_table.values():
+            if len(table) >= minimum_number_of_rows:
+                table.build_index(IVFPQIndex(**index_parameters))
+
     def populate_list_of_tables(self, data: list[dict[str, Any]]) -> None:
-        for id, catalog_entry in self.id_to_data_entry.items():
-            for title, value in catalog_entry.items():
-                if title in self.table_title_to_table:
-                    table = self.table_title_to_table[title]
-                    table.add_element(id, value)
-                else:
-                    self.table_title_to_table[title] = CatalogTable(title)
-                    self.table_title_to_table[title].add_element(id, value)
+        self.add_entries(self.id_to_data_entry.items())
+
+    def upsert(self, id: int, data_entry: dict[str, Any]) -> None:
+        """
+        Inserts catalog entry or replaces existing one with the same id.
+        Costs time proportional to size of the entry, not of the catalog.
+
+        Parameters
+        ----------
+        id : int
+            Id of the catalog entry.
+
+        data_entry : dict[str, Any]
+            New content of the entry.
+        """
+        self.delete(id)
+        self.id_to_data_entry[id] = data_entry
+        self.add_entries([(id, data_entry)])
+
+    def delete(self, id: int) -> bool:
+        """
+        Removes catalog entry, its rows are tombstoned until tables are compacted.
+
+        Parameters
+        ----------
+        id : int
+            Id of the catalog entry.
+
+        Returns
+        -------
+        bool
+            True if entry existed.
+        """
+        data_entry = self.get_data_entry(id)
+        if data_entry is None:
+            return False
+        self.id_to_data_entry.pop(id, None)
+        if 0 <= id - self.first_offset_id < self.number_of_offsets:
+            self._offset_buffer[id - self.first_offset_id] = -1
+        for title in data_entry:
+            # Fields without values, e.g. empty lists, have no table.
+            table = self.table_title_to_table.get(title)
+            if table is not None:
+                table.delete(id)
+        return True
+
+    def compact(self) -> None:
+        """
+        Drops deleted rows of every table.
+        """
+        for table in self.table_title_to_table.values():
+            table.compact()
+
+    def add_entries(self, entries: Iterable[tuple[int, dict[str, Any]]]) -> int:
+        """
+        Encodes values of catalog entries in large batches through one encoder.
+
+        Values of all entries are flattened into (table, id, value) triples first,
+        then titles of new tables and values are encoded in batches and every
+        table receives its rows in one step.
+
+        Parameters
+        ----------
+        entries : Iterable[tuple[int, dict[str, Any]]]
+            Pairs of id and content of catalog entries.
+
+        Returns
+        -------
+        int
+            Number of values added to tables.
+        """
+        extract_values = CatalogTable.extract_value_from_catalog_element
+        titles, identifiers, values = [], [], []
+        with stage("catalog/flatten"):
+            for id, catalog_entry in entries:
+                for title, value in catalog_entry.items():
+                    for extracted_value in extract_values(value):
+                        titles.append(title)
+                        identifiers.append(id)
+                        values.append(extracted_value)
+
+        with stage("catalog/create_tables", len(titles)):
+            self.create_tables(titles)
+        with stage("catalog/extract_numbers", len(values)):
+            numbers, _ = extract_numbers(values, fallback=torch.nan)
+        with stage("catalog/encode", len(values)):
+            embeddings = self.llm.encode_batch(values)
+        with stage("catalog/add_rows", len(values)):
+            self.add_rows(titles, identifiers, embeddings, numbers)
+        return len(values)
+
+    def create_tables(self, titles: list[Any]) -> None:
+        """
+        Creates tables that do not exist yet, encoding their titles in one batch.
+        """
+        new_titles = [
+            title
+            for title in dict.fromkeys(titles)
+            if title not in self.table_title_to_table
+        ]
+        if not new_titles:
+            return
+
+        title_embeddings = self.llm.encode_batch([str(title) for title in new_titles])
+        for title, title_embedding in zip(new_titles, title_embeddings):
+            self.table_title_to_table[title] = CatalogTable(
+                title,
+                llm=self.llm,
+                title_embedding=title_embedding,
+                embedding_dtype=self.embedding_dtype,
+            )
+
+    def add_rows(
+        self,
+        titles: list[Any],
+        identifiers: list[int],
+        embeddings: torch.Tensor,
+        numbers: torch.Tensor | None = None,
+    ) -> None:
+        """
+        Writes encoded rows into their tables, one append per table.
+
+        Parameters
+        ----------
+        titles : list[Any]
+            Title of the table of every row.
+
+        identifiers : list[int]
+            Id of the catalog entry of every row.
+
+        embeddings : torch.Tensor
+            Embeddings of rows, of shape len(titles) x D.
+
+        numbers : torch.Tensor | None
+            Numbers parsed from values of rows, NaN where value has none.
+        """
+        title_to_rows: dict[Any, list[int]] = {}
+        for row, title in enumerate(titles):
+            title_to_rows.setdefault(title, []).append(row)
+
+        identifiers_as_tensor = torch.as_tensor(identifiers, dtype=torch.int64)
+        for title, rows in title_to_rows.items():
+            rows_as_tensor = torch.from_numpy(np.array(rows, dtype=np.int64))
+            self.table_title_to_table[title].add_embeddings(
+                identifiers_as_tensor[rows_as_tensor],
+                embeddings[rows_as_tensor],
+                numbers[rows_as_tensor] if numbers is not None else None,
+            )
+
+
+def _load_tensor(path: Path) -> torch.Tensor:
+    return torch.from_numpy(np.load(path, mmap_mode="c"))
+
+
+def _iterate_jsonl_lines(path: Path) -> Iterator[tuple[int, bytes]]:
+    """
+    Lazily reads non empty lines of a file with their byte offsets.
+    """
+    offset = 0
+    with open(path, "rb") as jsonl_file:
+        for line in jsonl_file:
+            if line.strip():
+                yield offset, line
+            offset += len(line)
 
 
 def use_case_1():
     input: list[dict[str, Any]] = [
-        {"type_1": [12, 2, 3,"4"]},
-        {
-         "type_1": [5, 6],
-         "type_2": "word in a sentece",
-         "type_4": 15.3
-        },
+        {"type_1": [12, 2, 3, "4"]},
+        {"type_1": [5, 6], "type_2": "word in a sentece", "type_4": 15.3},
     ]
 
     database = CatalogRetrievalDatabase(input)
-    print(database.table_title_to_table["type_1"].content)
\ No newline at end of file
+    print(database.table_title_to_table["type_1"].content)
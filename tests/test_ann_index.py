@@ -0,0 +1,108 @@
+import unittest
+
+import torch
+
+from source.ann_index import IVFPQIndex, kmeans
+from source.utils import normalize_rows, topk_cosine_similarity
+
+
+class TestKmeans(unittest.TestCase):
+    def test_finds_separated_clusters(self):
+        generator = torch.Generator().manual_seed(0)
+        centers = torch.tensor([[0.0, 0.0], [10.0, 10.0], [-10.0, 10.0]])
+        x = centers.repeat(100, 1) + 0.1 * torch.randn(300, 2, generator=generator)
+
+        centroids = kmeans(x, 3, generator=generator)
+
+        distances = torch.cdist(centers, centroids)
+        self.assertTrue((distances.min(dim=1).values < 0.1).all())
+
+    def test_batched_matches_single(self):
+        generator = torch.Generator().manual_seed(0)
+        x = torch.randn(2, 500, 4, generator=generator)
+
+        batched = kmeans(x, 8, generator=torch.Generator().manual_seed(1))
+
+        self.assertEqual(batched.shape, (2, 8, 4))
+
+
+class TestIVFPQIndex(unittest.TestCase):
+    def setUp(self):
+        generator = torch.Generator().manual_seed(0)
+        centers = torch.randn(32, 32, generator=generator)
+        self.x = normalize_rows(
+            centers[torch.randint(0, 32, (4000,), generator=generator)]
+            + 0.3 * torch.randn(4000, 32, generator=generator)
+        )
+        self.queries = self.x[:50] + 0.05 * torch.randn(50, 32, generator=generator)
+        _, self.expected_rows = topk_cosine_similarity(self.queries, self.x, 10)
+
+        self.index = IVFPQIndex(number_of_lists=16, number_of_subquantizers=8)
+        self.index.train(self.x)
+        self.index.add(torch.arange(2000), self.x[:2000])
+        self.index.add(torch.arange(2000, 4000), self.x[2000:])
+
+    def recall(self, rows: torch.Tensor) -> float:
+        return (
+            sum(
+                len(set(found.tolist()) & set(expected.tolist()))
+                for found, expected in zip(rows, self.expected_rows)
+            )
+            / self.expected_rows.numel()
+        )
+
+    def test_recall_grows_with_nprobe(self):
+        _, rows_with_one_list = self.index.search(self.queries, 100, nprobe=1)
+        _, rows_with_all_lists = self.index.search(self.queries, 100, nprobe=16)
+
+        self.assertEqual(len(self.index), 4000)
+        self.assertGreater(self.recall(rows_with_all_lists), 0.9)
+        self.assertGreaterEqual(
+            self.recall(rows_with_all_lists), self.recall(rows_with_one_list)
+        )
+
+    def test_incremental_adds_match_one_add(self):
+        index = IVFPQIndex(number_of_lists=16, number_of_subquantizers=8)
+        index.train(self.x)
+        index.add(torch.arange(4000), self.x)
+        values, rows = index.search(self.queries, 10, nprobe=4)
+
+        self.index.reset()
+        for start, end in [(0, 1), (1, 2), (2, 1500), (1500, 1501), (1501, 4000)]:
+            self.index.add(torch.arange(start, end), self.x[start:end])
+            if end == 1500:
+                _, partial_rows = self.index.search(self.queries, 10, nprobe=4)
+                self.assertTrue((partial_rows < 1500).all())
+        incremental_values, incremental_rows = self.index.search(
+            self.queries, 10, nprobe=4
+        )
+
+        self.assertEqual(len(self.index), 4000)
+        torch.testing.assert_close(incremental_values, values)
+        torch.testing.assert_close(incremental_rows, rows)
+
+    def test_valid_mask(self):
+        valid = torch.ones(4000, dtype=torch.bool)
+        valid[:2000] = False
+
+        _, rows = self.index.search(self.queries, 10, nprobe=16, valid=valid)
+
+        self.assertTrue((rows >= 2000).all())
+
+    def test_missing_results(self):
+        values, rows = self.index.search(self.queries[:1], 10, nprobe=1)
+        small_index = IVFPQIndex(number_of_lists=4, number_of_subquantizers=8)
+        small_index.train(self.x)
+        small_index.add(torch.arange(3), self.x[:3])
+
+        values, rows = small_index.search(self.queries[:1], 10, nprobe=4)
+
+        self.assertEqual(sorted(rows[0, :3].tolist()), [0, 1, 2])
+        self.assertTrue((rows[0, 3:] == -1).all())
+        self.assertTrue(torch.isinf(values[0, 3:]).all())
+
+    def test_untrained(self):
+        with self.assertRaises(RuntimeError):
+            IVFPQIndex().add(torch.arange(2), self.x[:2])
+        with self.assertRaises(RuntimeError):
+            IVFPQIndex(number_of_subquantizers=5).train(self.x)
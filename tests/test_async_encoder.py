@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+import torch
+
+from source.async_encoder import AsyncBatchEncoder
+from source.encode import encode_numbers
+
+
+class TestAsyncBatchEncoder(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_are_batched(self):
+        input = [f"{number} dollars" for number in range(50)]
+
+        async with AsyncBatchEncoder(
+            backend="hashing", max_batch_size=16, max_wait_seconds=0.05
+        ) as encoder:
+            embeddings = await asyncio.gather(*map(encoder.encode, input))
+            statistics = encoder.statistics()
+
+        torch.testing.assert_close(
+            torch.stack(embeddings), encode_numbers(input, backend="hashing")
+        )
+        self.assertEqual(
+            sum(
+                size * count
+                for size, count in statistics["batch_size_histogram"].items()
+            ),
+            50,
+        )
+        self.assertLessEqual(max(statistics["batch_size_histogram"]), 16)
+        self.assertLess(statistics["number_of_batches"], 50)
+        # Every result owns its memory instead of viewing the batch.
+        self.assertEqual(
+            {embedding.untyped_storage().nbytes() for embedding in embeddings},
+            {384 * 4},
+        )
+        self.assertEqual(
+            sum(statistics["queue_depth_histogram"].values()),
+            statistics["number_of_batches"],
+        )
+
+    async def test_single_call_waits_at_most_max_wait(self):
+        async with AsyncBatchEncoder(
+            backend="hashing", max_wait_seconds=0.01
+        ) as encoder:
+            embedding = await asyncio.wait_for(encoder.encode(3), timeout=5)
+
+        torch.testing.assert_close(embedding, encode_numbers([3], backend="hashing")[0])
+
+    async def test_errors_reach_callers(self):
+        async with AsyncBatchEncoder(
+            embedding_type="cubic", backend="hashing"
+        ) as encoder:
+            with self.assertRaises(RuntimeError):
+                await encoder.encode(1)
+            # Encoder keeps serving after a failed batch.
+            encoder.embedding_type = "sinusoidal"
+            self.assertEqual((await encoder.encode(1)).shape, (384,))
+
+    async def test_close_cancels_pending_calls(self):
+        encoder = AsyncBatchEncoder(backend="hashing", max_wait_seconds=10)
+        pending = asyncio.ensure_future(encoder.encode(1))
+        await asyncio.sleep(0.01)
+
+        await encoder.close()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
@@ -0,0 +1,228 @@
+import tempfile
+import unittest
+import zlib
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from source.encode import encode_numbers, encode_numbers_multi
+from source.numeric_representation import (
+    MODEL_REGISTRY,
+    EmbeddingClasses,
+    HashingBackend,
+    MinilmBackend,
+    PrecomputedBackend,
+    QuantizedMinilmBackend,
+    SigmoidMinilmEmbedding,
+    get_contextual_backend,
+)
+from source.numeric_representation.model_registry import quantize_linear_layers
+
+TEST_BACKBONE_NAME = "test-backbone"
+
+
+class DeterministicBackbone:
+    """
+    Stand-in for sentence transformer, embeds every sentence from its hash.
+    """
+
+    def __init__(self) -> None:
+        self.encoded_sentences: list[str] = []
+
+    def encode(self, sentences: list[str]) -> np.ndarray:
+        self.encoded_sentences.extend(sentences)
+        return np.stack(
+            [
+                np.random.default_rng(zlib.crc32(sentence.encode())).random(
+                    384, dtype=np.float32
+                )
+                for sentence in sentences
+            ]
+        )
+
+
+class TestContextualEmbeddings(unittest.TestCase):
+    def setUp(self):
+        self.backbone = DeterministicBackbone()
+        MODEL_REGISTRY.register(TEST_BACKBONE_NAME, self.backbone)
+        self.model = SigmoidMinilmEmbedding()
+        self.model.contextual_backend = MinilmBackend(TEST_BACKBONE_NAME)
+
+    def tearDown(self):
+        MODEL_REGISTRY.unload(TEST_BACKBONE_NAME)
+
+    def test_duplicates_are_embedded_once(self):
+        input = ["12 USD", "12 usd", 5, "5", "rated 5 stars", "12 USD"]
+
+        embeddings = self.model.encode(input)
+
+        expected = self.model.extract_numerical_embeddings(
+            torch.Tensor([12, 12, 5, 5, 5, 12])
+        ) * torch.from_numpy(
+            DeterministicBackbone().encode([str(element).lower() for element in input])
+        )
+        torch.testing.assert_close(embeddings, expected, rtol=0, atol=0)
+        self.assertEqual(
+            self.backbone.encoded_sentences, ["12 usd", "5", "rated 5 stars"]
+        )
+        self.assertEqual(self.model.deduplication_ratio, 0.5)
+
+
+class TestContextualBackends(unittest.TestCase):
+    def test_hashing_backend(self):
+        backend = HashingBackend()
+        embeddings = backend.encode(["23 dollars", "24 dollars", "rated 5 stars", ""])
+
+        self.assertEqual(embeddings.shape, (4, 384))
+        np.testing.assert_array_equal(
+            embeddings,
+            backend.encode(["23 dollars", "24 dollars", "rated 5 stars", ""]),
+        )
+        np.testing.assert_allclose(np.linalg.norm(embeddings[:3], axis=1), 1, rtol=1e-6)
+        self.assertGreater(embeddings[0] @ embeddings[1], embeddings[0] @ embeddings[2])
+
+    def test_precomputed_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            embeddings = np.eye(2, 384, dtype=np.float32)
+            PrecomputedBackend.save(directory, ["Price", "Weight"], embeddings)
+
+            backend = PrecomputedBackend(directory)
+            np.testing.assert_array_equal(
+                backend.encode(["weight", "price"]), embeddings[[1, 0]]
+            )
+            with self.assertRaises(KeyError):
+                backend.encode(["volume"])
+
+            backend_with_fallback = PrecomputedBackend(
+                directory, fallback=HashingBackend()
+            )
+            np.testing.assert_array_equal(
+                backend_with_fallback.encode(["price", "volume"]),
+                np.stack([embeddings[0], HashingBackend().encode(["volume"])[0]]),
+            )
+
+    def test_precomputed_backend_names(self):
+        with tempfile.TemporaryDirectory() as directory:
+            names = []
+            for parent in ["first", "second"]:
+                table_directory = Path(directory) / parent / "labels"
+                PrecomputedBackend.save(
+                    table_directory, ["Price"], np.ones((1, 384), np.float32)
+                )
+                names.append(PrecomputedBackend(table_directory).name)
+            names.append(
+                PrecomputedBackend(table_directory, fallback=HashingBackend()).name
+            )
+
+            self.assertEqual(names[1], PrecomputedBackend(table_directory).name)
+            self.assertEqual(len(set(names)), 3)
+            self.assertTrue(
+                all(name.startswith("precomputed-labels-") for name in names)
+            )
+
+    def test_encode_numbers_with_hashing_backend(self):
+        input = ["124", 124, 12.4, "Rated 5 stars"]
+        for element in EmbeddingClasses:
+            embeddings = encode_numbers(
+                input, embedding_type=element.value, backend="hashing"
+            )
+            self.assertEqual(embeddings.shape, (4, 384))
+
+    def test_encode_numbers_with_numeric_arrays(self):
+        values = [124.0, 12.5, -3.0, 12.5, 0.0, 0.1, 3.3]
+        for element in EmbeddingClasses:
+            expected = encode_numbers(
+                values, embedding_type=element.value, backend="hashing"
+            )
+            for input in [
+                np.array(values),
+                np.array(values, dtype=np.float32),
+                torch.tensor(values),
+                torch.tensor(values, dtype=torch.float64),
+            ]:
+                torch.testing.assert_close(
+                    encode_numbers(
+                        input, embedding_type=element.value, backend="hashing"
+                    ),
+                    expected,
+                    equal_nan=True,
+                )
+
+    def test_encode_numbers_with_bfloat16_tensor(self):
+        values = [124.0, 12.5, -3.0, 0.5]
+
+        embeddings = encode_numbers(
+            torch.tensor(values, dtype=torch.bfloat16), backend="hashing"
+        )
+
+        torch.testing.assert_close(
+            embeddings, encode_numbers(values, backend="hashing")
+        )
+
+    def test_encode_numbers_multi(self):
+        input = ["124", 124, 12.4, "Rated 5 stars", "no number", "-3 kg"]
+        embedding_types = [element.value for element in EmbeddingClasses]
+
+        embeddings = encode_numbers_multi(input, embedding_types, backend="hashing")
+
+        self.assertEqual(list(embeddings), embedding_types)
+        for embedding_type in embedding_types:
+            torch.testing.assert_close(
+                embeddings[embedding_type],
+                encode_numbers(input, embedding_type=embedding_type, backend="hashing"),
+                equal_nan=True,
+            )
+
+    def test_encode_numbers_multi_embeds_context_once(self):
+        backbone = DeterministicBackbone()
+        MODEL_REGISTRY.register(TEST_BACKBONE_NAME, backbone)
+        self.addCleanup(MODEL_REGISTRY.unload, TEST_BACKBONE_NAME)
+
+        encode_numbers_multi(
+            ["12 usd", "5 eur"],
+            ["sinusoidal", "sigmoid", "logarithmic"],
+            backend=MinilmBackend(TEST_BACKBONE_NAME),
+        )
+
+        self.assertEqual(backbone.encoded_sentences, ["12 usd", "5 eur"])
+
+    def test_quantized_backend_uses_its_own_registry_entry(self):
+        float_backbone, quantized_backbone = (
+            DeterministicBackbone(),
+            DeterministicBackbone(),
+        )
+        MODEL_REGISTRY.register(TEST_BACKBONE_NAME, float_backbone)
+        MODEL_REGISTRY.register(f"{TEST_BACKBONE_NAME}:int8", quantized_backbone)
+        self.addCleanup(MODEL_REGISTRY.unload, TEST_BACKBONE_NAME)
+        self.addCleanup(MODEL_REGISTRY.unload, f"{TEST_BACKBONE_NAME}:int8")
+        self.addCleanup(torch.set_num_threads, torch.get_num_threads())
+
+        backend = QuantizedMinilmBackend(TEST_BACKBONE_NAME, num_threads=1)
+        backend.encode(["12 usd"])
+
+        self.assertEqual(quantized_backbone.encoded_sentences, ["12 usd"])
+        self.assertEqual(float_backbone.encoded_sentences, [])
+        self.assertNotEqual(backend.name, MinilmBackend(TEST_BACKBONE_NAME).name)
+        # Number of threads is process wide and set once, not per encode.
+        self.assertEqual(torch.get_num_threads(), 1)
+        self.assertIsInstance(
+            get_contextual_backend("minilm-int8"), QuantizedMinilmBackend
+        )
+
+    def test_quantize_linear_layers(self):
+        torch.manual_seed(0)
+        model = torch.nn.Sequential(torch.nn.Linear(64, 64), torch.nn.ReLU())
+        x = torch.randn(16, 64)
+        expected = model(x)
+
+        quantized = quantize_linear_layers(model)
+
+        self.assertNotIsInstance(quantized[0], torch.nn.Linear)
+        self.assertGreater(
+            torch.nn.functional.cosine_similarity(quantized(x), expected).min(), 0.99
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from source.numeric_representation import ContextualEmbeddingCache
+
+
+class TestContextualEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.computed_keys: list[str] = []
+
+    def compute(self, keys: list[str]) -> np.ndarray:
+        self.computed_keys.extend(keys)
+        return np.array([[len(key), ord(key[0])] for key in keys], dtype=np.float32)
+
+    def test_hits_and_misses(self):
+        cache = ContextualEmbeddingCache(max_entries=10)
+        first = cache.get_or_compute("sinusoidal", ["usd", "eur", "usd"], self.compute)
+        second = cache.get_or_compute("sinusoidal", ["eur", "usd"], self.compute)
+
+        np.testing.assert_array_equal(first[[1, 0]], second)
+        self.assertEqual(self.computed_keys, ["usd", "eur"])
+        self.assertEqual(cache.statistics()["hits"], 2)
+        self.assertEqual(cache.statistics()["misses"], 3)
+
+    def test_namespaces_and_eviction(self):
+        cache = ContextualEmbeddingCache(max_entries=1)
+        cache.get_or_compute("sinusoidal", ["usd"], self.compute)
+        cache.get_or_compute("sigmoid", ["usd"], self.compute)
+        cache.get_or_compute("sinusoidal", ["usd"], self.compute)
+
+        self.assertEqual(self.computed_keys, ["usd", "usd", "usd"])
+        self.assertEqual(len(cache), 1)
+
+    def test_disk_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ContextualEmbeddingCache(directory=directory)
+            expected = cache.get_or_compute("sigmoid", ["kg", "km"], self.compute)
+
+            restarted_cache = ContextualEmbeddingCache(directory=directory)
+            restored = restarted_cache.get_or_compute(
+                "sigmoid", ["km", "kg"], self.compute
+            )
+
+            np.testing.assert_array_equal(expected[[1, 0]], restored)
+            self.assertEqual(self.computed_keys, ["kg", "km"])
+            self.assertEqual(restarted_cache.statistics()["disk_hits"], 2)
+
+    def test_disk_tier_shared_between_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Both caches start before anything is written, as two workers would.
+            first_cache = ContextualEmbeddingCache(directory=directory)
+            second_cache = ContextualEmbeddingCache(directory=directory)
+            first_cache.get_or_compute("sigmoid", ["warm"], self.compute)
+            second_cache.get_or_compute("sigmoid", ["up"], self.compute)
+
+            first_cache.get_or_compute("sigmoid", ["usd"], self.compute)
+            second_cache.get_or_compute("sigmoid", ["eur"], self.compute)
+            second_cache.clear()
+            restored = second_cache.get_or_compute(
+                "sigmoid", ["usd", "eur", "warm", "up"], self.compute
+            )
+
+            np.testing.assert_array_equal(
+                restored, self.compute(["usd", "eur", "warm", "up"])
+            )
+            self.assertEqual(second_cache.statistics()["disk_hits"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
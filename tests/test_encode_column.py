@@ -0,0 +1,89 @@
+import unittest
+
+import torch
+
+from source.encode import EMBEDDING_TYPE_TO_EMBEDDING_CLASS
+from source.numeric_representation import (
+    MODEL_REGISTRY,
+    EmbeddingClasses,
+    MinilmBackend,
+)
+from source.utils import mask_numbers
+from tests.test_contextual_embeddings import DeterministicBackbone
+
+TEST_BACKBONE_NAME = "test-column-backbone"
+NUMERIC_EMBEDDING_TYPES = ["sinusoidal", "logarithmic", "sigmoid"]
+
+
+class TestEncodeColumn(unittest.TestCase):
+    def setUp(self):
+        self.backbone = DeterministicBackbone()
+        MODEL_REGISTRY.register(TEST_BACKBONE_NAME, self.backbone)
+        self.addCleanup(MODEL_REGISTRY.unload, TEST_BACKBONE_NAME)
+
+    def get_model(self, embedding_type: str):
+        model = EMBEDDING_TYPE_TO_EMBEDDING_CLASS[EmbeddingClasses(embedding_type)]()
+        model.contextual_backend = MinilmBackend(TEST_BACKBONE_NAME)
+        return model
+
+    def test_numeric_column_is_one_backbone_call(self):
+        values = [12, 7.5, 3, 1e4]
+        for embedding_type in NUMERIC_EMBEDDING_TYPES:
+            with self.subTest(embedding_type=embedding_type):
+                self.backbone.encoded_sentences.clear()
+                model = self.get_model(embedding_type)
+
+                embeddings = model.encode_column("Price in dollars", values)
+                expected = model.combine_embeddings(
+                    torch.tensor(values),
+                    torch.from_numpy(
+                        DeterministicBackbone().encode(
+                            ["price in dollars <number>"] * len(values)
+                        )
+                    ),
+                )
+
+                self.assertEqual(
+                    self.backbone.encoded_sentences, ["price in dollars <number>"]
+                )
+                torch.testing.assert_close(embeddings, expected)
+
+    def test_string_cells_share_templates(self):
+        values = ["costs 23 dollars", "costs 5 dollars", 4, "n/a", "costs 1 euro"]
+        model = self.get_model("sigmoid")
+        expected = model.encode(values)
+        self.backbone.encoded_sentences.clear()
+
+        embeddings = model.encode_column(None, values)
+
+        self.assertEqual(
+            self.backbone.encoded_sentences,
+            ["<number>", "costs <number> dollars", "n/a", "costs <number> euro"],
+        )
+        self.assertEqual(embeddings.shape, (5, 384))
+        torch.testing.assert_close(embeddings[3], expected[3])
+
+    def test_out_buffer(self):
+        model = self.get_model("sinusoidal")
+        out = torch.empty(3, 384)
+
+        embeddings = model.encode_column("weight", ["2 kg", "3 kg", 4], out=out)
+
+        self.assertEqual(embeddings.data_ptr(), out.data_ptr())
+        torch.testing.assert_close(
+            out, model.encode_column("weight", ["2 kg", "3 kg", 4])
+        )
+
+    def test_language_model_is_not_supported(self):
+        with self.assertRaises(RuntimeError):
+            self.get_model("language_model").encode_column("price", [1, 2])
+
+    def test_mask_numbers(self):
+        self.assertEqual(
+            mask_numbers(["costs 2 dollars", "no number", "x -3 y 5"]),
+            ["costs <number> dollars", "no number", "x <number> y 5"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
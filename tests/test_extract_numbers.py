@@ -0,0 +1,69 @@
+import random
+import unittest
+
+import numpy as np
+import torch
+
+from source.numeric_representation import (
+    LoagrithmicMinilmEmbedding,
+    SinusoidalMinilmEmbedding,
+)
+from source.utils import extract_numbers
+
+
+class TestExtractNumbers(unittest.TestCase):
+    def test_matches_extract_number(self):
+        generator = random.Random(0)
+        alphabet = list("0123456789 .eE+-_\t\nabinfINFty$\x00\x1c\x1f") + [
+            "nan",
+            "inf",
+            "١",
+        ]
+        input: list[int | float | str] = [
+            "".join(generator.choices(alphabet, k=generator.randint(0, 12)))
+            for _ in range(5000)
+        ]
+        input += [124, 12.4, 0, "124 one hunder twenty four", "The product costs 23"]
+
+        for model in [LoagrithmicMinilmEmbedding(), SinusoidalMinilmEmbedding()]:
+            expected = torch.Tensor(
+                [model.extract_number(element) for element in input]
+            )
+            numbers, _ = extract_numbers(input, fallback=model.number_fallback)
+            torch.testing.assert_close(
+                numbers, expected, equal_nan=True, rtol=0, atol=0
+            )
+
+    def test_found_mask(self):
+        numbers, found = extract_numbers(
+            np.array(["2 dollars", "no number", "rated 5 stars"]), fallback=0
+        )
+        self.assertEqual(numbers.tolist(), [2, 0, 5])
+        self.assertEqual(found.tolist(), [True, False, True])
+
+    def test_information_separators_are_not_stripped(self):
+        # `float` does not strip \x1c-\x1f, although `str.isspace` is True for them.
+        numbers, found = extract_numbers(
+            ["costs 9\x1c dollars", "\x1f7 or 8", "\t5\n kg"], fallback=0
+        )
+        self.assertEqual(numbers.tolist(), [0, 8, 5])
+        self.assertEqual(found.tolist(), [False, True, True])
+
+    def test_numeric_arrays_are_not_copied(self):
+        array = np.array([2.5, -1, 1e3], dtype=np.float32)
+        tensor = torch.tensor([2.5, -1, 1e3])
+
+        for input in [array, tensor]:
+            numbers, found = extract_numbers(input)
+
+            self.assertEqual(numbers.data_ptr(), torch.as_tensor(input).data_ptr())
+            self.assertTrue(found.all())
+
+        numbers, _ = extract_numbers(np.array([1, 2, 3]))
+        torch.testing.assert_close(numbers, torch.Tensor([1, 2, 3]))
+        with self.assertRaises(RuntimeError):
+            extract_numbers(np.zeros((2, 2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from benchmarks.import_time import measure_import_time
+
+HEAVY_MODULES = ["sentence_transformers", "transformers"]
+
+
+class TestImportTime(unittest.TestCase):
+    def test_encode_does_not_import_model_dependencies(self):
+        imported_modules = measure_import_time("source.encode")
+
+        self.assertIn("source.encode", imported_modules)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, imported_modules)
+
+    def test_embedding_classes_do_not_import_torch(self):
+        imported_modules = measure_import_time(
+            "source.numeric_representation.embedding_classes"
+        )
+
+        self.assertNotIn("torch", imported_modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
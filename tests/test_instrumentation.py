@@ -0,0 +1,85 @@
+import unittest
+
+from source.encode import encode_numbers, set_contextual_embedding_cache
+from source.instrumentation import StageStatistics, instrument, stage
+from source.numeric_representation import ContextualEmbeddingCache
+from table_infromation_retrieval import CatalogRetrievalDatabase
+
+INPUT = ["12 dollars", "7 kg", "12 dollars", 3]
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_disabled_stage_reports_nothing(self):
+        reported = []
+        with instrument(lambda *event: reported.append(event)):
+            pass
+        with stage("extract_numbers", 3):
+            pass
+
+        self.assertEqual(reported, [])
+
+    def test_stages_of_every_embedding_type(self):
+        expected_stages = {
+            "sinusoidal": {"extract_numbers", "numerical_embeddings", "combine"},
+            "logarithmic": {"extract_numbers", "numerical_embeddings", "combine"},
+            "sigmoid": {"extract_numbers", "numerical_embeddings", "combine"},
+            "language_model": set(),
+        }
+        for embedding_type, stages in expected_stages.items():
+            with self.subTest(embedding_type=embedding_type):
+                with instrument() as statistics:
+                    embeddings = encode_numbers(
+                        INPUT, embedding_type=embedding_type, backend="hashing"
+                    )
+                statistics = statistics.as_dict()
+
+                self.assertEqual(embeddings.shape, (4, 384))
+                self.assertLessEqual(
+                    stages
+                    | {
+                        "contextual_embeddings",
+                        "contextual/lowercase",
+                        "contextual/backend_encode",
+                        "contextual/from_numpy",
+                    },
+                    set(statistics),
+                )
+                self.assertEqual(statistics["contextual/lowercase"]["items"], 4)
+                self.assertEqual(statistics["contextual/backend_encode"]["items"], 3)
+
+    def test_cache_counters(self):
+        set_contextual_embedding_cache(ContextualEmbeddingCache())
+        self.addCleanup(set_contextual_embedding_cache, None)
+
+        with instrument() as statistics:
+            encode_numbers(INPUT, backend="hashing")
+            encode_numbers(INPUT, backend="hashing")
+        statistics = statistics.as_dict()
+
+        self.assertEqual(statistics["cache/misses"]["items"], 3)
+        self.assertEqual(statistics["cache/hits"]["items"], 3)
+        self.assertEqual(statistics["cache/hits"]["seconds"], 0.0)
+
+    def test_catalog_ingestion_stages(self):
+        catalog = [{"price": "12 dollars", "color": ["red", "blue"]}]
+        with instrument() as statistics:
+            CatalogRetrievalDatabase(catalog, backend="hashing")
+        statistics = statistics.as_dict()
+
+        self.assertEqual(statistics["catalog/encode"]["items"], 3)
+        self.assertEqual(statistics["catalog/add_rows"]["calls"], 1)
+
+    def test_report(self):
+        statistics = StageStatistics()
+        statistics("extract_numbers", 0.5, 1000)
+        statistics("extract_numbers", 0.5, 1000)
+
+        report = statistics.report()
+
+        self.assertIn("extract_numbers", report)
+        self.assertIn("2000", report)
+        self.assertEqual(statistics.calls["extract_numbers"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import threading
+import unittest
+
+import torch
+
+from source.numeric_representation import ModelRegistry
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.number_of_loads = 0
+
+        def loader(model_name: str) -> torch.nn.Module:
+            self.number_of_loads += 1
+            return torch.nn.Linear(4, 4)
+
+        self.registry = ModelRegistry(loader=loader)
+
+    def test_model_is_loaded_once(self):
+        first = self.registry.get("backbone")
+        second = self.registry.get("backbone")
+
+        self.assertIs(first, second)
+        self.assertEqual(self.number_of_loads, 1)
+
+    def test_loading_does_not_block_loaded_models(self):
+        self.registry.get("loaded")
+        loading_started, finish_loading = threading.Event(), threading.Event()
+
+        def slow_loader(model_name: str) -> torch.nn.Module:
+            self.number_of_loads += 1
+            loading_started.set()
+            finish_loading.wait(timeout=10)
+            return torch.nn.Linear(4, 4)
+
+        slow_models = []
+        loading_threads = [
+            threading.Thread(
+                target=lambda: slow_models.append(
+                    self.registry.get("slow", loader=slow_loader)
+                )
+            )
+            for _ in range(2)
+        ]
+        for thread in loading_threads:
+            thread.start()
+        self.assertTrue(loading_started.wait(timeout=10))
+
+        lookup = threading.Thread(target=self.registry.get, args=("loaded",))
+        lookup.start()
+        lookup.join(timeout=5)
+        self.assertFalse(lookup.is_alive())
+
+        finish_loading.set()
+        for thread in loading_threads:
+            thread.join()
+        self.assertIs(slow_models[0], slow_models[1])
+        self.assertEqual(self.number_of_loads, 2)
+
+    def test_memory_usage(self):
+        self.registry.get("backbone")
+        self.assertEqual(self.registry.memory_usage(), {"backbone": (16 + 4) * 4})
+
+    def test_unload_idle(self):
+        self.registry.get("backbone")
+        self.assertEqual(self.registry.unload_idle(max_idle_seconds=3600), [])
+        self.assertEqual(self.registry.unload_idle(max_idle_seconds=-1), ["backbone"])
+        self.assertFalse(self.registry.is_loaded("backbone"))
+
+        self.registry.get("backbone")
+        self.assertEqual(self.number_of_loads, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+from multiprocessing.shared_memory import SharedMemory
+from unittest import mock
+
+import numpy as np
+import torch
+
+from source.encode import encode_numbers, set_contextual_embedding_cache
+from source.numeric_representation import ContextualEmbeddingCache
+from source.parallel import shutdown_executors
+
+INPUT = ["12 dollars", "7 kg", 3, "no number", "costs 4.5 euro", 1e6, "-2 degrees"]
+
+
+class TestEncodeNumbersParallel(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(shutdown_executors)
+
+    def test_matches_serial_encoding(self):
+        inputs = {
+            "list": INPUT * 3,
+            "ndarray": np.linspace(-50, 50, 23),
+        }
+        for input_type, input in inputs.items():
+            with self.subTest(input_type=input_type):
+                expected = encode_numbers(input, backend="hashing")
+
+                embeddings = encode_numbers(input, workers=2, backend="hashing")
+
+                torch.testing.assert_close(embeddings, expected)
+
+    def test_shared_memory_is_unlinked(self):
+        shared_memory_names = []
+
+        def create_shared_memory(*args, **kwargs):
+            shared_memory = SharedMemory(*args, **kwargs)
+            shared_memory_names.append(shared_memory.name)
+            return shared_memory
+
+        with mock.patch(
+            "source.parallel.SharedMemory", side_effect=create_shared_memory
+        ):
+            encode_numbers(INPUT, workers=2, backend="hashing")
+
+        self.assertEqual(len(shared_memory_names), 1)
+        with self.assertRaises(FileNotFoundError):
+            SharedMemory(name=shared_memory_names[0])
+
+    def test_workers_share_disk_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            set_contextual_embedding_cache(
+                ContextualEmbeddingCache(directory=directory)
+            )
+            self.addCleanup(set_contextual_embedding_cache, None)
+            encode_numbers(INPUT, workers=2, backend="hashing")
+
+            cache = ContextualEmbeddingCache(directory=directory)
+            set_contextual_embedding_cache(cache)
+            encode_numbers(INPUT, backend="hashing")
+
+            self.assertEqual(cache.statistics()["disk_hits"], len(INPUT))
+            self.assertEqual(cache.statistics()["misses"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
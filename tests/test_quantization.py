@@ -0,0 +1,81 @@
+import unittest
+
+import torch
+
+from source.encode import encode_number, encode_numbers
+from source.quantization import (
+    QuantizedEmbeddings,
+    dequantize_embeddings,
+    quantize_embeddings,
+    quantized_cosine_similarity_matrix,
+    quantized_topk_cosine_similarity,
+)
+from source.utils import pairwise_cosine_similarity_matrix
+
+
+class TestQuantization(unittest.TestCase):
+    def setUp(self):
+        generator = torch.Generator().manual_seed(0)
+        self.embeddings = torch.randn(500, 384, generator=generator)
+        self.queries = torch.randn(7, 384, generator=generator)
+
+    def test_round_trip(self):
+        for output_dtype, tolerance in [
+            ("float32", 0),
+            ("float16", 1e-2),
+            ("int8", 5e-2),
+        ]:
+            restored = dequantize_embeddings(
+                quantize_embeddings(self.embeddings, output_dtype)
+            )
+            self.assertEqual(restored.dtype, torch.float32)
+            self.assertLessEqual(
+                (restored - self.embeddings).abs().max().item(), tolerance
+            )
+
+    def test_int8_layout(self):
+        quantized = quantize_embeddings(self.embeddings, "int8")
+
+        self.assertIsInstance(quantized, QuantizedEmbeddings)
+        self.assertEqual(quantized.values.dtype, torch.int8)
+        self.assertEqual(quantized.scales.shape, (500,))
+        self.assertEqual(quantized.values.abs().amax(dim=1).min().item(), 127)
+        self.assertEqual(quantized.nbytes, 500 * 384 + 500 * 4)
+        self.assertEqual(len(quantized[10:20]), 10)
+
+    def test_similarity_on_quantized_rows(self):
+        expected = pairwise_cosine_similarity_matrix(self.queries, self.embeddings)
+        for output_dtype in ["float16", "int8"]:
+            quantized = quantize_embeddings(self.embeddings, output_dtype)
+
+            similarities = quantized_cosine_similarity_matrix(self.queries, quantized)
+            torch.testing.assert_close(similarities, expected, atol=1e-2, rtol=0)
+            torch.testing.assert_close(
+                quantized_cosine_similarity_matrix(
+                    self.queries, quantized, row_block_size=7
+                ),
+                similarities,
+            )
+
+            values, indices = quantized_topk_cosine_similarity(
+                self.queries, quantized, 5, memory_budget=4 * 100
+            )
+            torch.testing.assert_close(values, torch.gather(similarities, 1, indices))
+
+    def test_unsupported_dtype(self):
+        with self.assertRaises(RuntimeError):
+            quantize_embeddings(self.embeddings, "int4")
+
+    def test_encode_numbers_output_dtype(self):
+        input = [1, "2 dollars", "three kilograms"]
+        expected = encode_numbers(input, backend="hashing")
+
+        half = encode_numbers(input, backend="hashing", output_dtype="float16")
+        quantized = encode_numbers(input, backend="hashing", output_dtype="int8")
+        single = encode_number(input[1], backend="hashing", output_dtype="int8")
+
+        self.assertEqual(half.dtype, torch.float16)
+        torch.testing.assert_close(
+            quantized.dequantize(), expected, atol=expected.abs().max() / 127, rtol=0
+        )
+        torch.testing.assert_close(single.values, quantized.values[1])
@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+import torch
+
+from source.encode import (
+    encode_numbers,
+    encode_numbers_iter,
+    encode_numbers_to_buffer,
+    get_embedding_model,
+)
+from source.numeric_representation import MODEL_REGISTRY, EmbeddingClasses
+from source.numeric_representation.model_registry import DEFAULT_MODEL_NAME
+from tests.test_contextual_embeddings import DeterministicBackbone
+
+
+class TestStreamingEncode(unittest.TestCase):
+    def setUp(self):
+        MODEL_REGISTRY.register(DEFAULT_MODEL_NAME, DeterministicBackbone())
+        self.input = [f"{number} dollars" for number in range(25)]
+
+    def tearDown(self):
+        MODEL_REGISTRY.unload(DEFAULT_MODEL_NAME)
+
+    def test_encode_numbers_iter(self):
+        chunks = list(encode_numbers_iter(iter(self.input), chunk_size=10))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        torch.testing.assert_close(torch.cat(chunks), encode_numbers(self.input))
+
+    def test_encode_numbers_to_buffer(self):
+        out = np.zeros((30, 384), dtype=np.float32)
+
+        number_of_rows = encode_numbers_to_buffer(
+            (element for element in self.input), out=out, chunk_size=10
+        )
+
+        self.assertEqual(number_of_rows, 25)
+        torch.testing.assert_close(
+            torch.from_numpy(out[:25]), encode_numbers(self.input)
+        )
+
+        with self.assertRaises(RuntimeError):
+            encode_numbers_to_buffer(self.input, out=out[:20], chunk_size=10)
+
+    def test_encode_numbers_to_half_buffer(self):
+        out = torch.zeros(25, 384, dtype=torch.float16)
+
+        encode_numbers_to_buffer(self.input, out=out, chunk_size=10)
+
+        torch.testing.assert_close(out, encode_numbers(self.input).half())
+
+    def test_encode_into_out(self):
+        for element in EmbeddingClasses:
+            model = get_embedding_model(element.value)
+            out = torch.empty(len(self.input), 384)
+
+            result = model.encode(self.input, out=out)
+
+            self.assertEqual(result.data_ptr(), out.data_ptr())
+            torch.testing.assert_close(out, model.encode(self.input), equal_nan=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,330 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from source.ann_index import IVFPQIndex
+from source.encode import encode_numbers
+from source.utils import normalize_rows, pairwise_cosine_similarity_matrix
+from table_infromation_retrieval import LLM, CatalogRetrievalDatabase, CatalogTable
+
+CATALOG = [
+    {"price": [12, 2, 3, "4"]},
+    {"price": [5, 6], "description": "word in a sentece", "weight": 15.3},
+    {"description": "red, green, blue", "weight": "2 kg"},
+]
+
+
+class TestCatalogTable(unittest.TestCase):
+    def setUp(self):
+        generator = torch.Generator().manual_seed(0)
+        self.embeddings = torch.randn(1000, 16, generator=generator)
+        self.identifiers = torch.arange(1000) * 7
+        self.queries = torch.randn(5, 16, generator=generator)
+
+        self.table = CatalogTable("price", llm=LLM(backend="hashing"))
+        self.table.add_embeddings(self.identifiers[:600], self.embeddings[:600])
+        self.table.add_embeddings(self.identifiers[600:], self.embeddings[600:])
+
+    def test_search_matches_brute_force(self):
+        expected_values, expected_rows = torch.topk(
+            pairwise_cosine_similarity_matrix(self.queries, self.embeddings), 10
+        )
+
+        values, identifiers = self.table.search(
+            self.queries, k=10, memory_budget=256 * 4
+        )
+
+        torch.testing.assert_close(values, expected_values)
+        torch.testing.assert_close(identifiers, self.identifiers[expected_rows])
+
+    def test_delete_and_compact(self):
+        self.table.compaction_threshold = 1.0
+        self.assertEqual(self.table.delete(42 * 7), 1)
+
+        _, identifiers = self.table.search(self.embeddings[42], k=3)
+        self.assertNotIn(42 * 7, identifiers.tolist())
+        self.assertEqual(len(self.table), 999)
+
+        self.table.compact()
+        self.assertEqual(self.table.number_of_rows, 999)
+        torch.testing.assert_close(
+            self.table.search(self.embeddings[42], k=3)[1], identifiers
+        )
+
+    def test_search_with_index(self):
+        self.table.build_index(
+            IVFPQIndex(number_of_lists=8, number_of_subquantizers=4, nprobe=8)
+        )
+        self.table.add_embeddings(
+            self.identifiers[:10] + 1, self.embeddings[:10].flip(1)
+        )
+        self.table.delete(0)
+        expected_values, expected_identifiers = self.table.search(
+            self.queries, k=10, exact=True
+        )
+
+        values, identifiers = self.table.search(self.queries, k=10, refine_factor=101)
+
+        torch.testing.assert_close(values, expected_values)
+        torch.testing.assert_close(identifiers, expected_identifiers)
+
+    def test_numeric_queries_match_brute_force(self):
+        generator = torch.Generator().manual_seed(1)
+        numbers = torch.randint(0, 100, (1000,), generator=generator).float()
+        numbers[::10] = torch.nan
+        table = CatalogTable(
+            "price", llm=self.table.llm, title_embedding=self.queries[0]
+        )
+        table.compaction_threshold = 1.0
+        table.add_embeddings(self.identifiers, self.embeddings, numbers)
+        for identifier in self.identifiers[1:300:2].tolist():
+            table.delete(identifier)
+        is_alive = ~table.is_deleted & ~torch.isnan(numbers)
+
+        range_numbers, range_identifiers = table.search_range(10, 20)
+        expected_rows = torch.nonzero(is_alive & (numbers >= 10) & (numbers <= 20))
+        self.assertEqual(
+            sorted(range_identifiers.tolist()),
+            sorted(self.identifiers[expected_rows.flatten()].tolist()),
+        )
+        self.assertTrue((range_numbers.diff() >= 0).all())
+
+        nearest_numbers, _ = table.search_nearest_value(41.5, k=20)
+        expected_distances, _ = torch.topk(
+            torch.abs(numbers[is_alive] - 41.5), 20, largest=False
+        )
+        torch.testing.assert_close(
+            torch.abs(nearest_numbers - 41.5), expected_distances
+        )
+
+        _, identifiers = table.search(self.queries, k=5, number_range=(10, 20))
+        self.assertTrue(
+            set(identifiers.flatten().tolist()) <= set(range_identifiers.tolist())
+        )
+
+    def test_number_index_merges_appends(self):
+        generator = torch.Generator().manual_seed(2)
+        numbers = torch.randint(0, 50, (1000,), generator=generator).float()
+        numbers[::7] = torch.nan
+        table = CatalogTable(
+            "price", llm=self.table.llm, title_embedding=self.queries[0]
+        )
+        table.compaction_threshold = 1.0
+        for start, end in [(0, 300), (300, 301), (301, 700), (700, 1000)]:
+            table.add_embeddings(
+                self.identifiers[start:end],
+                self.embeddings[start:end],
+                numbers[start:end],
+            )
+            table.delete(self.identifiers[start + 1].item())
+            table.search_range(10, 20)
+
+        sorted_numbers, sorted_rows = table._sorted_number_index()
+        is_alive = ~table.is_deleted[sorted_rows]
+        expected_rows = torch.nonzero(~table.is_deleted & ~torch.isnan(numbers))
+        expected_numbers, order = torch.sort(
+            numbers[expected_rows.flatten()], stable=True
+        )
+        torch.testing.assert_close(sorted_numbers[is_alive], expected_numbers)
+        torch.testing.assert_close(
+            sorted_rows[is_alive], expected_rows.flatten()[order]
+        )
+        # Every delete happened before a merge, which dropped the deleted rows.
+        self.assertTrue(is_alive.all())
+
+    def test_search_single_query(self):
+        values, identifiers = self.table.search(self.embeddings[42], k=3)
+
+        self.assertEqual(values.shape, (3,))
+        self.assertEqual(identifiers[0].item(), 42 * 7)
+
+
+class TestCatalogRetrievalDatabase(unittest.TestCase):
+    def setUp(self):
+        self.database = CatalogRetrievalDatabase(
+            CATALOG, backend="hashing", batch_size=3
+        )
+
+    def test_populate_list_of_tables(self):
+        price_table = self.database.table_title_to_table["price"]
+
+        self.assertEqual(price_table.identifiers.tolist(), [0, 0, 0, 0, 1, 1])
+        torch.testing.assert_close(
+            price_table.embeddings,
+            normalize_rows(
+                encode_numbers(["12", "2", "3", "4", "5", "6"], backend="hashing")
+            ),
+        )
+        self.assertEqual(
+            self.database.table_title_to_table["weight"].identifiers.tolist(), [1, 2]
+        )
+        self.assertEqual(len(self.database.table_title_to_table["description"]), 4)
+        torch.testing.assert_close(
+            self.database.table_titlte_to_embedding["weight"],
+            encode_numbers(["weight"], backend="hashing")[0],
+        )
+
+    def test_search(self):
+        results = self.database.search("red", table_title="description", k=2)
+        self.assertEqual(results[0][0], 2)
+
+    def test_upsert_and_delete(self):
+        self.database.upsert(1, {"price": [7], "color": "red"})
+        self.database.upsert(3, {"price": "12 dollars"})
+        self.assertTrue(self.database.delete(0))
+        self.assertFalse(self.database.delete(0))
+
+        price_table = self.database.table_title_to_table["price"]
+        self.assertEqual(
+            sorted(identifier for identifier, _ in price_table.content), [1, 3]
+        )
+        weight_table = self.database.table_title_to_table["weight"]
+        self.assertEqual([identifier for identifier, _ in weight_table.content], [2])
+        self.assertEqual(self.database.search("red", table_title="color", k=1)[0][0], 1)
+
+    def test_upsert_and_delete_with_empty_field(self):
+        database = CatalogRetrievalDatabase(
+            [{"size": []}, {"price": [1]}], backend="hashing"
+        )
+
+        database.upsert(0, {"size": [], "price": [2]})
+        self.assertTrue(database.delete(0))
+
+        self.assertNotIn("size", database.table_title_to_table)
+        self.assertEqual(
+            [
+                identifier
+                for identifier, _ in database.table_title_to_table["price"].content
+            ],
+            [1],
+        )
+
+    def test_numeric_queries(self):
+        self.assertEqual(
+            self.database.search_range("price", 3, 5), [(0, 3.0), (0, 4.0), (1, 5.0)]
+        )
+        self.assertEqual(
+            self.database.search_nearest_value("price", 5.4, k=2),
+            [(1, 5.0), (1, 6.0)],
+        )
+        self.assertEqual(self.database.search_nearest_value("weight", 3), [(2, 2.0)])
+        self.assertEqual(
+            self.database.search("4", table_title="price", k=1, number_range=(10, 20))[
+                0
+            ][0],
+            0,
+        )
+
+        self.database.delete(1)
+        self.assertEqual(self.database.search_nearest_value("price", 5.4), [(0, 4.0)])
+
+    def test_quantized_storage(self):
+        for embedding_dtype in ["float16", "int8"]:
+            database = CatalogRetrievalDatabase(
+                CATALOG, backend="hashing", embedding_dtype=embedding_dtype
+            )
+            results = database.search("red", table_title="description", k=3)
+            expected = self.database.search("red", table_title="description", k=3)
+
+            self.assertEqual(
+                [identifier for identifier, _ in results],
+                [identifier for identifier, _ in expected],
+            )
+            for (_, value), (_, expected_value) in zip(results, expected):
+                self.assertAlmostEqual(value, expected_value, delta=1e-2)
+
+            with tempfile.TemporaryDirectory() as directory:
+                database.save(directory)
+                loaded_database = CatalogRetrievalDatabase.load(directory)
+                self.assertEqual(
+                    loaded_database.search("red", table_title="description", k=3),
+                    results,
+                )
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.database.save(directory)
+            loaded_database = CatalogRetrievalDatabase.load(directory)
+
+            self.assertEqual(
+                loaded_database.id_to_data_entry, self.database.id_to_data_entry
+            )
+            for title, table in self.database.table_title_to_table.items():
+                loaded_table = loaded_database.table_title_to_table[title]
+                torch.testing.assert_close(loaded_table.embeddings, table.embeddings)
+                torch.testing.assert_close(loaded_table.identifiers, table.identifiers)
+                torch.testing.assert_close(
+                    loaded_table.numbers, table.numbers, equal_nan=True
+                )
+            self.assertEqual(
+                loaded_database.search("red", table_title="description", k=2),
+                self.database.search("red", table_title="description", k=2),
+            )
+
+    def write_jsonl(self, directory: str) -> Path:
+        path = Path(directory) / "catalog.jsonl"
+        lines = [json.dumps(data_entry) for data_entry in CATALOG]
+        path.write_text("\n".join(lines[:1] + [""] + lines[1:]) + "\n")
+        return path
+
+    def test_ingest_jsonl(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_jsonl(directory)
+            reported = []
+
+            database = CatalogRetrievalDatabase.from_jsonl(
+                path,
+                backend="hashing",
+                chunk_size=2,
+                progress=reported.append,
+            )
+
+            self.assertEqual(database.id_to_data_entry, self.database.id_to_data_entry)
+            self.assertEqual([report["entries"] for report in reported], [2, 3])
+            self.assertEqual(reported[-1]["values"], 12)
+            self.assertEqual(reported[-1]["bytes"], path.stat().st_size)
+            for title, table in self.database.table_title_to_table.items():
+                torch.testing.assert_close(
+                    database.table_title_to_table[title].content, table.content
+                )
+
+    def test_ingest_jsonl_keeping_offsets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_jsonl(directory)
+            database = CatalogRetrievalDatabase(CATALOG[:1], backend="hashing")
+
+            database.ingest_jsonl(path, keep_entries=False)
+
+            self.assertEqual(list(database.id_to_data_entry), [0])
+            self.assertEqual(database.get_data_entry(2), CATALOG[1])
+            self.assertEqual(
+                database.search_range("weight", 15, 16), [(2, 15.300000190734863)]
+            )
+
+            database.save(Path(directory) / "database")
+            loaded_database = CatalogRetrievalDatabase.load(
+                Path(directory) / "database"
+            )
+            self.assertEqual(loaded_database.get_data_entry(3), CATALOG[2])
+            self.assertEqual(loaded_database.first_offset_id, 1)
+            self.assertIsInstance(loaded_database.offsets, np.memmap)
+            self.assertEqual(loaded_database.offsets.dtype, np.int64)
+
+            self.assertTrue(database.delete(2))
+            self.assertIsNone(database.get_data_entry(2))
+            self.assertEqual(database.search_range("weight", 15, 16), [])
+
+            database.ingest_jsonl(path, keep_entries=False, first_id=10)
+            # Ids 1 to 3 from first ingestion, 2 deleted, 4 to 9 skipped.
+            self.assertEqual(len(database.offsets), 12)
+            self.assertEqual(database.offsets[[1, *range(3, 9)]].tolist(), [-1] * 7)
+            self.assertEqual(database.get_data_entry(7), None)
+            self.assertEqual(database.get_data_entry(12), CATALOG[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
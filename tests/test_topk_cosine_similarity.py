@@ -0,0 +1,64 @@
+import unittest
+
+import torch
+
+from source.utils import (
+    normalize_rows,
+    pairwise_cosine_similarity_matrix,
+    topk_cosine_similarity,
+)
+
+
+class TestTopkCosineSimilarity(unittest.TestCase):
+    def setUp(self):
+        generator = torch.Generator().manual_seed(0)
+        self.queries = torch.randn(37, 16, generator=generator)
+        self.rows = torch.randn(1001, 16, generator=generator)
+        self.expected_values, self.expected_indices = torch.topk(
+            pairwise_cosine_similarity_matrix(self.queries, self.rows), 5
+        )
+
+    def test_matches_full_matrix(self):
+        for memory_budget in [5 * 4, 100 * 4, 3000 * 4, 256 * 2**20]:
+            values, indices = topk_cosine_similarity(
+                self.queries, self.rows, 5, memory_budget=memory_budget
+            )
+            torch.testing.assert_close(values, self.expected_values)
+            torch.testing.assert_close(indices, self.expected_indices)
+
+    def test_normalized_rows(self):
+        queries, rows = normalize_rows(self.queries), normalize_rows(self.rows)
+        for memory_budget in [5 * 4, 100 * 4, 256 * 2**20]:
+            values, indices = topk_cosine_similarity(
+                queries, rows, 5, memory_budget=memory_budget, normalized=True
+            )
+            torch.testing.assert_close(values, self.expected_values)
+            torch.testing.assert_close(indices, self.expected_indices)
+
+    def test_half_precision(self):
+        for dtype in [torch.float16, torch.bfloat16]:
+            values, _ = topk_cosine_similarity(
+                self.queries, self.rows, 5, memory_budget=100 * 2, dtype=dtype
+            )
+            self.assertEqual(values.dtype, torch.float32)
+            torch.testing.assert_close(values, self.expected_values, atol=2e-2, rtol=0)
+
+    def test_valid_mask(self):
+        valid = torch.ones(len(self.rows), dtype=torch.bool)
+        valid[self.expected_indices[:, 0]] = False
+
+        _, indices = topk_cosine_similarity(
+            self.queries, self.rows, 5, memory_budget=100 * 4, valid=valid
+        )
+
+        self.assertTrue(valid[indices].all())
+
+    def test_k_larger_than_number_of_rows(self):
+        values, indices = topk_cosine_similarity(self.queries, self.rows[:3], 10)
+
+        self.assertEqual(values.shape, (37, 3))
+        self.assertEqual(sorted(indices[0].tolist()), [0, 1, 2])
+
+    def test_budget_too_small(self):
+        with self.assertRaises(RuntimeError):
+            topk_cosine_similarity(self.queries, self.rows, 5, memory_budget=4)